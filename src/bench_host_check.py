@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 12:20:41 2026
+
+@author: askh
+
+Замер скорости проверки IP-адресов и имён хостов в HostChecker при большом
+количестве запрещённых сетей и имён. Запуск: python3 bench_host_check.py [количество сетей]
+"""
+
+import ipaddress
+import os
+import random
+import sys
+import tempfile
+from time import perf_counter
+from blocklist_index import BlocklistIndex, compile_blocklist
+from host_check import HostChecker
+
+
+def random_networks(rnd: random.Random, count: int, version: int) -> list:
+    bits = 32 if version == 4 else 128
+    networks = []
+    for _ in range(count):
+        prefix = rnd.randint(bits // 2, bits)
+        addr = ipaddress.ip_address(rnd.getrandbits(bits)) \
+            if version == 6 else ipaddress.IPv4Address(rnd.getrandbits(32))
+        networks.append(str(ipaddress.ip_network(f"{addr}/{prefix}",
+                                                 strict=False)))
+    return networks
+
+
+def bench_hostnames(count: int, lookups: int):
+    rnd = random.Random(2)
+    names = [f"host{rnd.getrandbits(40):x}.zone{i % 1000}.example"
+             for i in range(count)]
+    names += [f"*.wild{i}.example" for i in range(count // 10)]
+
+    start = perf_counter()
+    host_checker = HostChecker(restricted_hostnames=names)
+    build_sec = perf_counter() - start
+    print(f"hostnames={len(names)}")
+    print(f"  build:  {build_sec:.2f} s")
+
+    queries = [rnd.choice(names).replace('*', 'sub') for _ in range(lookups)]
+    queries += [f"other{i}.zone{i % 1000}.example" for i in range(lookups)]
+    start = perf_counter()
+    for name in queries:
+        host_checker.check_name(name)
+    lookup_sec = perf_counter() - start
+    print(f"  lookup: {lookup_sec / len(queries) * 1e6:.2f} us/name")
+
+
+def bench(count: int, lookups: int):
+    rnd = random.Random(1)
+    ipv4 = random_networks(rnd, count, 4)
+    ipv6 = random_networks(rnd, count, 6)
+
+    start = perf_counter()
+    host_checker = HostChecker(restricted_ipv4=ipv4, restricted_ipv6=ipv6)
+    build_sec = perf_counter() - start
+    print(f"networks={count} per version, "
+          f"merged intervals: IPv4={len(host_checker.restricted_ipv4)} "
+          f"IPv6={len(host_checker.restricted_ipv6)}")
+    print(f"  build:  {build_sec:.2f} s")
+
+    for (version, bits) in ((4, 32), (6, 128)):
+        addresses = [str(ipaddress.ip_address(rnd.getrandbits(bits))
+                         if version == 6
+                         else ipaddress.IPv4Address(rnd.getrandbits(32)))
+                     for _ in range(lookups)]
+        start = perf_counter()
+        for addr in addresses:
+            host_checker.check_ip(addr)
+        lookup_sec = perf_counter() - start
+        print(f"  IPv{version} lookup: {lookup_sec / lookups * 1e6:.2f} "
+              f"us/address")
+
+    # Для сравнения: линейный перебор сетей (как до построения индекса)
+    networks = [ipaddress.ip_network(n) for n in ipv4]
+    linear_lookups = 20
+    start = perf_counter()
+    for _ in range(linear_lookups):
+        ip = ipaddress.IPv4Address(rnd.getrandbits(32))
+        any(ip in net for net in networks)
+    linear_sec = perf_counter() - start
+    print(f"  IPv4 linear scan: {linear_sec / linear_lookups * 1e6:.2f} "
+          f"us/address")
+
+    # Скомпилированный индекс: время открытия и поиска
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        list_path = os.path.join(tmp_dir, 'list.txt')
+        index_path = os.path.join(tmp_dir, 'blocklist.idx')
+        with open(list_path, 'w') as f:
+            f.write("\n".join(ipv4 + ipv6))
+        start = perf_counter()
+        compile_blocklist([list_path], index_path)
+        compile_sec = perf_counter() - start
+        start = perf_counter()
+        index = BlocklistIndex(index_path)
+        host_checker = HostChecker(blocklist=index)
+        open_sec = perf_counter() - start
+        print(f"  index compile: {compile_sec:.2f} s, "
+              f"size: {os.path.getsize(index_path)} bytes")
+        print(f"  index open: {open_sec * 1e3:.2f} ms")
+        start = perf_counter()
+        for addr in addresses:
+            host_checker.check_ip(addr)
+        lookup_sec = perf_counter() - start
+        print(f"  IPv6 index lookup: {lookup_sec / lookups * 1e6:.2f} "
+              f"us/address")
+        index.close()
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    bench(count=count, lookups=100000)
+    bench_hostnames(count=count, lookups=100000)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:15:37 2026
+
+@author: askh
+
+Замер скорости работы RequestLimit при большом количестве отслеживаемых
+запросов. Запуск: python3 bench_request_limit.py [количество запросов]
+"""
+
+import sys
+from time import perf_counter
+from request_limit import RequestLimit
+
+
+def bench(tracked: int, ids: int, calls: int, algorithm: str):
+    time_interval_sec = 60
+    rl = RequestLimit(max_total_value=tracked,
+                      max_id_value=tracked,
+                      time_interval_sec=time_interval_sec,
+                      algorithm=algorithm)
+
+    # Заполнение: tracked запросов равномерно в пределах интервала
+    step = time_interval_sec / tracked
+    req_time = 0.0
+    start = perf_counter()
+    for i in range(tracked):
+        rl.request(i % ids, req_time)
+        req_time += step
+    fill_sec = perf_counter() - start
+
+    # Установившийся режим: каждый новый запрос вытесняет устаревший
+    start = perf_counter()
+    for i in range(calls):
+        rl.request(i % ids, req_time)
+        req_time += step
+    steady_sec = perf_counter() - start
+
+    # Запросы при достигнутом лимите (без вытеснения)
+    start = perf_counter()
+    for i in range(calls):
+        rl.request(i % ids, req_time)
+    rejected_sec = perf_counter() - start
+
+    print(f"algorithm={algorithm} tracked={tracked} ids={ids} "
+          f"total_count={rl.storage.total_count} "
+          f"id_tat={len(rl.storage.id_tat)}")
+    print(f"  fill:     {fill_sec / tracked * 1e6:.2f} us/request")
+    print(f"  steady:   {steady_sec / calls * 1e6:.2f} us/request")
+    print(f"  rejected: {rejected_sec / calls * 1e6:.2f} us/request")
+
+
+if __name__ == '__main__':
+    tracked = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for algorithm in RequestLimit.ALGORITHMS:
+        for ids in (10, 1000, tracked):
+            bench(tracked=tracked, ids=ids, calls=100000,
+                  algorithm=algorithm)
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:02:17 2026
+
+@author: askh
+
+Содержит компилятор списков запрещённых сетей и имён хостов в компактный
+двоичный индекс и класс для поиска в этом индексе без загрузки в память
+(файл отображается в память через mmap, поэтому страницы индекса разделяются
+между процессами бота).
+
+Компиляция:
+    python3 blocklist_index.py compile -o blocklist.idx list.txt config.yaml
+
+Текстовые списки содержат по одной записи в строке: сеть (10.0.0.0/8),
+IP-адрес, имя хоста или шаблон вида *.example.com; текст после # считается
+комментарием. Из файлов YAML берутся списки restricted_hostnames,
+restricted_ipv4 и restricted_ipv6 (как в файле настроек бота).
+
+Формат индекса (все числа - big-endian):
+    заголовок: MAGIC, затем для каждого из разделов (IPv4, IPv6, точные
+    имена, шаблоны имён) количество записей (uint32) и смещение раздела от
+    начала файла (uint64);
+    разделы IPv4 и IPv6: отсортированные непересекающиеся интервалы адресов
+    (начало и конец, по 4 или 16 байт);
+    разделы имён: таблица смещений (количество + 1 значений uint32,
+    относительно конца таблицы) и отсортированные имена в кодировке ASCII.
+"""
+
+import argparse
+from bisect import bisect_right
+import ipaddress
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from typing import Iterable
+
+import yaml
+
+from host_check import HostnameTrie, IpIntervalIndex, normalize_hostname
+
+
+MAGIC = b'SYSBLK01'
+
+SECTION = struct.Struct('!IQ')
+SECTIONS_COUNT = 4
+HEADER_SIZE = len(MAGIC) + SECTION.size * SECTIONS_COUNT
+
+# Разделы индекса
+SECTION_IPV4 = 0
+SECTION_IPV6 = 1
+SECTION_EXACT_NAMES = 2
+SECTION_WILDCARD_NAMES = 3
+
+OFFSET = struct.Struct('!I')
+
+
+class BlocklistFormatError(Exception):
+    """Файл не является корректным индексом"""
+
+
+class _IntervalStarts:
+    """
+    Последовательность начал интервалов в отображённом файле (для bisect).
+    """
+
+    def __init__(self, buf, offset: int, count: int, addr_size: int):
+        self.buf = buf
+        self.offset = offset
+        self.count = count
+        self.addr_size = addr_size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> bytes:
+        pos = self.offset + i * 2 * self.addr_size
+        return self.buf[pos:pos + self.addr_size]
+
+    def end(self, i: int) -> bytes:
+        pos = self.offset + (i * 2 + 1) * self.addr_size
+        return self.buf[pos:pos + self.addr_size]
+
+
+class _SortedNames:
+    """
+    Последовательность отсортированных имён в отображённом файле (для
+    bisect).
+    """
+
+    def __init__(self, buf, offset: int, count: int):
+        self.buf = buf
+        self.count = count
+        self.offsets_pos = offset
+        self.data_pos = offset + (count + 1) * OFFSET.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> bytes:
+        (start,) = OFFSET.unpack_from(self.buf,
+                                      self.offsets_pos + i * OFFSET.size)
+        (end,) = OFFSET.unpack_from(self.buf,
+                                    self.offsets_pos + (i + 1) * OFFSET.size)
+        return self.buf[self.data_pos + start:self.data_pos + end]
+
+    def __contains__(self, name: bytes) -> bool:
+        i = bisect_right(self, name) - 1
+        return i >= 0 and self[i] == name
+
+    def data_size(self) -> int:
+        (size,) = OFFSET.unpack_from(
+            self.buf, self.offsets_pos + self.count * OFFSET.size)
+        return size
+
+
+class BlocklistIndex:
+
+    def __init__(self, path: str):
+        """
+        Открыть индекс.
+
+        Parameters
+        ----------
+        path : str
+            Путь к файлу индекса.
+
+        Raises
+        ------
+        OSError
+            Файл не удалось открыть.
+        BlocklistFormatError
+            Файл не является корректным индексом.
+
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER_SIZE:
+                raise BlocklistFormatError(f"File is too small: {path}")
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buf[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise BlocklistFormatError(f"Unknown file format: {path}")
+        sections = [SECTION.unpack_from(self.buf,
+                                        len(MAGIC) + i * SECTION.size)
+                    for i in range(SECTIONS_COUNT)]
+        self.ipv4 = _IntervalStarts(self.buf, sections[SECTION_IPV4][1],
+                                    sections[SECTION_IPV4][0], 4)
+        self.ipv6 = _IntervalStarts(self.buf, sections[SECTION_IPV6][1],
+                                    sections[SECTION_IPV6][0], 16)
+        self.exact_names = _SortedNames(self.buf,
+                                        sections[SECTION_EXACT_NAMES][1],
+                                        sections[SECTION_EXACT_NAMES][0])
+        self.wildcard_names = _SortedNames(
+            self.buf,
+            sections[SECTION_WILDCARD_NAMES][1],
+            sections[SECTION_WILDCARD_NAMES][0])
+        for intervals in (self.ipv4, self.ipv6):
+            if intervals.offset + intervals.count * 2 * intervals.addr_size \
+               > size:
+                self.close()
+                raise BlocklistFormatError(f"Truncated file: {path}")
+        for names in (self.exact_names, self.wildcard_names):
+            if names.data_pos > size or \
+               names.data_pos + names.data_size() > size:
+                self.close()
+                raise BlocklistFormatError(f"Truncated file: {path}")
+
+    def close(self):
+        self.buf.close()
+
+    def contains_ip(self, ip: ipaddress._BaseAddress) -> bool:
+        """
+        Проверить, входит ли адрес в одну из сетей индекса.
+        """
+        intervals = self.ipv4 if ip.version == 4 else self.ipv6
+        key = ip.packed
+        i = bisect_right(intervals, key) - 1
+        return i >= 0 and key <= intervals.end(i)
+
+    def match_hostname(self, name: str) -> bool:
+        """
+        Проверить, соответствует ли имя хоста точному имени или шаблону
+        индекса.
+        """
+        name_b = normalize_hostname(name).encode('ascii', errors='replace')
+        if name_b in self.exact_names:
+            return True
+        if len(self.wildcard_names) == 0:
+            return False
+        pos = name_b.find(b'.')
+        while pos >= 0:
+            if name_b[pos + 1:] in self.wildcard_names:
+                return True
+            pos = name_b.find(b'.', pos + 1)
+        return False
+
+
+def _interval_bytes(index: IpIntervalIndex, addr_size: int) -> bytes:
+    data = bytearray()
+    for (start, end) in zip(index.starts, index.ends):
+        data += start.to_bytes(addr_size, 'big')
+        data += end.to_bytes(addr_size, 'big')
+    return bytes(data)
+
+
+def _names_bytes(names: Iterable[str]) -> (int, bytes):
+    encoded = sorted(set(n.encode('ascii', errors='replace')
+                         for n in names))
+    offsets = bytearray()
+    data = bytearray()
+    for name in encoded:
+        offsets += OFFSET.pack(len(data))
+        data += name
+    offsets += OFFSET.pack(len(data))
+    return (len(encoded), bytes(offsets + data))
+
+
+def read_entries(path: str) -> (list, list, list):
+    """
+    Прочитать список записей из файла YAML или текстового файла.
+
+    Returns
+    -------
+    (list, list, list)
+        Имена хостов (и шаблоны), сети IPv4, сети IPv6 (в виде строк).
+
+    """
+    hostnames = []
+    ipv4 = []
+    ipv6 = []
+    if path.endswith(('.yaml', '.yml')):
+        with open(path, 'r') as f:
+            data = yaml.safe_load(f) or {}
+        hostnames.extend(data.get('restricted_hostnames', []))
+        ipv4.extend(data.get('restricted_ipv4', []))
+        ipv6.extend(data.get('restricted_ipv6', []))
+        return (hostnames, ipv4, ipv6)
+
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            entry = line.split('#', 1)[0].strip()
+            if not entry:
+                continue
+            try:
+                net = ipaddress.ip_network(entry, strict=False)
+                (ipv4 if net.version == 4 else ipv6).append(str(net))
+            except ValueError:
+                hostnames.append(entry)
+    return (hostnames, ipv4, ipv6)
+
+
+def compile_blocklist(sources: Iterable[str], output: str) -> dict:
+    """
+    Скомпилировать списки в индекс. Файл индекса заменяется атомарно, так
+    что процессы, использующие старый индекс, продолжают работать с ним.
+
+    Parameters
+    ----------
+    sources : Iterable[str]
+        Пути к файлам списков.
+    output : str
+        Путь к файлу индекса.
+
+    Returns
+    -------
+    dict
+        Количество записей в каждом разделе индекса.
+
+    """
+    logger = logging.getLogger(__name__)
+
+    hostnames = []
+    ipv4 = []
+    ipv6 = []
+    for source in sources:
+        (h, i4, i6) = read_entries(source)
+        hostnames.extend(h)
+        ipv4.extend(i4)
+        ipv6.extend(i6)
+
+    networks = {4: [], 6: []}
+    for entry in ipv4 + ipv6:
+        try:
+            net = ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            logger.error("Can't parse network %s", entry)
+            continue
+        networks[net.version].append(net)
+
+    exact_names = set()
+    wildcard_names = set()
+    for entry in hostnames:
+        entry = str(entry).strip()
+        if entry.startswith(HostnameTrie.WILDCARD_PREFIX):
+            wildcard_names.add(normalize_hostname(
+                entry[len(HostnameTrie.WILDCARD_PREFIX):]))
+        else:
+            exact_names.add(normalize_hostname(entry))
+
+    ipv4_index = IpIntervalIndex(networks[4])
+    ipv6_index = IpIntervalIndex(networks[6])
+    sections = [
+        (len(ipv4_index), _interval_bytes(ipv4_index, 4)),
+        (len(ipv6_index), _interval_bytes(ipv6_index, 16)),
+        _names_bytes(exact_names),
+        _names_bytes(wildcard_names),
+    ]
+
+    header = bytearray(MAGIC)
+    offset = HEADER_SIZE
+    for (count, data) in sections:
+        header += SECTION.pack(count, offset)
+        offset += len(data)
+
+    output_dir = os.path.dirname(os.path.abspath(output))
+    (fd, tmp_path) = tempfile.mkstemp(dir=output_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            for (_, data) in sections:
+                f.write(data)
+        os.replace(tmp_path, output)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return {
+        'ipv4': sections[SECTION_IPV4][0],
+        'ipv6': sections[SECTION_IPV6][0],
+        'exact_names': sections[SECTION_EXACT_NAMES][0],
+        'wildcard_names': sections[SECTION_WILDCARD_NAMES][0],
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        prog='blocklist_index',
+        description='Blocklist index for sysadmin-tg-bot.')
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+
+    compile_parser = subparsers.add_parser(
+        'compile', help='Compile lists into the index.')
+    compile_parser.add_argument('-o', '--output', required=True,
+                                help='Index file.', metavar='INDEX_FILE')
+    compile_parser.add_argument('sources', nargs='+',
+                                help='Text or YAML lists.',
+                                metavar='LIST_FILE')
+
+    check_parser = subparsers.add_parser(
+        'check', help='Check hosts against the index.')
+    check_parser.add_argument('index', help='Index file.',
+                              metavar='INDEX_FILE')
+    check_parser.add_argument('hosts', nargs='+',
+                              help='Host names or IP addresses.',
+                              metavar='HOST')
+
+    options = arg_parser.parse_args()
+
+    if options.command == 'compile':
+        counts = compile_blocklist(options.sources, options.output)
+        print(', '.join(f"{k}: {v}" for (k, v) in counts.items()))
+        return 0
+
+    index = BlocklistIndex(options.index)
+    for host in options.hosts:
+        try:
+            denied = index.contains_ip(ipaddress.ip_address(host))
+        except ValueError:
+            denied = index.match_hostname(host)
+        print(f"{host}: {'denied' if denied else 'ok'}")
+    index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    sys.exit(main())
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 18:05:37 2026
+
+@author: askh
+
+Содержит пул неактивных соединений keep-alive (с ограничением времени
+простоя и общего количества соединений) и контекст TLS, запоминающий сессии
+для их возобновления при повторных соединениях с тем же сервером
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import ssl
+from collections import OrderedDict
+from time import monotonic
+from typing import Callable, Hashable, Optional
+
+# Порт сервера, с которым устанавливается соединение (см.
+# ResumingSSLContext.connecting)
+_server_port: contextvars.ContextVar[Optional[int]] = \
+    contextvars.ContextVar('server_port', default=None)
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """
+    Контекст TLS для клиента, который при установке соединения предлагает
+    серверу сохранённую сессию (по имени и порту сервера), чтобы повторное
+    соединение обходилось без полного рукопожатия. Порт сервера указывается
+    через connecting, так как в wrap_bio он не передаётся.
+    """
+
+    DEFAULT_MAX_SESSIONS = 256
+
+    def __init__(self, *args, max_sessions: int = None, **kwargs):
+        self.max_sessions = self.DEFAULT_MAX_SESSIONS if max_sessions is None \
+            else max_sessions
+        self.sessions: OrderedDict[tuple[str, Optional[int]],
+                                   ssl.SSLSession] = OrderedDict()
+
+    def __new__(cls, protocol=ssl.PROTOCOL_TLS_CLIENT, *args, **kwargs):
+        return super().__new__(cls, protocol)
+
+    @classmethod
+    def create_default(cls, max_sessions: int = None) -> 'ResumingSSLContext':
+        """
+        Создать контекст с проверкой сертификатов и имени сервера.
+        """
+        context = cls(max_sessions=max_sessions)
+        context.load_default_certs()
+        return context
+
+    @staticmethod
+    @contextlib.contextmanager
+    def connecting(port: int):
+        """
+        Указать порт сервера для соединений, устанавливаемых внутри блока
+        with (сессии разных серверов на одном хосте не смешиваются).
+        """
+        token = _server_port.set(port)
+        try:
+            yield
+        finally:
+            _server_port.reset(token)
+
+    def wrap_bio(self, incoming, outgoing, server_side=False,
+                 server_hostname=None, session=None):
+        key = (server_hostname, _server_port.get())
+        if session is None and not server_side \
+           and server_hostname is not None:
+            session = self.sessions.get(key)
+        try:
+            return super().wrap_bio(incoming, outgoing,
+                                    server_side=server_side,
+                                    server_hostname=server_hostname,
+                                    session=session)
+        except ValueError:
+            # Сессия не подходит для этого контекста
+            self.sessions.pop(key, None)
+            return super().wrap_bio(incoming, outgoing,
+                                    server_side=server_side,
+                                    server_hostname=server_hostname)
+
+    def save_session(self, ssl_object: ssl.SSLObject, port: int = None):
+        """
+        Запомнить сессию соединения с портом port. Вызывается после обмена
+        данными, так как в TLS 1.3 билеты сессий приходят после рукопожатия.
+        """
+        if ssl_object is None or ssl_object.server_hostname is None:
+            return
+        session = ssl_object.session
+        if session is None or not session.has_ticket and not session.id:
+            return
+        key = (ssl_object.server_hostname, port)
+        self.sessions[key] = session
+        self.sessions.move_to_end(key)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+
+class PooledConnection:
+
+    # Максимальное время ожидания закрытия соединения (в том числе обмена
+    # close_notify для TLS)
+    CLOSE_TIMEOUT_SEC = 2
+
+    def __init__(self,
+                 reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        # Количество запросов, выполненных через соединение
+        self.requests = 0
+        self.idle_since = None
+
+    @property
+    def ssl_object(self) -> ssl.SSLObject:
+        return self.writer.get_extra_info('ssl_object')
+
+    def is_alive(self) -> bool:
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await asyncio.wait_for(self.writer.wait_closed(),
+                                   self.CLOSE_TIMEOUT_SEC)
+        except (OSError, ssl.SSLError, asyncio.TimeoutError):
+            pass
+
+
+class ConnectionPool:
+
+    DEFAULT_MAX_IDLE = 32
+    DEFAULT_MAX_IDLE_PER_KEY = 2
+    DEFAULT_IDLE_TIMEOUT_SEC = 30
+
+    def __init__(self,
+                 max_idle: int = None,
+                 max_idle_per_key: int = None,
+                 idle_timeout_sec: float = None,
+                 clock: Callable[[], float] = monotonic):
+        """
+        Parameters
+        ----------
+        max_idle : int, optional
+            Максимальное количество неактивных соединений в пуле.
+        max_idle_per_key : int, optional
+            Максимальное количество неактивных соединений с одним ключом
+            (хост, порт, схема).
+        idle_timeout_sec : float, optional
+            Время, по истечении которого неактивное соединение закрывается,
+            в секундах.
+        clock : Callable[[], float], optional
+            Функция, возвращающая текущее время в секундах.
+
+        """
+        self.max_idle = self.DEFAULT_MAX_IDLE if max_idle is None \
+            else max_idle
+        self.max_idle_per_key = self.DEFAULT_MAX_IDLE_PER_KEY \
+            if max_idle_per_key is None else max_idle_per_key
+        self.idle_timeout_sec = self.DEFAULT_IDLE_TIMEOUT_SEC \
+            if idle_timeout_sec is None else idle_timeout_sec
+        self.clock = clock
+        self.reused = 0
+        # Неактивные соединения (ключ, соединение) в порядке освобождения
+        self.idle: list[tuple[Hashable, PooledConnection]] = []
+        # Задача, закрывающая соединения по истечении времени простоя
+        self.reaper: asyncio.Task = None
+
+    def __len__(self) -> int:
+        return len(self.idle)
+
+    async def _close_all(self, connections: list[PooledConnection]):
+        if connections:
+            await asyncio.gather(*(c.close() for c in connections))
+
+    async def _expire(self):
+        old_time = self.clock() - self.idle_timeout_sec
+        expired = [c for (_, c) in self.idle
+                   if c.idle_since <= old_time or not c.is_alive()]
+        if expired:
+            self.idle = [(k, c) for (k, c) in self.idle if c not in expired]
+            await self._close_all(expired)
+
+    async def _reap(self):
+        while self.idle:
+            # Первое соединение освобождено раньше остальных
+            expires = self.idle[0][1].idle_since + self.idle_timeout_sec
+            await asyncio.sleep(max(0, expires - self.clock()))
+            await self._expire()
+
+    async def acquire(self, key: Hashable) -> PooledConnection:
+        """
+        Взять из пула неактивное соединение.
+
+        Parameters
+        ----------
+        key : Hashable
+            Ключ соединения (хост, порт, схема).
+
+        Returns
+        -------
+        PooledConnection
+            Соединение, либо None, если подходящего соединения в пуле нет.
+
+        """
+        await self._expire()
+        for i in range(len(self.idle) - 1, -1, -1):
+            if self.idle[i][0] == key:
+                (_, connection) = self.idle.pop(i)
+                self.reused += 1
+                logging.getLogger(__name__).debug(
+                    "Reuse connection for %s", key)
+                return connection
+        return None
+
+    async def release(self, key: Hashable, connection: PooledConnection,
+                      reusable: bool = True):
+        """
+        Вернуть соединение в пул (или закрыть его, если его нельзя
+        использовать повторно или пул заполнен).
+        """
+        if not reusable or not connection.is_alive() \
+           or self.max_idle <= 0 or self.max_idle_per_key <= 0:
+            await connection.close()
+            return
+        connection.idle_since = self.clock()
+        self.idle.append((key, connection))
+        evicted = []
+        same_key = [i for (i, (k, _)) in enumerate(self.idle) if k == key]
+        for i in reversed(same_key[:-self.max_idle_per_key]):
+            evicted.append(self.idle.pop(i)[1])
+        while len(self.idle) > self.max_idle:
+            evicted.append(self.idle.pop(0)[1])
+        if self.reaper is None or self.reaper.done():
+            self.reaper = asyncio.create_task(self._reap())
+        await self._close_all(evicted)
+
+    async def close(self):
+        """
+        Закрыть все неактивные соединения.
+        """
+        if self.reaper is not None:
+            self.reaper.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.reaper
+            self.reaper = None
+        (connections, self.idle) = ([c for (_, c) in self.idle], [])
+        await self._close_all(connections)
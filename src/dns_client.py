@@ -0,0 +1,655 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:20:03 2026
+
+@author: askh
+
+Содержит асинхронный клиент DNS, работающий по протоколу DNS напрямую (UDP,
+с переходом на TCP для усечённых ответов), без запуска программы host
+"""
+
+import asyncio
+from dataclasses import dataclass, field, replace
+import ipaddress
+import logging
+import secrets
+import struct
+from time import monotonic
+from typing import Callable
+
+from ttl_cache import TtlLruCache
+
+
+# Типы записей
+TYPE_A = 1
+TYPE_NS = 2
+TYPE_CNAME = 5
+TYPE_SOA = 6
+TYPE_PTR = 12
+TYPE_MX = 15
+TYPE_TXT = 16
+TYPE_AAAA = 28
+TYPE_OPT = 41
+TYPE_CAA = 257
+
+TYPE_NAMES = {
+    TYPE_A: 'A',
+    TYPE_NS: 'NS',
+    TYPE_CNAME: 'CNAME',
+    TYPE_SOA: 'SOA',
+    TYPE_PTR: 'PTR',
+    TYPE_MX: 'MX',
+    TYPE_TXT: 'TXT',
+    TYPE_AAAA: 'AAAA',
+    TYPE_CAA: 'CAA',
+}
+
+CLASS_IN = 1
+
+# Коды ответа
+RCODE_NOERROR = 0
+RCODE_FORMERR = 1
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+RCODE_NOTIMP = 4
+RCODE_REFUSED = 5
+
+RCODE_NAMES = {
+    RCODE_NOERROR: 'NOERROR',
+    RCODE_FORMERR: 'FORMERR',
+    RCODE_SERVFAIL: 'SERVFAIL',
+    RCODE_NXDOMAIN: 'NXDOMAIN',
+    RCODE_NOTIMP: 'NOTIMP',
+    RCODE_REFUSED: 'REFUSED',
+}
+
+# Флаги заголовка
+FLAG_QR = 0x8000
+FLAG_TC = 0x0200
+FLAG_RD = 0x0100
+
+HEADER = struct.Struct('!HHHHHH')
+RR_HEADER = struct.Struct('!HHIH')
+
+# Размер буфера UDP, объявляемый серверу через EDNS(0)
+EDNS_UDP_PAYLOAD_SIZE = 1232
+
+# Типы записей, запрашиваемые командой /dns
+LOOKUP_TYPES = (TYPE_A, TYPE_AAAA, TYPE_MX, TYPE_NS, TYPE_TXT, TYPE_SOA,
+                TYPE_CAA)
+
+RESOLV_CONF = '/etc/resolv.conf'
+FALLBACK_NAMESERVER = '127.0.0.1'
+
+
+class DnsError(Exception):
+    """Некорректный ответ сервера DNS"""
+
+
+@dataclass(frozen=True)
+class DnsRecord:
+    name: str
+    rtype: int
+    ttl: int
+    data: str
+
+    def to_text(self) -> str:
+        rtype_name = TYPE_NAMES.get(self.rtype, f"TYPE{self.rtype}")
+        return f"{self.name}\t{self.ttl}\tIN\t{rtype_name}\t{self.data}"
+
+
+@dataclass
+class DnsAnswer:
+    rcode: int
+    answer: list[DnsRecord] = field(default_factory=list)
+    authority: list[DnsRecord] = field(default_factory=list)
+
+
+def system_nameserver(resolv_conf: str = RESOLV_CONF) -> str:
+    """
+    Определить адрес сервера DNS, используемого системой.
+
+    Parameters
+    ----------
+    resolv_conf : str, optional
+        Путь к файлу resolv.conf.
+
+    Returns
+    -------
+    str
+        Адрес первого сервера из resolv.conf, либо FALLBACK_NAMESERVER, если
+        его не удалось определить.
+
+    """
+    try:
+        with open(resolv_conf, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == 'nameserver':
+                    return parts[1].split('%')[0]
+    except OSError:
+        pass
+    return FALLBACK_NAMESERVER
+
+
+def encode_name(name: str) -> bytes:
+    """
+    Закодировать имя домена в формат DNS (последовательность меток).
+
+    Parameters
+    ----------
+    name : str
+        Имя домена, возможно с национальными символами.
+
+    Raises
+    ------
+    ValueError
+        Имя не может быть закодировано.
+
+    Returns
+    -------
+    bytes
+        Имя в формате DNS.
+
+    """
+    name = name.strip().rstrip('.')
+    result = bytearray()
+    if name:
+        try:
+            ascii_name = name.encode('idna')
+        except UnicodeError as e:
+            raise ValueError(f"Incorrect domain name: {name}") from e
+        for label in ascii_name.split(b'.'):
+            if not 0 < len(label) < 64:
+                raise ValueError(f"Incorrect domain name: {name}")
+            result.append(len(label))
+            result += label
+    result.append(0)
+    if len(result) > 255:
+        raise ValueError(f"Domain name is too long: {name}")
+    return bytes(result)
+
+
+def build_query(name: str, rtype: int, qid: int) -> bytes:
+    """
+    Сформировать запрос DNS (с рекурсией и записью OPT для EDNS(0)).
+
+    Parameters
+    ----------
+    name : str
+        Имя домена.
+    rtype : int
+        Тип запрашиваемых записей.
+    qid : int
+        Идентификатор запроса.
+
+    Returns
+    -------
+    bytes
+        Запрос в формате DNS.
+
+    """
+    header = HEADER.pack(qid, FLAG_RD, 1, 0, 0, 1)
+    question = encode_name(name) + struct.pack('!HH', rtype, CLASS_IN)
+    opt = b'\x00' + struct.pack('!HHIH', TYPE_OPT, EDNS_UDP_PAYLOAD_SIZE,
+                                0, 0)
+    return header + question + opt
+
+
+def _decode_name(data: bytes, offset: int) -> (str, int):
+    """
+    Прочитать имя из сообщения DNS с учётом сжатия имён.
+
+    Returns
+    -------
+    (str, int)
+        Имя (с точкой на конце) и смещение сразу за именем в исходной
+        позиции.
+
+    """
+    labels = []
+    end_offset = None
+    jumps = 0
+    while True:
+        if offset >= len(data):
+            raise DnsError("Name is out of message")
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if offset + 1 >= len(data):
+                raise DnsError("Name is out of message")
+            if end_offset is None:
+                end_offset = offset + 2
+            jumps += 1
+            if jumps > 127:
+                raise DnsError("Name compression loop")
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            continue
+        if length & 0xC0:
+            raise DnsError("Unknown label type")
+        offset += 1
+        if length == 0:
+            break
+        label = data[offset:offset + length]
+        if len(label) != length:
+            raise DnsError("Name is out of message")
+        labels.append(label.decode('ascii', errors='backslashreplace'))
+        offset += length
+    if end_offset is None:
+        end_offset = offset
+    return ('.'.join(labels) + '.', end_offset)
+
+
+def _quote(data: bytes) -> str:
+    text = data.decode('utf-8', errors='backslashreplace')
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _decode_rdata(message: bytes, rtype: int, offset: int,
+                  rdlength: int) -> str:
+    rdata = message[offset:offset + rdlength]
+    if rtype == TYPE_A and rdlength == 4:
+        return str(ipaddress.IPv4Address(rdata))
+    if rtype == TYPE_AAAA and rdlength == 16:
+        return str(ipaddress.IPv6Address(rdata))
+    if rtype in (TYPE_NS, TYPE_CNAME, TYPE_PTR):
+        return _decode_name(message, offset)[0]
+    if rtype == TYPE_MX:
+        (preference,) = struct.unpack_from('!H', message, offset)
+        return f"{preference} {_decode_name(message, offset + 2)[0]}"
+    if rtype == TYPE_SOA:
+        (mname, pos) = _decode_name(message, offset)
+        (rname, pos) = _decode_name(message, pos)
+        values = struct.unpack_from('!IIIII', message, pos)
+        return ' '.join([mname, rname] + [str(v) for v in values])
+    if rtype == TYPE_TXT:
+        strings = []
+        pos = 0
+        while pos < rdlength:
+            length = rdata[pos]
+            strings.append(_quote(rdata[pos + 1:pos + 1 + length]))
+            pos += 1 + length
+        return ' '.join(strings)
+    if rtype == TYPE_CAA and rdlength >= 2:
+        flags = rdata[0]
+        tag_len = rdata[1]
+        tag = rdata[2:2 + tag_len].decode('ascii', errors='backslashreplace')
+        return f"{flags} {tag} {_quote(rdata[2 + tag_len:])}"
+    return f"\\# {rdlength} {rdata.hex()}"
+
+
+def parse_response(message: bytes) -> (int, int, DnsAnswer):
+    """
+    Разобрать ответ сервера DNS.
+
+    Parameters
+    ----------
+    message : bytes
+        Ответ сервера.
+
+    Raises
+    ------
+    DnsError
+        Ответ некорректен.
+
+    Returns
+    -------
+    (int, int, DnsAnswer)
+        Идентификатор ответа, флаги заголовка и содержимое ответа.
+
+    """
+    try:
+        (qid, flags, qdcount, ancount, nscount, _) = \
+            HEADER.unpack_from(message, 0)
+        offset = HEADER.size
+        for _ in range(qdcount):
+            (_, offset) = _decode_name(message, offset)
+            offset += 4
+        answer = DnsAnswer(rcode=flags & 0x000F)
+        for (count, records) in ((ancount, answer.answer),
+                                 (nscount, answer.authority)):
+            for _ in range(count):
+                (name, offset) = _decode_name(message, offset)
+                (rtype, rclass, ttl, rdlength) = \
+                    RR_HEADER.unpack_from(message, offset)
+                offset += RR_HEADER.size
+                if offset + rdlength > len(message):
+                    raise DnsError("Record data is out of message")
+                if rclass == CLASS_IN and rtype != TYPE_OPT:
+                    records.append(DnsRecord(
+                        name=name,
+                        rtype=rtype,
+                        ttl=ttl,
+                        data=_decode_rdata(message, rtype, offset,
+                                           rdlength)))
+                offset += rdlength
+    except struct.error as e:
+        raise DnsError(f"Truncated message: {e}") from e
+    return (qid, flags, answer)
+
+
+class _UdpQueryProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, qid: int):
+        self.qid = qid
+        self.future = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data: bytes, addr):
+        if self.future.done() or len(data) < HEADER.size:
+            return
+        (qid,) = struct.unpack_from('!H', data, 0)
+        if qid == self.qid:
+            self.future.set_result(data)
+
+    def error_received(self, exc: Exception):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+    def connection_lost(self, exc: Exception):
+        if not self.future.done():
+            self.future.set_exception(
+                exc or ConnectionError("UDP socket closed"))
+
+
+class DnsCache:
+    """
+    Кэш ответов DNS с учётом времени жизни записей. Отрицательные ответы
+    (NXDOMAIN, отсутствие записей) хранятся в течение времени, указанного
+    в записи SOA (RFC 2308), ответы SERVFAIL - короткое фиксированное время.
+    """
+
+    DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+    DEFAULT_NEGATIVE_TTL_SEC = 300
+    DEFAULT_SERVFAIL_TTL_SEC = 30
+    DEFAULT_MAX_TTL_SEC = 86400
+
+    # Оценка накладных расходов памяти на запись кэша и на одну запись DNS
+    ENTRY_OVERHEAD_BYTES = 300
+    RECORD_OVERHEAD_BYTES = 200
+
+    def __init__(self,
+                 max_bytes: int = None,
+                 negative_ttl_sec: float = None,
+                 servfail_ttl_sec: float = None,
+                 max_ttl_sec: float = None,
+                 clock: Callable[[], float] = monotonic):
+        """
+        Parameters
+        ----------
+        max_bytes : int, optional
+            Максимальный объём кэша, в байтах (оценка).
+        negative_ttl_sec : float, optional
+            Время хранения отрицательного ответа, если в нём нет записи SOA.
+        servfail_ttl_sec : float, optional
+            Время хранения ответа SERVFAIL.
+        max_ttl_sec : float, optional
+            Максимальное время хранения любого ответа.
+        clock : Callable[[], float], optional
+            Функция, возвращающая текущее время в секундах.
+
+        """
+        self.negative_ttl_sec = \
+            self.DEFAULT_NEGATIVE_TTL_SEC if negative_ttl_sec is None \
+            else negative_ttl_sec
+        self.servfail_ttl_sec = \
+            self.DEFAULT_SERVFAIL_TTL_SEC if servfail_ttl_sec is None \
+            else servfail_ttl_sec
+        self.max_ttl_sec = \
+            self.DEFAULT_MAX_TTL_SEC if max_ttl_sec is None else max_ttl_sec
+        self.clock = clock
+        self.cache = TtlLruCache(
+            max_bytes=self.DEFAULT_MAX_BYTES if max_bytes is None
+            else max_bytes,
+            clock=clock)
+
+    @staticmethod
+    def key(name: str, rtype: int) -> tuple:
+        return (encode_name(name).lower(), rtype)
+
+    def ttl(self, answer: DnsAnswer) -> float:
+        """
+        Определить время хранения ответа в кэше.
+
+        Parameters
+        ----------
+        answer : DnsAnswer
+            Ответ сервера.
+
+        Returns
+        -------
+        float
+            Время хранения в секундах (0, если ответ не нужно хранить).
+
+        """
+        if answer.rcode == RCODE_SERVFAIL:
+            ttl = self.servfail_ttl_sec
+        elif answer.rcode == RCODE_NOERROR and answer.answer:
+            ttl = min(r.ttl for r in answer.answer)
+        elif answer.rcode in (RCODE_NOERROR, RCODE_NXDOMAIN):
+            ttl = self.negative_ttl_sec
+            for r in answer.authority:
+                if r.rtype == TYPE_SOA:
+                    soa_minimum = int(r.data.rsplit(' ', 1)[-1])
+                    ttl = min(r.ttl, soa_minimum)
+                    break
+        else:
+            ttl = 0
+        return min(ttl, self.max_ttl_sec)
+
+    def get(self, name: str, rtype: int) -> DnsAnswer:
+        """
+        Получить ответ из кэша. Время жизни записей в ответе уменьшено на
+        время, прошедшее с момента получения ответа.
+
+        Returns
+        -------
+        DnsAnswer
+            Ответ, либо None, если его нет в кэше.
+
+        """
+        entry = self.cache.get(self.key(name, rtype))
+        if entry is None:
+            return None
+        (answer, stored_time) = entry
+        elapsed = int(self.clock() - stored_time)
+        if elapsed == 0:
+            return answer
+        return DnsAnswer(
+            rcode=answer.rcode,
+            answer=[replace(r, ttl=max(r.ttl - elapsed, 0))
+                    for r in answer.answer],
+            authority=[replace(r, ttl=max(r.ttl - elapsed, 0))
+                       for r in answer.authority])
+
+    def put(self, name: str, rtype: int, answer: DnsAnswer):
+        """
+        Поместить ответ в кэш (если его можно кэшировать).
+        """
+        size = self.ENTRY_OVERHEAD_BYTES + sum(
+            self.RECORD_OVERHEAD_BYTES + len(r.name) + len(r.data)
+            for r in answer.answer + answer.authority)
+        self.cache.put(self.key(name, rtype),
+                       (answer, self.clock()),
+                       self.ttl(answer),
+                       size)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+class DnsResolver:
+
+    DEFAULT_PORT = 53
+    DEFAULT_TIMEOUT_SEC = 5
+
+    def __init__(self,
+                 nameserver: str = None,
+                 port: int = None,
+                 timeout_sec: float = None,
+                 cache: DnsCache = None):
+        """
+        Parameters
+        ----------
+        nameserver : str, optional
+            Адрес рекурсивного сервера DNS. По умолчанию используется сервер
+            из /etc/resolv.conf.
+        port : int, optional
+            Порт сервера DNS.
+        timeout_sec : float, optional
+            Максимальное время ожидания ответа на один запрос, в секундах.
+        cache : DnsCache, optional
+            Кэш ответов. Если не задан, ответы не кэшируются.
+
+        """
+        self.nameserver = \
+            system_nameserver() if nameserver is None else nameserver
+        self.port = self.DEFAULT_PORT if port is None else port
+        self.timeout_sec = \
+            self.DEFAULT_TIMEOUT_SEC if timeout_sec is None else timeout_sec
+        self.cache = cache
+
+    async def _query_udp(self, query: bytes, qid: int) -> bytes:
+        loop = asyncio.get_running_loop()
+        (transport, protocol) = await loop.create_datagram_endpoint(
+            lambda: _UdpQueryProtocol(qid),
+            remote_addr=(self.nameserver, self.port))
+        try:
+            transport.sendto(query)
+            return await protocol.future
+        finally:
+            transport.close()
+
+    async def _query_tcp(self, query: bytes) -> bytes:
+        (reader, writer) = await asyncio.open_connection(self.nameserver,
+                                                         self.port)
+        try:
+            writer.write(struct.pack('!H', len(query)) + query)
+            await writer.drain()
+            (length,) = struct.unpack('!H', await reader.readexactly(2))
+            return await reader.readexactly(length)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def _query(self, name: str, rtype: int) -> DnsAnswer:
+        logger = logging.getLogger(__name__)
+
+        qid = secrets.randbelow(0x10000)
+        query = build_query(name, rtype, qid)
+        (rqid, flags, answer) = parse_response(
+            await self._query_udp(query, qid))
+        if flags & FLAG_TC:
+            logger.debug("Truncated UDP answer for %s %s, retry with TCP",
+                         name, TYPE_NAMES.get(rtype, rtype))
+            (rqid, flags, answer) = parse_response(
+                await self._query_tcp(query))
+        if rqid != qid or not flags & FLAG_QR:
+            raise DnsError("Unexpected answer")
+        return answer
+
+    async def _fetch(self, name: str, rtype: int) -> DnsAnswer:
+        answer = await asyncio.wait_for(self._query(name, rtype),
+                                        self.timeout_sec)
+        if self.cache is not None:
+            self.cache.put(name, rtype, answer)
+        return answer
+
+    async def query(self, name: str, rtype: int) -> DnsAnswer:
+        """
+        Выполнить запрос записей одного типа.
+
+        Parameters
+        ----------
+        name : str
+            Имя домена.
+        rtype : int
+            Тип записей.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            Сервер не ответил за отведённое время.
+        DnsError
+            Сервер прислал некорректный ответ.
+        ValueError
+            Некорректное имя домена.
+
+        Returns
+        -------
+        DnsAnswer
+            Ответ сервера.
+
+        """
+        if self.cache is not None:
+            answer = self.cache.get(name, rtype)
+            if answer is not None:
+                return answer
+        return await self._fetch(name, rtype)
+
+    async def lookup(self, name: str) -> str:
+        """
+        Запросить параллельно записи всех типов из LOOKUP_TYPES и вывести их
+        в виде текста, аналогичного выводу программы host. Для IP-адреса
+        запрашивается запись PTR.
+
+        Parameters
+        ----------
+        name : str
+            Имя домена или IP-адрес.
+
+        Raises
+        ------
+        asyncio.TimeoutError, DnsError, OSError
+            Не удалось получить ни одного ответа.
+
+        Returns
+        -------
+        str
+            Текстовое представление записей.
+
+        """
+        rtypes = LOOKUP_TYPES
+        try:
+            name = ipaddress.ip_address(name).reverse_pointer
+            rtypes = (TYPE_PTR,)
+        except ValueError:
+            pass
+
+        # Ответы из кэша берутся сразу, запросы к серверу выполняются только
+        # для отсутствующих в кэше типов записей
+        results = [None] * len(rtypes)
+        missing = []
+        for (i, rtype) in enumerate(rtypes):
+            if self.cache is not None:
+                results[i] = self.cache.get(name, rtype)
+            if results[i] is None:
+                missing.append(i)
+        if missing:
+            answers = await asyncio.gather(
+                *(self._fetch(name, rtypes[i]) for i in missing),
+                return_exceptions=True)
+            for (i, answer) in zip(missing, answers):
+                results[i] = answer
+        answers = [r for r in results if isinstance(r, DnsAnswer)]
+        if not answers:
+            raise results[0]
+
+        rcode = answers[0].rcode
+        if all(a.rcode != RCODE_NOERROR for a in answers):
+            rcode_name = RCODE_NAMES.get(rcode, str(rcode))
+            return f"Host {name} not found: {rcode}({rcode_name})\n"
+
+        lines = []
+        seen = set()
+        for a in answers:
+            for record in a.answer:
+                text = record.to_text()
+                if text not in seen:
+                    seen.add(text)
+                    lines.append(text)
+        if not lines:
+            return f"{name} has no records\n"
+        return ";; ANSWER SECTION:\n" + "\n".join(lines) + "\n"
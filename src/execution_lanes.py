@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 17:08:33 2026
+
+@author: askh
+
+Содержит полосы выполнения обработчиков: у каждой полосы (быстрые
+обработчики, запросы к DNS, запуск внешних программ и т.д.) своё
+ограничение количества одновременно выполняемых обработчиков и длины
+очереди, поэтому медленные запросы не задерживают быстрые ответы.
+Полоса обработчика задаётся флагом (см. LaneMiddleware).
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import TelegramObject
+
+
+class LaneFullError(Exception):
+    """Очередь полосы заполнена"""
+
+
+class Lane:
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        """
+        Parameters
+        ----------
+        name : str
+            Имя полосы.
+        max_concurrency : int
+            Максимальное количество одновременно выполняемых обработчиков.
+        max_queue : int
+            Максимальное количество обработчиков, ожидающих выполнения.
+
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        """
+        Занять место в полосе (ожидая его, если все места заняты).
+
+        Raises
+        ------
+        LaneFullError
+            Очередь полосы заполнена.
+
+        """
+        if self.semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise LaneFullError(f"Lane {self.name} is full")
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+
+    def release(self):
+        self.running -= 1
+        self.semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            'running': self.running,
+            'waiting': self.waiting,
+            'rejected': self.rejected,
+        }
+
+
+class LaneMiddleware(BaseMiddleware):
+    """
+    Промежуточный обработчик (регистрируется как inner middleware), который
+    выполняет обработчик в полосе, заданной флагом LANE_FLAG. Если флага нет,
+    используется полоса по умолчанию.
+    """
+
+    LANE_FLAG = 'lane'
+
+    def __init__(self,
+                 lanes: Dict[str, Lane],
+                 default_lane: str,
+                 resolve: Callable[[str], str] = None,
+                 on_full: Callable[[TelegramObject, Lane],
+                                   Awaitable[None]] = None):
+        """
+        Parameters
+        ----------
+        lanes : Dict[str, Lane]
+            Полосы по именам.
+        default_lane : str
+            Имя полосы для обработчиков без флага.
+        resolve : Callable[[str], str], optional
+            Функция, преобразующая значение флага в имя полосы (например,
+            с учётом способа получения данных). По умолчанию значение флага
+            и есть имя полосы.
+        on_full : Callable[[TelegramObject, Lane], Awaitable[None]], optional
+            Функция, вызываемая, если очередь полосы заполнена (например,
+            для ответа пользователю).
+
+        """
+        self.lanes = lanes
+        self.default_lane = default_lane
+        self.resolve = resolve
+        self.on_full = on_full
+
+    def lane_for(self, data: Dict[str, Any]) -> Lane:
+        flag = get_flag(data, self.LANE_FLAG)
+        if flag is None:
+            return self.lanes[self.default_lane]
+        name = flag if self.resolve is None else self.resolve(flag)
+        return self.lanes.get(name, self.lanes[self.default_lane])
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]],
+                              Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]) -> Any:
+        lane = self.lane_for(data)
+        try:
+            await lane.acquire()
+        except LaneFullError as e:
+            logging.getLogger(__name__).warning("%s, stats: %s", e,
+                                                lane.stats())
+            if self.on_full is not None:
+                await self.on_full(event, lane)
+            return None
+        try:
+            return await handler(event, data)
+        finally:
+            lane.release()
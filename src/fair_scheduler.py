@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 14:37:15 2026
+
+@author: askh
+
+Содержит планировщик запросов к внешним источникам данных: у каждого
+пользователя своя ограниченная очередь, очереди обслуживаются по кругу
+(round robin), общее количество одновременно выполняемых запросов
+ограничено. Если запрос нельзя выполнить сразу, он ожидает в очереди (но не
+дольше заданного времени), а не отклоняется.
+"""
+
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class QueueFullError(Exception):
+    """Очередь пользователя заполнена"""
+
+
+class QueueTimeoutError(Exception):
+    """Истекло время ожидания в очереди"""
+
+
+class _QueueItem:
+
+    def __init__(self, future: asyncio.Future,
+                 admit: Callable[[], Awaitable[bool]]):
+        self.future = future
+        self.admit = admit
+        self.admitted = admit is None
+
+
+class FairScheduler:
+
+    DEFAULT_MAX_CONCURRENCY = 16
+    DEFAULT_MAX_QUEUE_PER_USER = 20
+    DEFAULT_MAX_WAIT_SEC = 10
+    DEFAULT_RETRY_INTERVAL_SEC = 0.2
+
+    def __init__(self,
+                 max_concurrency: int = None,
+                 max_queue_per_user: int = None,
+                 max_wait_sec: float = None,
+                 retry_interval_sec: float = None):
+        """
+        Parameters
+        ----------
+        max_concurrency : int, optional
+            Максимальное количество одновременно выполняемых запросов.
+        max_queue_per_user : int, optional
+            Максимальное количество запросов одного пользователя в очереди.
+        max_wait_sec : float, optional
+            Максимальное время ожидания запроса в очереди.
+        retry_interval_sec : float, optional
+            Интервал повторной проверки допуска запроса (см. run), в
+            секундах.
+
+        """
+        self.max_concurrency = self.DEFAULT_MAX_CONCURRENCY \
+            if max_concurrency is None else max_concurrency
+        self.max_queue_per_user = self.DEFAULT_MAX_QUEUE_PER_USER \
+            if max_queue_per_user is None else max_queue_per_user
+        self.max_wait_sec = self.DEFAULT_MAX_WAIT_SEC \
+            if max_wait_sec is None else max_wait_sec
+        self.retry_interval_sec = self.DEFAULT_RETRY_INTERVAL_SEC \
+            if retry_interval_sec is None else retry_interval_sec
+        self.running = 0
+        # Очереди пользователей в порядке обслуживания
+        self.queues: OrderedDict[Hashable, deque[_QueueItem]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    def position(self, user_id: Hashable, item: _QueueItem) -> int:
+        """
+        Оценка номера запроса в общей очереди (начиная с 1): перед ним будут
+        выполнены предыдущие запросы того же пользователя и не больше такого
+        же количества запросов каждого из остальных пользователей.
+        """
+        queue = self.queues.get(user_id)
+        if queue is None or item not in queue:
+            return 0
+        index = queue.index(item)
+        return index + 1 + sum(min(len(q), index + 1)
+                               for (u, q) in self.queues.items()
+                               if u != user_id)
+
+    def _remove(self, user_id: Hashable, item: _QueueItem):
+        queue = self.queues.get(user_id)
+        if queue is not None and item in queue:
+            queue.remove(item)
+            if not queue:
+                del self.queues[user_id]
+
+    def _dispatch(self):
+        progress = True
+        while progress and self.queues \
+                and self.running < self.max_concurrency:
+            progress = False
+            for user_id in list(self.queues):
+                if self.running >= self.max_concurrency:
+                    break
+                queue = self.queues[user_id]
+                item = queue[0]
+                if not item.admitted:
+                    continue
+                queue.popleft()
+                if queue:
+                    self.queues.move_to_end(user_id)
+                else:
+                    del self.queues[user_id]
+                self.running += 1
+                item.future.set_result(None)
+                progress = True
+
+    async def _admit(self, user_id: Hashable, item: _QueueItem):
+        """
+        Проверить допуск запроса, если он первый в очереди пользователя и
+        его можно начать выполнять.
+        """
+        queue = self.queues.get(user_id)
+        if item.admitted or not queue or queue[0] is not item \
+           or self.running >= self.max_concurrency:
+            return
+        if await item.admit():
+            item.admitted = True
+            self._dispatch()
+
+    async def _wait(self, user_id: Hashable, item: _QueueItem):
+        while not item.future.done():
+            await asyncio.wait(
+                (item.future,),
+                timeout=None if item.admitted else self.retry_interval_sec)
+            # Запрос ожидает допуска (например, освобождения лимита
+            # запросов) или своей очереди
+            await self._admit(user_id, item)
+
+    def _release(self):
+        self.running -= 1
+        self._dispatch()
+
+    async def run(self,
+                  user_id: Hashable,
+                  func: Callable[[], Awaitable[Any]],
+                  admit: Callable[[], Awaitable[bool]] = None,
+                  on_queued: Callable[[int], Awaitable[None]] = None) -> Any:
+        """
+        Выполнить запрос в порядке очереди.
+
+        Parameters
+        ----------
+        user_id : Hashable
+            Идентификатор пользователя.
+        func : Callable[[], Awaitable[Any]]
+            Функция, создающая корутину, которая выполняет запрос.
+        admit : Callable[[], Awaitable[bool]], optional
+            Функция допуска запроса (например, проверка лимита запросов),
+            вызывается, когда запрос первый в очереди пользователя и его
+            можно начать выполнять. Если она возвращает False, запрос
+            остаётся в очереди, и проверка повторяется через
+            retry_interval_sec.
+        on_queued : Callable[[int], Awaitable[None]], optional
+            Функция, вызываемая с номером запроса в очереди, если запрос
+            нельзя выполнить сразу.
+
+        Raises
+        ------
+        QueueFullError
+            Очередь пользователя заполнена.
+        QueueTimeoutError
+            Запрос не дождался выполнения за max_wait_sec.
+
+        Returns
+        -------
+        Any
+            Результат запроса.
+
+        """
+        queue = self.queues.get(user_id)
+        if queue is not None and len(queue) >= self.max_queue_per_user \
+           or self.max_queue_per_user <= 0:
+            raise QueueFullError(f"Queue is full for user {user_id}")
+        item = _QueueItem(asyncio.get_running_loop().create_future(), admit)
+        self.queues.setdefault(user_id, deque()).append(item)
+        self._dispatch()
+        try:
+            await self._admit(user_id, item)
+            if not item.future.done():
+                if on_queued is not None:
+                    await on_queued(self.position(user_id, item))
+                await asyncio.wait_for(self._wait(user_id, item),
+                                       self.max_wait_sec)
+        except asyncio.TimeoutError:
+            if not item.future.done():
+                self._remove(user_id, item)
+                raise QueueTimeoutError(
+                    f"Queue wait timeout for user {user_id}") from None
+        except BaseException:
+            if item.future.done():
+                self._release()
+            else:
+                self._remove(user_id, item)
+            raise
+        try:
+            return await func()
+        finally:
+            self._release()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 22 10:05:44 2026
+
+@author: askh
+
+Содержит хранилища состояний конечного автомата (FSM) пользователей с
+ограничением объёма: в памяти (записи удаляются, если не использовались
+заданное время, а при превышении количества записей удаляются давно не
+использовавшиеся) и в базе SQLite (состояния сохраняются при перезапуске
+бота и не занимают память процесса).
+"""
+
+import asyncio
+import json
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, time
+from typing import Any, Callable, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+
+def key_tuple(key: StorageKey) -> tuple:
+    return (key.bot_id, key.chat_id, key.user_id, key.thread_id,
+            key.business_connection_id, key.destiny)
+
+
+def state_name(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+class _Record:
+
+    __slots__ = ('state', 'data', 'expires')
+
+    def __init__(self, expires: float):
+        self.state = None
+        # Пустые данные не хранятся
+        self.data = None
+        self.expires = expires
+
+
+class BoundedMemoryStorage(BaseStorage):
+
+    DEFAULT_MAX_ENTRIES = 100000
+    DEFAULT_IDLE_TTL_SEC = 24 * 60 * 60
+
+    def __init__(self,
+                 max_entries: int = None,
+                 idle_ttl_sec: float = None,
+                 clock: Callable[[], float] = monotonic):
+        """
+        Parameters
+        ----------
+        max_entries : int, optional
+            Максимальное количество записей.
+        idle_ttl_sec : float, optional
+            Время, после которого удаляется неиспользуемая запись, в
+            секундах.
+        clock : Callable[[], float], optional
+            Функция, возвращающая текущее время в секундах.
+
+        """
+        self.max_entries = self.DEFAULT_MAX_ENTRIES if max_entries is None \
+            else max_entries
+        self.idle_ttl_sec = self.DEFAULT_IDLE_TTL_SEC if idle_ttl_sec is None \
+            else idle_ttl_sec
+        self.clock = clock
+        self.evictions = 0
+        self.expirations = 0
+        # Порядок - от давно использовавшихся записей к недавно
+        # использовавшимся (а значит, и по моменту устаревания)
+        self.records: OrderedDict[tuple, _Record] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _expire(self, now: float):
+        while self.records:
+            record = next(iter(self.records.values()))
+            if record.expires > now:
+                break
+            self.records.popitem(last=False)
+            self.expirations += 1
+
+    def _get(self, key: StorageKey) -> Optional[_Record]:
+        now = self.clock()
+        self._expire(now)
+        k = key_tuple(key)
+        record = self.records.get(k)
+        if record is not None:
+            record.expires = now + self.idle_ttl_sec
+            self.records.move_to_end(k)
+        return record
+
+    def _update(self, key: StorageKey, field: str, value: Any):
+        record = self._get(key)
+        if record is None:
+            if value is None:
+                return
+            record = _Record(self.clock() + self.idle_ttl_sec)
+            self.records[key_tuple(key)] = record
+            while len(self.records) > self.max_entries:
+                self.records.popitem(last=False)
+                self.evictions += 1
+        setattr(record, field, value)
+        if record.state is None and record.data is None:
+            del self.records[key_tuple(key)]
+
+    async def set_state(self, key: StorageKey, state: StateType = None):
+        self._update(key, 'state', state_name(state))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._get(key)
+        return None if record is None else record.state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]):
+        self._update(key, 'data', dict(data) if data else None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._get(key)
+        if record is None or record.data is None:
+            return {}
+        return record.data.copy()
+
+    async def close(self):
+        self.records.clear()
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self.records),
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class SqliteFsmStorage(BaseStorage):
+    """
+    Хранилище в базе SQLite. Данные хранятся в формате JSON. Записи, которые
+    не изменялись idle_ttl_sec (чтение не продлевает время жизни записи,
+    чтобы не выполнять запись в базу при каждом обновлении), считаются
+    устаревшими и удаляются не чаще, чем раз в purge_interval_sec.
+    Операции с базой выполняются по очереди в отдельном потоке, чтобы
+    ожидание блокировки базы другим процессом не останавливало цикл
+    событий бота.
+    """
+
+    DEFAULT_IDLE_TTL_SEC = BoundedMemoryStorage.DEFAULT_IDLE_TTL_SEC
+    DEFAULT_TIMEOUT_SEC = 5
+    DEFAULT_PURGE_INTERVAL_SEC = 60
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS fsm (
+               key TEXT PRIMARY KEY,
+               state TEXT,
+               data TEXT,
+               expires REAL NOT NULL) WITHOUT ROWID""",
+        """CREATE INDEX IF NOT EXISTS fsm_expires ON fsm (expires)""",
+    )
+
+    def __init__(self,
+                 path: str,
+                 idle_ttl_sec: float = None,
+                 timeout_sec: float = None,
+                 purge_interval_sec: float = None,
+                 clock: Callable[[], float] = time):
+        """
+        Parameters
+        ----------
+        path : str
+            Путь к файлу базы данных.
+        idle_ttl_sec : float, optional
+            Время, после которого удаляется неиспользуемая запись, в
+            секундах.
+        timeout_sec : float, optional
+            Максимальное время ожидания блокировки базы другим процессом,
+            в секундах.
+        purge_interval_sec : float, optional
+            Интервал удаления устаревших записей, в секундах.
+        clock : Callable[[], float], optional
+            Функция, возвращающая текущее время в секундах (время должно
+            сохраняться при перезапуске).
+
+        """
+        self.path = path
+        self.idle_ttl_sec = self.DEFAULT_IDLE_TTL_SEC if idle_ttl_sec is None \
+            else idle_ttl_sec
+        self.purge_interval_sec = self.DEFAULT_PURGE_INTERVAL_SEC \
+            if purge_interval_sec is None else purge_interval_sec
+        self.clock = clock
+        self.purged = None
+        # Поток, в котором выполняются операции с базой
+        self.executor = ThreadPoolExecutor(max_workers=1,
+                                           thread_name_prefix='fsm-sqlite')
+        self.connection = sqlite3.connect(
+            path,
+            timeout=self.DEFAULT_TIMEOUT_SEC if timeout_sec is None
+            else timeout_sec,
+            isolation_level=None,
+            check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            for statement in self.SCHEMA:
+                self.connection.execute(statement)
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return json.dumps(key_tuple(key), separators=(',', ':'))
+
+    def _purge(self, now: float):
+        if self.purged is None or now - self.purged >= self.purge_interval_sec:
+            self.purged = now
+            self.connection.execute('DELETE FROM fsm WHERE expires <= ?',
+                                    (now,))
+
+    def _get(self, key: StorageKey) -> (Optional[str], Optional[str]):
+        now = self.clock()
+        self._purge(now)
+        row = self.connection.execute(
+            'SELECT state, data, expires FROM fsm WHERE key = ?',
+            (self._key(key),)).fetchone()
+        if row is None or row[2] <= now:
+            return (None, None)
+        return (row[0], row[1])
+
+    def _update(self, key: StorageKey, field: str, value: Optional[str]):
+        now = self.clock()
+        self._purge(now)
+        k = self._key(key)
+        cursor = self.connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            row = cursor.execute(
+                'SELECT state, data FROM fsm WHERE key = ? AND expires > ?',
+                (k, now)).fetchone()
+            record = {'state': None, 'data': None} if row is None \
+                else {'state': row[0], 'data': row[1]}
+            record[field] = value
+            if record['state'] is None and record['data'] is None:
+                cursor.execute('DELETE FROM fsm WHERE key = ?', (k,))
+            else:
+                cursor.execute(
+                    'INSERT OR REPLACE INTO fsm (key, state, data, expires) '
+                    'VALUES (?, ?, ?, ?)',
+                    (k, record['state'], record['data'],
+                     now + self.idle_ttl_sec))
+            cursor.execute('COMMIT')
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            cursor.close()
+
+    async def _run(self, func: Callable, *args) -> Any:
+        """
+        Выполнить операцию с базой в потоке хранилища.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, func, *args)
+
+    async def set_state(self, key: StorageKey, state: StateType = None):
+        await self._run(self._update, key, 'state', state_name(state))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._run(self._get, key))[0]
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]):
+        await self._run(self._update, key, 'data',
+                        json.dumps(data, separators=(',', ':')) if data
+                        else None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        data = (await self._run(self._get, key))[1]
+        return {} if data is None else json.loads(data)
+
+    async def close(self):
+        await self._run(self.connection.close)
+        self.executor.shutdown()
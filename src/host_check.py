@@ -6,11 +6,136 @@ Created on Sat Nov 16 19:19:49 2024
 @author: askh
 """
 
-import copy
+from bisect import bisect_right
 import ipaddress
 import logging
 import re
-from typing import Any
+from typing import Any, Iterable
+
+
+class IpIntervalIndex:
+    """
+    Набор сетей одной версии IP в виде отсортированных непересекающихся
+    интервалов адресов. Пересекающиеся и смежные сети объединяются, поиск
+    адреса выполняется двоичным поиском за O(log n).
+    """
+
+    def __init__(self, networks: Iterable[ipaddress._BaseNetwork]):
+        intervals = sorted((int(net.network_address),
+                            int(net.broadcast_address))
+                           for net in networks)
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+        for (start, end) in intervals:
+            if self.ends and start <= self.ends[-1] + 1:
+                if end > self.ends[-1]:
+                    self.ends[-1] = end
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def find(self, ip: int) -> (int, int):
+        """
+        Найти интервал, содержащий адрес.
+
+        Parameters
+        ----------
+        ip : int
+            Адрес в виде целого числа.
+
+        Returns
+        -------
+        (int, int)
+            Начало и конец интервала, либо None, если адрес не входит ни в
+            один интервал.
+
+        """
+        i = bisect_right(self.starts, ip) - 1
+        if i >= 0 and ip <= self.ends[i]:
+            return (self.starts[i], self.ends[i])
+        return None
+
+
+def normalize_hostname(name: str) -> str:
+    """
+    Привести имя хоста к виду для сравнения: нижний регистр, без завершающей
+    точки, национальные символы в кодировке IDNA.
+
+    Parameters
+    ----------
+    name : str
+        Имя хоста.
+
+    Returns
+    -------
+    str
+        Нормализованное имя.
+
+    """
+    name = name.rstrip('.').lower()
+    try:
+        return name.encode('idna').decode('ascii')
+    except UnicodeError:
+        return name
+
+
+class HostnameTrie:
+    """
+    Набор запрещённых имён хостов в виде дерева меток, начиная с домена
+    верхнего уровня. Поддерживаются точные имена (example.com) и шаблоны
+    вида *.example.com, которым соответствуют все поддомены example.com
+    (но не сам example.com). Проверка имени выполняется за O(число меток).
+    """
+
+    WILDCARD_PREFIX = '*.'
+
+    # Ключи-признаки в узлах дерева (метки - строки, поэтому не совпадают
+    # с этими ключами)
+    _EXACT = 0
+    _WILDCARD = 1
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self.root: dict = {}
+        self.size = 0
+        for pattern in patterns:
+            self.add(pattern)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, pattern: str):
+        """
+        Добавить имя или шаблон вида *.example.com.
+        """
+        pattern = pattern.strip()
+        wildcard = pattern.startswith(self.WILDCARD_PREFIX)
+        if wildcard:
+            pattern = pattern[len(self.WILDCARD_PREFIX):]
+        node = self.root
+        for label in reversed(normalize_hostname(pattern).split('.')):
+            node = node.setdefault(label, {})
+        flag = self._WILDCARD if wildcard else self._EXACT
+        if flag not in node:
+            node[flag] = True
+            self.size += 1
+
+    def match(self, name: str) -> bool:
+        """
+        Проверить, соответствует ли имя хоста какому-либо имени или шаблону.
+        """
+        labels = normalize_hostname(name).split('.')
+        node = self.root
+        last = len(labels) - 1
+        for (i, label) in enumerate(reversed(labels)):
+            node = node.get(label)
+            if node is None:
+                return False
+            if i < last and self._WILDCARD in node:
+                return True
+        return self._EXACT in node
 
 
 class HostChecker:
@@ -29,7 +154,7 @@ class HostChecker:
         f"\\A(?:{DOMAIN_NAME_CHARS_BE}+\\.)*{DOMAIN_NAME_CHARS_BE}+\\.?\\Z",
         re.I)
 
-    IP4_RE = re.compile(r'\A(\d+\.){3}\d\Z')
+    IP4_RE = re.compile(r'\A(\d+\.){3}\d+\Z')
     IP6_RE = re.compile(r'\A[0-9a-f:]+\Z', re.I)
 
     # Возможные результаты проверок адресов
@@ -48,7 +173,8 @@ class HostChecker:
                  hostname_max_len=None,
                  restricted_hostnames=[],
                  restricted_ipv4=[],
-                 restricted_ipv6=[]):
+                 restricted_ipv6=[],
+                 blocklist=None):
         logger = logging.getLogger(__name__)
         self.hostname_min_len = \
             self._change_none(hostname_min_len,
@@ -56,23 +182,34 @@ class HostChecker:
         self.hostname_max_len = \
             self._change_none(hostname_max_len,
                               self.DEFAULT_HOSTNAME_MAX_LEN)
-        self.restricted_hostnames = copy.copy(restricted_hostnames)
+        self.restricted_hostnames = HostnameTrie(restricted_hostnames)
+        # Дополнительный список запрещённых сетей и имён (например,
+        # BlocklistIndex); должен иметь методы contains_ip и match_hostname
+        self.blocklist = blocklist
 
-        self.restricted_ipv4 = []
-        for i in restricted_ipv4:
-            try:
-                ipv4 = ipaddress.ip_network(i)
-                self.restricted_ipv4.append(ipv4)
-            except ValueError:
-                logger.error("Can't parse IPv4 address %s", i)
+        self.restricted_ipv4 = \
+            IpIntervalIndex(self._parse_networks(restricted_ipv4, 4))
+        self.restricted_ipv6 = \
+            IpIntervalIndex(self._parse_networks(restricted_ipv6, 6))
 
-        self.restricted_ipv6 = []
-        for i in restricted_ipv6:
+    @staticmethod
+    def _parse_networks(networks: Iterable[str],
+                        version: int) -> list[ipaddress._BaseNetwork]:
+        logger = logging.getLogger(__name__)
+        result = []
+        for i in networks:
             try:
-                ipv6 = ipaddress.ip_network(i)
-                self.restricted_ipv6.append(ipv6)
+                net = ipaddress.ip_network(i)
             except ValueError:
-                logger.error("Can't parse IPv6 address %s", i)
+                logger.error("Can't parse IPv%d address %s", version, i)
+                continue
+            if net.version != version:
+                # Сеть другой версии никогда не совпадёт с адресом версии
+                # version, поэтому пропускается
+                logger.error("Not an IPv%d network: %s", version, i)
+                continue
+            result.append(net)
+        return result
 
     def check_len(self, name: str) -> bool:
         """
@@ -112,9 +249,10 @@ class HostChecker:
             return self.ADDRESS_INCORRECT
         if not re.match(self.DOMAIN_RE, name):
             return self.ADDRESS_INCORRECT
-        for h in self.restricted_hostnames:
-            if name == h:
-                return self.ADDRESS_DENIED
+        if self.restricted_hostnames.match(name):
+            return self.ADDRESS_DENIED
+        if self.blocklist is not None and self.blocklist.match_hostname(name):
+            return self.ADDRESS_DENIED
         return self.ADDRESS_OK
 
     def check_ip(self, ip_str: str) -> int:
@@ -122,21 +260,25 @@ class HostChecker:
         try:
             ip = ipaddress.ip_address(ip_str)
             if ip.version == 4:
-                net_list = self.restricted_ipv4
+                net_index = self.restricted_ipv4
             elif ip.version == 6:
-                net_list = self.restricted_ipv6
+                net_index = self.restricted_ipv6
             else:
                 logger.error("Unknown address type for %s", ip_str)
                 return self.ADDRESS_INCORRECT
         except ValueError:
             logger.error("Incorrect address: %s", ip_str)
             return self.ADDRESS_INCORRECT
-        for net in net_list:
-            if ip in net:
-                logger.debug("IP %s in restricted net %s",
-                             ip_str,
-                             str(net))
-                return self.ADDRESS_DENIED
+        interval = net_index.find(int(ip))
+        if interval is not None:
+            logger.debug("IP %s in restricted range %s - %s",
+                         ip_str,
+                         str(type(ip)(interval[0])),
+                         str(type(ip)(interval[1])))
+            return self.ADDRESS_DENIED
+        if self.blocklist is not None and self.blocklist.contains_ip(ip):
+            logger.debug("IP %s in blocklist", ip_str)
+            return self.ADDRESS_DENIED
         return self.ADDRESS_OK
 
     def check_host(self, addr: str) -> int:
@@ -0,0 +1,761 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 16:20:55 2026
+
+@author: askh
+
+Содержит класс для получения заголовков HTTP сайта. Имя хоста разрешается
+один раз, все полученные адреса проверяются HostChecker, и соединение
+устанавливается с проверенным адресом (имя хоста используется только для SNI
+и заголовка Host), поэтому подмена адреса при повторном разрешении имени
+(DNS rebinding) невозможна.
+"""
+
+import asyncio
+import logging
+import re
+import socket
+import ssl
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+from urllib.parse import urljoin, urlparse
+
+from connection_pool import ConnectionPool, PooledConnection, \
+    ResumingSSLContext
+
+
+class ProbeError(Exception):
+    """Ошибка получения заголовков"""
+
+
+class AccessDeniedError(ProbeError):
+    """Имя хоста разрешается в запрещённый адрес"""
+
+
+class ResolveError(ProbeError):
+    """Не удалось разрешить имя хоста"""
+
+
+class HeadersTooBigError(ProbeError):
+    """Заголовки слишком велики"""
+
+
+class EmptyResponseError(ProbeError):
+    """Сервер закрыл соединение, не отправив ответ"""
+
+
+class BadResponseError(ProbeError):
+    """Некорректный ответ сервера"""
+
+
+# Этапы получения заголовков, на которых может истечь время ожидания
+PHASE_RESOLVE = 'resolve'
+PHASE_CONNECT = 'connect'
+PHASE_TLS = 'tls'
+PHASE_FIRST_BYTE = 'first_byte'
+PHASE_READ = 'read'
+
+
+class ProbeTimeoutError(ProbeError, TimeoutError):
+    """Истекло время ожидания на одном из этапов (см. PHASE_*)"""
+
+    def __init__(self, phase: str, timeout_sec: float):
+        super().__init__(f"Timeout ({timeout_sec} s) at phase {phase}")
+        self.phase = phase
+        self.timeout_sec = timeout_sec
+
+
+@dataclass
+class ResponseHead:
+    """
+    Строка статуса и заголовки ответа HTTP.
+    """
+    version: str
+    status: int
+    reason: str
+    headers: list[tuple[str, str]]
+    # Строка статуса и заголовки в том виде, в котором они получены
+    text: str
+    # Начало тела ответа, прочитанное вместе с заголовками
+    body_prefix: bytes = b''
+    # Момент получения первого байта ответа (по часам цикла событий)
+    first_byte_time: float = None
+
+    def header(self, name: str) -> str:
+        """
+        Значение заголовка (последнее, если заголовок повторяется), либо
+        None, если заголовка нет. Имя заголовка - в нижнем регистре.
+        """
+        value = None
+        for (header_name, header_value) in self.headers:
+            if header_name.lower() == name:
+                value = header_value
+        return value
+
+
+@dataclass
+class ProbeTimings:
+    """
+    Время выполнения этапов запроса, в секундах (None - этап не
+    выполнялся, например, соединение установлено ранее).
+    """
+    dns_sec: float = None
+    connect_sec: float = None
+    tls_sec: float = None
+    first_byte_sec: float = None
+    total_sec: float = None
+    # Адрес, с которым установлено соединение
+    address: str = None
+    # Соединение взято из пула
+    reused: bool = False
+    # Сессия TLS возобновлена
+    tls_resumed: bool = False
+
+
+@dataclass
+class ProbeResult:
+    url: str
+    addresses: list[str]
+    head: ResponseHead
+    timings: ProbeTimings
+
+
+HEAD_END = b'\r\n\r\n'
+
+
+def _remaining(deadline: float) -> float:
+    if deadline is None:
+        return None
+    return max(0, deadline - asyncio.get_running_loop().time())
+
+
+async def read_response_head(reader: asyncio.StreamReader,
+                             max_bytes: int,
+                             timeout_sec: float = None,
+                             first_byte_timeout_sec: float = None
+                             ) -> ResponseHead:
+    """
+    Прочитать строку статуса и заголовки ответа HTTP. Чтение прекращается,
+    как только получена пустая строка (конец заголовков), либо прочитано
+    max_bytes байт, либо истекло время timeout_sec (или
+    first_byte_timeout_sec до получения первого байта ответа).
+
+    Parameters
+    ----------
+    reader : asyncio.StreamReader
+        Поток ответа.
+    max_bytes : int
+        Максимальный размер заголовков вместе с завершающей пустой строкой.
+    timeout_sec : float, optional
+        Максимальное время чтения заголовков.
+    first_byte_timeout_sec : float, optional
+        Максимальное время ожидания первого байта ответа.
+
+    Raises
+    ------
+    HeadersTooBigError
+        Заголовки больше max_bytes.
+    EmptyResponseError
+        Соединение закрыто до получения каких-либо данных.
+    BadResponseError
+        Соединение закрыто до конца заголовков, либо некорректна строка
+        статуса.
+    ProbeTimeoutError
+        Истекло время ожидания первого байта или чтения.
+
+    Returns
+    -------
+    ResponseHead
+        Разобранные заголовки.
+
+    """
+    deadline = None if timeout_sec is None \
+        else asyncio.get_running_loop().time() + timeout_sec
+    buffer = bytearray()
+    first_byte_time = None
+    end = -1
+    while end < 0:
+        if len(buffer) >= max_bytes:
+            raise HeadersTooBigError(
+                f"HTTP headers are bigger than {max_bytes} bytes")
+        (phase, timeout) = (PHASE_READ, _remaining(deadline))
+        if not buffer and first_byte_timeout_sec is not None \
+           and (timeout is None or first_byte_timeout_sec < timeout):
+            (phase, timeout) = (PHASE_FIRST_BYTE, first_byte_timeout_sec)
+        try:
+            chunk = await asyncio.wait_for(
+                reader.read(max_bytes - len(buffer)), timeout)
+        except asyncio.TimeoutError:
+            raise ProbeTimeoutError(
+                phase,
+                timeout_sec if phase == PHASE_READ
+                else first_byte_timeout_sec) from None
+        if not chunk:
+            if not buffer:
+                raise EmptyResponseError("Connection closed without response")
+            raise BadResponseError("Connection closed inside HTTP headers")
+        if first_byte_time is None:
+            first_byte_time = asyncio.get_running_loop().time()
+        # Конец заголовков мог начаться в предыдущем фрагменте
+        start = max(0, len(buffer) - len(HEAD_END) + 1)
+        buffer += chunk
+        end = buffer.find(HEAD_END, start)
+    # Строка статуса и заголовки вместе с завершающим последнюю строку \r\n
+    text = bytes(buffer[:end + 2]).decode(errors='replace')
+    lines = text.split('\r\n')
+    status_parts = lines[0].split(' ', 2)
+    if len(status_parts) < 2 or not status_parts[0].startswith('HTTP/') \
+       or not status_parts[1].isdigit():
+        raise BadResponseError(f"Bad HTTP status line: {lines[0]!r}")
+    headers = []
+    for line in lines[1:-1]:
+        (name, separator, value) = line.partition(':')
+        if separator:
+            headers.append((name.strip(), value.strip()))
+    return ResponseHead(
+        version=status_parts[0],
+        status=int(status_parts[1]),
+        reason=status_parts[2] if len(status_parts) > 2 else '',
+        headers=headers,
+        text=text,
+        body_prefix=bytes(buffer[end + len(HEAD_END):]),
+        first_byte_time=first_byte_time)
+
+
+async def read_exactly(reader: asyncio.StreamReader, size: int,
+                       timeout_sec: float = None) -> bytes:
+    """
+    Прочитать ровно size байт за время не больше timeout_sec.
+    """
+    if size <= 0:
+        return b''
+    try:
+        return await asyncio.wait_for(reader.readexactly(size), timeout_sec)
+    except asyncio.TimeoutError:
+        raise ProbeTimeoutError(PHASE_READ, timeout_sec) from None
+
+
+def interleave_addresses(addresses: list[str]) -> list[str]:
+    """
+    Упорядочить адреса для попыток соединения (RFC 8305): адреса IPv6 и
+    IPv4 чередуются, начиная с семейства первого адреса.
+    """
+    families = ([a for a in addresses if ':' in a],
+                [a for a in addresses if ':' not in a])
+    if addresses and ':' not in addresses[0]:
+        families = families[::-1]
+    result = []
+    for i in range(max(len(families[0]), len(families[1]))):
+        for family in families:
+            if i < len(family):
+                result.append(family[i])
+    return result
+
+
+async def connect_socket(address: str, port: int) -> socket.socket:
+    """
+    Установить соединение TCP с адресом.
+    """
+    family = socket.AF_INET6 if ':' in address else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    try:
+        await asyncio.get_running_loop().sock_connect(sock, (address, port))
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+async def connect_happy_eyeballs(
+        addresses: list[str],
+        port: int,
+        delay_sec: float,
+        timeout_sec: float = None,
+        connect: Callable[[str, int], Awaitable[socket.socket]] = connect_socket
+        ) -> socket.socket:
+    """
+    Установить соединение TCP с одним из адресов (RFC 8305): попытки
+    соединения начинаются по очереди с интервалом delay_sec (или сразу после
+    неудачи предыдущей попытки) и выполняются одновременно; используется
+    первое установленное соединение, остальные попытки отменяются.
+
+    Parameters
+    ----------
+    addresses : list[str]
+        Адреса.
+    port : int
+        Порт.
+    delay_sec : float
+        Интервал между началом попыток.
+    timeout_sec : float, optional
+        Максимальное общее время установки соединения.
+    connect : Callable[[str, int], Awaitable[socket.socket]], optional
+        Функция установки соединения с одним адресом.
+
+    Raises
+    ------
+    ProbeTimeoutError
+        Истекло время установки соединения.
+    OSError
+        Ни с одним из адресов не удалось установить соединение.
+
+    Returns
+    -------
+    socket.socket
+        Сокет установленного соединения.
+
+    """
+    logger = logging.getLogger(__name__)
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout_sec is None else loop.time() + timeout_sec
+    queue = interleave_addresses(addresses)
+    attempts: dict[asyncio.Task, str] = {}
+    errors = []
+    try:
+        while queue or attempts:
+            if queue:
+                address = queue.pop(0)
+                attempts[asyncio.ensure_future(connect(address, port))] = \
+                    address
+            wait_sec = _remaining(deadline)
+            if queue and (wait_sec is None or delay_sec < wait_sec):
+                wait_sec = delay_sec
+            (done, _) = await asyncio.wait(
+                attempts, timeout=wait_sec,
+                return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                address = attempts.pop(task)
+                if task.exception() is None:
+                    logger.debug("Connected to %s port %d", address, port)
+                    return task.result()
+                logger.debug("Can't connect to %s port %d: %s",
+                             address, port, task.exception())
+                errors.append(task.exception())
+            if not done and _remaining(deadline) == 0:
+                raise ProbeTimeoutError(PHASE_CONNECT, timeout_sec)
+    finally:
+        for task in attempts:
+            task.cancel()
+        if attempts:
+            # Попытка могла завершиться успешно одновременно с отменой
+            for result in await asyncio.gather(*attempts,
+                                               return_exceptions=True):
+                if isinstance(result, socket.socket):
+                    result.close()
+    raise OSError(f"Can't connect to port {port} of any address: "
+                  + '; '.join(str(e) for e in errors))
+
+
+def idna_host(host: str) -> str:
+    """
+    Преобразовать имя хоста с национальными символами в кодировку IDNA.
+
+    Parameters
+    ----------
+    host : str
+        Имя хоста.
+
+    Returns
+    -------
+    str
+        Имя хоста в кодировке ASCII.
+
+    """
+    if re.match(r'\A[a-z0-9.-]*\Z', host, re.I):
+        return host
+    host_parts = []
+    for p in host.split('.'):
+        if not re.match(r'\A[a-z0-9-]*\Z', p, re.I):
+            host_parts.append('xn--' + p.encode('punycode').decode())
+        else:
+            host_parts.append(p)
+    return '.'.join(host_parts)
+
+
+async def system_resolve(host: str, port: int) -> list[str]:
+    """
+    Разрешить имя хоста системным резолвером.
+
+    Returns
+    -------
+    list[str]
+        Адреса хоста (без повторов, в порядке, возвращённом резолвером).
+
+    """
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(host, port,
+                                   type=socket.SOCK_STREAM,
+                                   proto=socket.IPPROTO_TCP)
+    addresses = []
+    for (_, _, _, _, sockaddr) in infos:
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    return addresses
+
+
+class HttpProbe:
+
+    DEFAULT_MAX_HEADERS_LENGTH = 2048
+    # Максимальный размер тела ответа, которое дочитывается, чтобы вернуть
+    # соединение в пул (большие ответы проще не дочитывать, а закрыть
+    # соединение)
+    MAX_DRAIN_BYTES = 64 * 1024
+    DEFAULT_READ_TIMEOUT_SEC = 15
+    DEFAULT_RESOLVE_TIMEOUT_SEC = 10
+    DEFAULT_CONNECT_TIMEOUT_SEC = 10
+    DEFAULT_TLS_TIMEOUT_SEC = 10
+    DEFAULT_FIRST_BYTE_TIMEOUT_SEC = 10
+    # Интервал между попытками соединения с разными адресами (RFC 8305)
+    DEFAULT_HAPPY_EYEBALLS_DELAY_SEC = 0.25
+
+    def __init__(self,
+                 host_checker,
+                 resolver: Callable[[str, int], Awaitable[list[str]]] = None,
+                 ssl_context: ssl.SSLContext = None,
+                 max_headers_length: int = None,
+                 pool: ConnectionPool = None,
+                 read_timeout_sec: float = None,
+                 resolve_timeout_sec: float = None,
+                 connect_timeout_sec: float = None,
+                 tls_timeout_sec: float = None,
+                 first_byte_timeout_sec: float = None,
+                 happy_eyeballs_delay_sec: float = None):
+        """
+        Parameters
+        ----------
+        host_checker : HostChecker
+            Объект для проверки имён хостов и адресов.
+        resolver : Callable[[str, int], Awaitable[list[str]]], optional
+            Функция разрешения имени хоста в список адресов. По умолчанию
+            используется системный резолвер.
+        ssl_context : ssl.SSLContext, optional
+            Контекст TLS. По умолчанию - общий для всех соединений контекст
+            с проверкой сертификатов и возобновлением сессий.
+        max_headers_length : int, optional
+            Максимальный размер заголовков.
+        pool : ConnectionPool, optional
+            Пул соединений keep-alive.
+        read_timeout_sec : float, optional
+            Максимальное время чтения заголовков ответа (и тела ответа,
+            которое дочитывается для повторного использования соединения).
+        resolve_timeout_sec : float, optional
+            Максимальное время разрешения имени хоста.
+        connect_timeout_sec : float, optional
+            Максимальное время установки соединения TCP.
+        tls_timeout_sec : float, optional
+            Максимальное время рукопожатия TLS.
+        first_byte_timeout_sec : float, optional
+            Максимальное время от отправки запроса до первого байта ответа.
+        happy_eyeballs_delay_sec : float, optional
+            Интервал между началом попыток соединения с разными адресами.
+
+        """
+        self.host_checker = host_checker
+        self.resolver = system_resolve if resolver is None else resolver
+        self.ssl_context = ResumingSSLContext.create_default() \
+            if ssl_context is None else ssl_context
+        self.max_headers_length = \
+            self.DEFAULT_MAX_HEADERS_LENGTH if max_headers_length is None \
+            else max_headers_length
+        self.pool = ConnectionPool() if pool is None else pool
+        self.read_timeout_sec = self.DEFAULT_READ_TIMEOUT_SEC \
+            if read_timeout_sec is None else read_timeout_sec
+        self.resolve_timeout_sec = self.DEFAULT_RESOLVE_TIMEOUT_SEC \
+            if resolve_timeout_sec is None else resolve_timeout_sec
+        self.connect_timeout_sec = self.DEFAULT_CONNECT_TIMEOUT_SEC \
+            if connect_timeout_sec is None else connect_timeout_sec
+        self.tls_timeout_sec = self.DEFAULT_TLS_TIMEOUT_SEC \
+            if tls_timeout_sec is None else tls_timeout_sec
+        self.first_byte_timeout_sec = self.DEFAULT_FIRST_BYTE_TIMEOUT_SEC \
+            if first_byte_timeout_sec is None else first_byte_timeout_sec
+        self.happy_eyeballs_delay_sec = \
+            self.DEFAULT_HAPPY_EYEBALLS_DELAY_SEC \
+            if happy_eyeballs_delay_sec is None else happy_eyeballs_delay_sec
+
+    async def close(self):
+        await self.pool.close()
+
+    async def resolve(self, host: str, port: int) -> list[str]:
+        """
+        Разрешить имя хоста и проверить все полученные адреса.
+
+        Parameters
+        ----------
+        host : str
+            Имя хоста (в кодировке IDNA) или IP-адрес.
+        port : int
+            Порт.
+
+        Raises
+        ------
+        ResolveError
+            Имя не удалось разрешить.
+        ProbeTimeoutError
+            Истекло время разрешения имени.
+        AccessDeniedError
+            Хотя бы один из адресов запрещён.
+
+        Returns
+        -------
+        list[str]
+            Проверенные адреса.
+
+        """
+        logger = logging.getLogger(__name__)
+        try:
+            addresses = await asyncio.wait_for(self.resolver(host, port),
+                                               self.resolve_timeout_sec)
+        except asyncio.TimeoutError:
+            raise ProbeTimeoutError(PHASE_RESOLVE, self.resolve_timeout_sec) \
+                from None
+        except OSError as e:
+            raise ResolveError(f"Can't resolve {host}: {e}") from e
+        if not addresses:
+            raise ResolveError(f"No addresses for {host}")
+        for addr in addresses:
+            if self.host_checker.check_ip(addr) != \
+               self.host_checker.ADDRESS_OK:
+                logger.warning("Host %s resolves to restricted address %s",
+                               host, addr)
+                raise AccessDeniedError(
+                    f"Host {host} resolves to restricted address {addr}")
+        logger.debug("Host %s resolves to %s", host, addresses)
+        return addresses
+
+    def _body_length(self, head: ResponseHead) -> int:
+        """
+        Длина тела ответа, которое можно прочитать, чтобы использовать
+        соединение повторно, либо None, если соединение повторно
+        использовать нельзя.
+        """
+        if head.version != 'HTTP/1.1':
+            return None
+        connection = head.header('connection')
+        if connection is not None and 'close' in connection.lower():
+            return None
+        if head.header('transfer-encoding') is not None:
+            return None
+        if head.status in (204, 304) or 100 <= head.status < 200:
+            return 0
+        content_length = head.header('content-length')
+        if content_length is None or not content_length.isdigit():
+            return None
+        if int(content_length) > self.MAX_DRAIN_BYTES:
+            return None
+        return int(content_length)
+
+    async def _connect(self, addresses: list[str], port: int, host: str,
+                       use_ssl: bool,
+                       timings: ProbeTimings) -> PooledConnection:
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        sock = await connect_happy_eyeballs(addresses, port,
+                                            self.happy_eyeballs_delay_sec,
+                                            self.connect_timeout_sec)
+        timings.address = sock.getpeername()[0]
+        timings.connect_sec = loop.time() - start_time
+        start_time = loop.time()
+        try:
+            with ResumingSSLContext.connecting(port):
+                (reader, writer) = await asyncio.wait_for(
+                    asyncio.open_connection(
+                        sock=sock,
+                        ssl=self.ssl_context if use_ssl else None,
+                        server_hostname=host if use_ssl else None),
+                    self.tls_timeout_sec)
+        except asyncio.TimeoutError:
+            sock.close()
+            raise ProbeTimeoutError(PHASE_TLS, self.tls_timeout_sec) \
+                from None
+        except BaseException:
+            sock.close()
+            raise
+        if use_ssl:
+            timings.tls_sec = loop.time() - start_time
+            timings.tls_resumed = \
+                writer.get_extra_info('ssl_object').session_reused
+        return PooledConnection(reader, writer)
+
+    async def _exchange(self, connection: PooledConnection,
+                        request_data: bytes,
+                        timings: ProbeTimings) -> ResponseHead:
+        connection.writer.write(request_data)
+        await connection.writer.drain()
+        connection.requests += 1
+        sent_time = asyncio.get_running_loop().time()
+        head = await read_response_head(connection.reader,
+                                        self.max_headers_length,
+                                        self.read_timeout_sec,
+                                        self.first_byte_timeout_sec)
+        timings.first_byte_sec = head.first_byte_time - sent_time
+        return head
+
+    async def probe(self, url: str,
+                    addresses: list[str] = None) -> ProbeResult:
+        """
+        Выполнить запрос GET к сайту и получить заголовки ответа и время
+        выполнения отдельных этапов запроса.
+
+        Parameters
+        ----------
+        url : str
+            Адрес вида https://example.com:8443/path.
+        addresses : list[str], optional
+            Уже разрешённые и проверенные адреса хоста (если не указаны,
+            имя хоста разрешается).
+
+        Raises
+        ------
+        ProbeError
+            См. описание классов-наследников.
+            Истечение времени ожидания - ProbeTimeoutError.
+        OSError
+            Ошибка соединения.
+
+        Returns
+        -------
+        ProbeResult
+            Заголовки ответа и время выполнения этапов.
+
+        """
+        logger = logging.getLogger(__name__)
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        timings = ProbeTimings()
+
+        url_parsed = urlparse(url)
+        use_ssl = url_parsed.scheme == 'https'
+        host = idna_host(url_parsed.hostname)
+        port = url_parsed.port
+        if port is None:
+            port = 443 if use_ssl else 80
+        path = url_parsed.path or '/'
+        if url_parsed.query:
+            path += '?' + url_parsed.query
+        logger.debug('Connect data: %s %s %s', str(use_ssl), host, str(port))
+
+        if addresses is None:
+            addresses = await self.resolve(host, port)
+            timings.dns_sec = loop.time() - start_time
+
+        request_text = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n"
+        logger.debug("Request text: %s", request_text)
+        key = (host, port, url_parsed.scheme)
+        connection = await self.pool.acquire(key)
+        head = None
+        if connection is not None:
+            try:
+                head = await self._exchange(connection,
+                                            request_text.encode(), timings)
+                timings.reused = True
+                timings.address = \
+                    connection.writer.get_extra_info('peername')[0]
+            except ProbeTimeoutError:
+                await connection.close()
+                raise
+            except (OSError, ssl.SSLError, EmptyResponseError) as e:
+                # Сервер закрыл соединение, пока оно было в пуле
+                logger.debug("Pooled connection for %s failed: %s", key, e)
+                await connection.close()
+                connection = None
+            except BaseException:
+                await connection.close()
+                raise
+        if connection is None:
+            connection = await self._connect(addresses, port, host,
+                                             use_ssl, timings)
+        reusable = False
+        try:
+            if head is None:
+                logger.debug('Start reading from stream from host: %s', host)
+                head = await self._exchange(connection,
+                                            request_text.encode(), timings)
+            body_length = self._body_length(head)
+            if body_length is not None \
+               and len(head.body_prefix) <= body_length:
+                await read_exactly(connection.reader,
+                                   body_length - len(head.body_prefix),
+                                   self.read_timeout_sec)
+                reusable = True
+        finally:
+            if use_ssl and isinstance(self.ssl_context, ResumingSSLContext):
+                self.ssl_context.save_session(connection.ssl_object, port)
+            await self.pool.release(key, connection, reusable)
+        timings.total_sec = loop.time() - start_time
+        return ProbeResult(url=url, addresses=addresses, head=head,
+                           timings=timings)
+
+    async def follow(self, url: str, max_redirects: int) -> list[ProbeResult]:
+        """
+        Выполнить запрос к сайту, следуя перенаправлениям (ответам 3xx с
+        заголовком Location). Каждый новый хост проверяется так же, как
+        исходный; соединения с уже встречавшимися хостами используются
+        повторно.
+
+        Parameters
+        ----------
+        url : str
+            Адрес сайта.
+        max_redirects : int
+            Максимальное количество перенаправлений.
+
+        Raises
+        ------
+        ProbeError, OSError
+            См. probe. Если перенаправление ведёт на запрещённый хост,
+            исключение AccessDeniedError.
+
+        Returns
+        -------
+        list[ProbeResult]
+            Результаты запросов по всей цепочке перенаправлений.
+
+        """
+        results = []
+        resolved: dict[tuple[str, int], list[str]] = {}
+        visited = set()
+        while True:
+            url_parsed = urlparse(url)
+            host = idna_host(url_parsed.hostname)
+            port = url_parsed.port
+            if port is None:
+                port = 443 if url_parsed.scheme == 'https' else 80
+            if results and not self.host_checker.ok(host):
+                raise AccessDeniedError(f"Redirect to denied host {host}")
+            addresses = resolved.get((host, port))
+            result = await self.probe(url, addresses)
+            resolved[(host, port)] = result.addresses
+            results.append(result)
+            visited.add(url)
+            location = result.head.header('location')
+            if not 300 <= result.head.status < 400 or location is None \
+               or len(results) > max_redirects:
+                return results
+            url = urljoin(url, location)
+            if urlparse(url).scheme not in ('http', 'https') \
+               or urlparse(url).hostname is None or url in visited:
+                return results
+
+    async def fetch_headers(self, site: str) -> str:
+        """
+        Получить заголовки ответа на запрос GET к сайту.
+
+        Parameters
+        ----------
+        site : str
+            Адрес сайта вида https://example.com:8443/.
+
+        Raises
+        ------
+        ProbeError, OSError
+            См. probe.
+
+        Returns
+        -------
+        str
+            Строка статуса и заголовки ответа.
+
+        """
+        return (await self.probe(site)).head.text
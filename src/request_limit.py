@@ -9,33 +9,148 @@ Created on Tue Nov 12 16:23:00 2024
 """
 
 
+import abc
 import asyncio
-from dataclasses import dataclass
+from collections import deque, OrderedDict
 from time import time
 from typing import Any
 
 
-class RequestLimit:
+# Допустимая погрешность вычислений с плавающей точкой в алгоритме GCRA
+GCRA_EPSILON_SEC = 1e-9
 
-    @dataclass
-    class Request:
-        id: Any
-        req_time_sec: float
 
-    def __init__(self,
-                 max_total_value: int,
-                 max_id_value: int,
-                 time_interval_sec: int = 60):
-        self.max_total_value = max_total_value
-        self.max_id_value = max_id_value
-        self.time_interval_sec = time_interval_sec
-        self.lock = asyncio.Lock()
-        self.total_count = 0
-        self.id_count: dict[Any] = {}
-        self.requests: list[RequestLimit.Request] = []
-        self.lock = asyncio.Lock()
+def gcra_update(tat: float,
+                now: float,
+                emission_interval: float,
+                time_interval_sec: float) -> (bool, float):
+    """
+    Шаг алгоритма GCRA (Generic Cell Rate Algorithm): проверить, можно ли
+    выполнить запрос, и вычислить новое теоретическое время поступления.
+
+    Parameters
+    ----------
+    tat : float
+        Теоретическое время поступления (TAT) следующего запроса, в секундах
+        (None, если запросов ещё не было).
+    now : float
+        Текущее время, в секундах.
+    emission_interval : float
+        Интервал между запросами при равномерном поступлении (время
+        наблюдения, делённое на лимит), в секундах.
+    time_interval_sec : float
+        Время наблюдения, в секундах. Допускается пачка запросов размером
+        не более лимита.
+
+    Returns
+    -------
+    (bool, float)
+        Признак допустимости запроса и новое значение TAT (если запрос
+        допустим).
+
+    """
+    if tat is None or tat < now:
+        tat = now
+    new_tat = tat + emission_interval
+    if new_tat - now > time_interval_sec + GCRA_EPSILON_SEC:
+        return (False, tat)
+    return (True, new_tat)
+
+
+class RequestLimitStorage(abc.ABC):
+    """
+    Базовый класс хранилища данных о запросах. Хранилище атомарно проверяет
+    возможность выполнить запрос и регистрирует его.
+    """
+
+    @abc.abstractmethod
+    def request(self,
+                limit: 'RequestLimit',
+                src_id: Any,
+                req_time_sec: float) -> bool:
+        """
+        Проверить возможность добавить запрос и зарегистрировать его в
+        случае успеха.
+
+        Parameters
+        ----------
+        limit : RequestLimit
+            Параметры ограничения (лимиты, время наблюдения, алгоритм).
+        src_id : Any
+            Идентификатор инициатора запроса.
+        req_time_sec : float
+            Момент поступления запроса, в секундах.
+
+        Returns
+        -------
+        bool
+            True, если запрос можно выполнять, иначе False.
+
+        """
+
+    async def request_async(self,
+                            limit: 'RequestLimit',
+                            src_id: Any,
+                            req_time_sec: float) -> bool:
+        """
+        То же, что request, для вызова из цикла событий. Хранилища, работа
+        с которыми может занять заметное время, выполняют её, не
+        останавливая цикл событий.
+        """
+        return self.request(limit, src_id, req_time_sec)
+
+    def close(self):
+        """
+        Освободить ресурсы хранилища.
+        """
+        pass
+
+
+class MemoryStorage(RequestLimitStorage):
+    """
+    Хранилище данных о запросах в памяти процесса.
+    """
+
+    def __init__(self):
+        # Данные для GCRA: TAT для всех запросов и для каждого
+        # идентификатора (в порядке последнего обновления)
+        self.total_tat: float = None
+        self.id_tat: OrderedDict[Any, float] = OrderedDict()
+        # Все запросы в порядке времени поступления: (время, идентификатор)
+        self.requests: deque[tuple[float, Any]] = deque()
+        # Время поступления запросов для каждого идентификатора (в порядке
+        # возрастания); идентификаторы без запросов удаляются
+        self.id_requests: dict[Any, deque[float]] = {}
+
+    @property
+    def total_count(self) -> int:
+        return len(self.requests)
+
+    def id_count(self, src_id: Any) -> int:
+        """
+        Количество отслеживаемых запросов от инициатора.
+        """
+        id_requests = self.id_requests.get(src_id)
+        return 0 if id_requests is None else len(id_requests)
 
-    def __purge(self, current_time_sec: float):
+    @staticmethod
+    def _insert_sorted(queue: deque, item: Any, item_time: float,
+                       key=lambda x: x):
+        """
+        Добавить элемент в упорядоченную по времени очередь. Обычно время
+        не убывает и элемент просто добавляется в конец; если же время
+        меньше, чем у последних элементов, элемент вставляется после всех
+        элементов с меньшим или равным временем.
+        """
+        i = len(queue)
+        while i > 0 and key(queue[i - 1]) > item_time:
+            i -= 1
+        if i == len(queue):
+            queue.append(item)
+        else:
+            queue.insert(i, item)
+
+    def __purge(self, current_time_sec: float, time_interval_sec: float):
         """
         Очистить данные о запросах за пределами отслеживаемого периода.
 
@@ -43,24 +158,110 @@ class RequestLimit:
         ----------
         current_time_sec : float
             Текущее время, в секундах.
+        time_interval_sec : float
+            Время наблюдения, в секундах.
 
         Returns
         -------
         None.
 
         """
-        self.requests = sorted(self.requests, key=lambda x: x.req_time_sec)
-        old_time_sec = current_time_sec - self.time_interval_sec
-        while self.requests:
-            if self.requests[0].req_time_sec <= old_time_sec:
-                src_id = self.requests[0].id
-                self.total_count -= 1
-                self.id_count[src_id] -= 1
-                if self.id_count[src_id] == 0:
-                    del self.id_count[src_id]
-                self.requests.pop(0)
-            else:
+        old_time_sec = current_time_sec - time_interval_sec
+        requests = self.requests
+        while requests and requests[0][0] <= old_time_sec:
+            (_, src_id) = requests.popleft()
+            id_requests = self.id_requests[src_id]
+            id_requests.popleft()
+            if not id_requests:
+                del self.id_requests[src_id]
+
+    def __request_window(self,
+                         limit: 'RequestLimit',
+                         src_id: Any,
+                         req_time_sec: float) -> bool:
+        self.__purge(req_time_sec, limit.time_interval_sec)
+        if len(self.requests) >= limit.max_total_value:
+            return False
+        if limit.max_id_value == 0:
+            return False
+        id_requests = self.id_requests.get(src_id)
+        if id_requests is not None and \
+           len(id_requests) >= limit.max_id_value:
+            return False
+        if id_requests is None:
+            id_requests = deque()
+            self.id_requests[src_id] = id_requests
+        self._insert_sorted(self.requests, (req_time_sec, src_id),
+                            req_time_sec, key=lambda x: x[0])
+        self._insert_sorted(id_requests, req_time_sec, req_time_sec)
+        return True
+
+    def __request_gcra(self,
+                       limit: 'RequestLimit',
+                       src_id: Any,
+                       req_time_sec: float) -> bool:
+        # Идентификаторы, TAT которых в прошлом, ничем не отличаются от
+        # отсутствующих, поэтому удаляются (начиная с давно обновлявшихся)
+        id_tat = self.id_tat
+        while id_tat:
+            (old_id, old_tat) = next(iter(id_tat.items()))
+            if old_tat > req_time_sec:
                 break
+            del id_tat[old_id]
+
+        if limit.max_total_value <= 0 or limit.max_id_value <= 0:
+            return False
+        (total_ok, total_tat) = gcra_update(
+            self.total_tat, req_time_sec,
+            limit.time_interval_sec / limit.max_total_value,
+            limit.time_interval_sec)
+        if not total_ok:
+            return False
+        (id_ok, new_id_tat) = gcra_update(
+            id_tat.get(src_id), req_time_sec,
+            limit.time_interval_sec / limit.max_id_value,
+            limit.time_interval_sec)
+        if not id_ok:
+            return False
+        self.total_tat = total_tat
+        id_tat[src_id] = new_id_tat
+        id_tat.move_to_end(src_id)
+        return True
+
+    def request(self,
+                limit: 'RequestLimit',
+                src_id: Any,
+                req_time_sec: float) -> bool:
+        if limit.algorithm == RequestLimit.ALGORITHM_GCRA:
+            return self.__request_gcra(limit, src_id, req_time_sec)
+        return self.__request_window(limit, src_id, req_time_sec)
+
+
+class RequestLimit:
+
+    # Алгоритмы ограничения запросов
+    # Скользящее окно: хранится время каждого запроса за время наблюдения
+    ALGORITHM_WINDOW = 'window'
+    # GCRA (вариант "ведра с жетонами"): хранится одно значение времени на
+    # каждый идентификатор
+    ALGORITHM_GCRA = 'gcra'
+
+    ALGORITHMS = (ALGORITHM_WINDOW, ALGORITHM_GCRA)
+
+    def __init__(self,
+                 max_total_value: int,
+                 max_id_value: int,
+                 time_interval_sec: int = 60,
+                 algorithm: str = ALGORITHM_WINDOW,
+                 storage: RequestLimitStorage = None):
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f"Unknown request limit algorithm: {algorithm}")
+        self.max_total_value = max_total_value
+        self.max_id_value = max_id_value
+        self.time_interval_sec = time_interval_sec
+        self.algorithm = algorithm
+        self.lock = asyncio.Lock()
+        self.storage = MemoryStorage() if storage is None else storage
 
     def request(self, src_id: Any, req_time_sec: float = None) -> bool:
         """
@@ -84,20 +285,14 @@ class RequestLimit:
 
         if req_time_sec is None:
             req_time_sec = time()
-        self.__purge(req_time_sec)
-        if self.total_count >= self.max_total_value:
-            return False
-        if self.max_id_value == 0:
-            return False
-        if src_id in self.id_count and \
-           self.id_count[src_id] >= self.max_id_value:
-            return False
-        self.requests.append(
-            RequestLimit.Request(id=src_id,
-                                 req_time_sec=req_time_sec))
-        self.total_count += 1
-        if src_id not in self.id_count:
-            self.id_count[src_id] = 1
-        else:
-            self.id_count[src_id] += 1
-        return True
+        return self.storage.request(self, src_id, req_time_sec)
+
+    async def request_async(self, src_id: Any,
+                            req_time_sec: float = None) -> bool:
+        """
+        То же, что request, для вызова из цикла событий (см.
+        RequestLimitStorage.request_async).
+        """
+        if req_time_sec is None:
+            req_time_sec = time()
+        return await self.storage.request_async(self, src_id, req_time_sec)
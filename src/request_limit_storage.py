@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:12:48 2026
+
+@author: askh
+
+Содержит хранилища данных о запросах для RequestLimit, общие для нескольких
+процессов бота: SQLite (для процессов на одном хосте) и интерфейс сетевого
+хранилища
+"""
+
+import abc
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from request_limit import RequestLimit, RequestLimitStorage, gcra_update
+
+
+# Ключ, под которым хранятся данные о всех запросах (ключи идентификаторов
+# строятся функцией repr и не могут быть пустыми)
+TOTAL_KEY = ''
+
+
+def id_key(src_id: Any) -> str:
+    return repr(src_id)
+
+
+class SqliteStorage(RequestLimitStorage):
+    """
+    Хранилище в базе SQLite (в режиме WAL). Проверка и регистрация запроса
+    выполняются в одной транзакции BEGIN IMMEDIATE, поэтому решения
+    атомарны и при одновременной работе нескольких процессов. В
+    request_async транзакции выполняются по очереди в отдельном потоке,
+    чтобы ожидание блокировки базы другим процессом не останавливало цикл
+    событий бота.
+    """
+
+    DEFAULT_TIMEOUT_SEC = 5
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS requests (
+               id TEXT NOT NULL,
+               req_time REAL NOT NULL)""",
+        """CREATE INDEX IF NOT EXISTS requests_req_time
+               ON requests (req_time)""",
+        """CREATE INDEX IF NOT EXISTS requests_id
+               ON requests (id, req_time)""",
+        """CREATE TABLE IF NOT EXISTS tat (
+               id TEXT PRIMARY KEY,
+               tat REAL NOT NULL) WITHOUT ROWID""",
+        """CREATE INDEX IF NOT EXISTS tat_tat ON tat (tat)""",
+    )
+
+    def __init__(self, path: str, timeout_sec: float = None):
+        """
+        Parameters
+        ----------
+        path : str
+            Путь к файлу базы данных.
+        timeout_sec : float, optional
+            Максимальное время ожидания блокировки базы другим процессом,
+            в секундах.
+
+        """
+        self.path = path
+        # Поток, в котором выполняются транзакции request_async
+        self.executor = ThreadPoolExecutor(max_workers=1,
+                                           thread_name_prefix='limit-sqlite')
+        self.connection = sqlite3.connect(
+            path,
+            timeout=self.DEFAULT_TIMEOUT_SEC if timeout_sec is None
+            else timeout_sec,
+            isolation_level=None,
+            check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            for statement in self.SCHEMA:
+                self.connection.execute(statement)
+
+    def close(self):
+        self.executor.shutdown()
+        self.connection.close()
+
+    def _request_window(self, cursor: sqlite3.Cursor, limit: RequestLimit,
+                        key: str, req_time_sec: float) -> bool:
+        cursor.execute('DELETE FROM requests WHERE req_time <= ?',
+                       (req_time_sec - limit.time_interval_sec,))
+        (total_count,) = cursor.execute(
+            'SELECT COUNT(*) FROM requests').fetchone()
+        if total_count >= limit.max_total_value:
+            return False
+        if limit.max_id_value == 0:
+            return False
+        (id_count,) = cursor.execute(
+            'SELECT COUNT(*) FROM requests WHERE id = ?', (key,)).fetchone()
+        if id_count >= limit.max_id_value:
+            return False
+        cursor.execute('INSERT INTO requests (id, req_time) VALUES (?, ?)',
+                       (key, req_time_sec))
+        return True
+
+    def _request_gcra(self, cursor: sqlite3.Cursor, limit: RequestLimit,
+                      key: str, req_time_sec: float) -> bool:
+        cursor.execute('DELETE FROM tat WHERE tat <= ? AND id != ?',
+                       (req_time_sec, TOTAL_KEY))
+        if limit.max_total_value <= 0 or limit.max_id_value <= 0:
+            return False
+        tats = dict(cursor.execute(
+            'SELECT id, tat FROM tat WHERE id IN (?, ?)',
+            (TOTAL_KEY, key)).fetchall())
+        (total_ok, total_tat) = gcra_update(
+            tats.get(TOTAL_KEY), req_time_sec,
+            limit.time_interval_sec / limit.max_total_value,
+            limit.time_interval_sec)
+        if not total_ok:
+            return False
+        (id_ok, new_id_tat) = gcra_update(
+            tats.get(key), req_time_sec,
+            limit.time_interval_sec / limit.max_id_value,
+            limit.time_interval_sec)
+        if not id_ok:
+            return False
+        cursor.executemany('INSERT OR REPLACE INTO tat (id, tat) VALUES (?, ?)',
+                           ((TOTAL_KEY, total_tat), (key, new_id_tat)))
+        return True
+
+    def request(self,
+                limit: RequestLimit,
+                src_id: Any,
+                req_time_sec: float) -> bool:
+        cursor = self.connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            if limit.algorithm == RequestLimit.ALGORITHM_GCRA:
+                result = self._request_gcra(cursor, limit, id_key(src_id),
+                                            req_time_sec)
+            else:
+                result = self._request_window(cursor, limit, id_key(src_id),
+                                              req_time_sec)
+            cursor.execute('COMMIT')
+            return result
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            cursor.close()
+
+    async def request_async(self,
+                            limit: RequestLimit,
+                            src_id: Any,
+                            req_time_sec: float) -> bool:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.request, limit, src_id, req_time_sec)
+
+
+class NetworkStore(abc.ABC):
+    """
+    Интерфейс сетевого хранилища (например, Redis). Каждая операция должна
+    выполняться на стороне хранилища атомарно (например, скриптом Lua),
+    а устаревшие данные - удаляться по истечении времени жизни ключей.
+    """
+
+    @abc.abstractmethod
+    def window(self,
+               total_key: str,
+               id_key: str,
+               req_time_sec: float,
+               max_total_value: int,
+               max_id_value: int,
+               time_interval_sec: float) -> bool:
+        """
+        Шаг алгоритма скользящего окна: удалить запросы старше
+        time_interval_sec, проверить лимиты для ключей total_key и id_key и,
+        если они не превышены, добавить запрос в оба списка.
+        """
+
+    @abc.abstractmethod
+    def gcra(self,
+             total_key: str,
+             id_key: str,
+             req_time_sec: float,
+             total_emission_interval: float,
+             id_emission_interval: float,
+             time_interval_sec: float) -> bool:
+        """
+        Шаг алгоритма GCRA (см. gcra_update) одновременно для ключей
+        total_key и id_key: значения обновляются, только если запрос
+        допустим для обоих ключей.
+        """
+
+
+class LocalNetworkStore(NetworkStore):
+    """
+    Реализация NetworkStore в памяти процесса (для тестов и для работы без
+    сетевого хранилища). Атомарность обеспечивается блокировкой. Как и время
+    жизни ключей в сетевом хранилище, устаревшие ключи удаляются (начиная с
+    давно обновлявшихся) при следующих операциях.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lists: dict[str, list[float]] = {}
+        self.values: dict[str, float] = {}
+        # Время устаревания ключей (в порядке последнего обновления)
+        self.expires: OrderedDict[str, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.expires)
+
+    def _expire(self, now: float):
+        while self.expires:
+            (key, expires) = next(iter(self.expires.items()))
+            if expires > now:
+                break
+            del self.expires[key]
+            self.lists.pop(key, None)
+            self.values.pop(key, None)
+
+    def _touch(self, key: str, expires: float):
+        self.expires[key] = expires
+        self.expires.move_to_end(key)
+
+    def window(self, total_key, id_key, req_time_sec, max_total_value,
+               max_id_value, time_interval_sec):
+        old_time_sec = req_time_sec - time_interval_sec
+        with self.lock:
+            self._expire(req_time_sec)
+            counts = []
+            for key in (total_key, id_key):
+                times = [t for t in self.lists.get(key, [])
+                         if t > old_time_sec]
+                if times:
+                    self.lists[key] = times
+                else:
+                    self.lists.pop(key, None)
+                counts.append(len(times))
+            if counts[0] >= max_total_value or counts[1] >= max_id_value:
+                return False
+            for key in (total_key, id_key):
+                times = self.lists.setdefault(key, [])
+                times.append(req_time_sec)
+                self._touch(key, max(times) + time_interval_sec)
+            return True
+
+    def gcra(self, total_key, id_key, req_time_sec, total_emission_interval,
+             id_emission_interval, time_interval_sec):
+        with self.lock:
+            self._expire(req_time_sec)
+            (total_ok, total_tat) = gcra_update(
+                self.values.get(total_key), req_time_sec,
+                total_emission_interval, time_interval_sec)
+            (id_ok, new_id_tat) = gcra_update(
+                self.values.get(id_key), req_time_sec,
+                id_emission_interval, time_interval_sec)
+            if not (total_ok and id_ok):
+                return False
+            self.values[total_key] = total_tat
+            self.values[id_key] = new_id_tat
+            # Ключ, TAT которого в прошлом, не отличается от отсутствующего
+            self._touch(total_key, total_tat)
+            self._touch(id_key, new_id_tat)
+            return True
+
+
+class NetworkStorage(RequestLimitStorage):
+    """
+    Хранилище данных о запросах в сетевом хранилище. Ключи строятся с
+    префиксом, чтобы несколько ботов могли использовать одно хранилище.
+    """
+
+    def __init__(self, store: NetworkStore, prefix: str = 'request_limit:'):
+        self.store = store
+        self.prefix = prefix
+
+    def request(self,
+                limit: RequestLimit,
+                src_id: Any,
+                req_time_sec: float) -> bool:
+        if limit.max_total_value <= 0 or limit.max_id_value <= 0:
+            return False
+        total_key = self.prefix + 'total'
+        src_key = self.prefix + 'id:' + id_key(src_id)
+        if limit.algorithm == RequestLimit.ALGORITHM_GCRA:
+            return self.store.gcra(
+                total_key, src_key, req_time_sec,
+                limit.time_interval_sec / limit.max_total_value,
+                limit.time_interval_sec / limit.max_id_value,
+                limit.time_interval_sec)
+        return self.store.window(
+            total_key, src_key, req_time_sec,
+            limit.max_total_value, limit.max_id_value,
+            limit.time_interval_sec)
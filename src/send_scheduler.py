@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 10:16:52 2026
+
+@author: askh
+
+Содержит планировщик отправки сообщений в Telegram с учётом ограничений
+частоты (общего и для каждого чата). Обработчики передают сообщение
+планировщику и не ждут его отправки; при ответе Telegram "retry after"
+отправка в чат откладывается на указанное время, а несколько ожидающих
+отправки сообщений в один чат по возможности объединяются в одно.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from time import monotonic
+from typing import Any, Callable, Hashable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+from aiogram.methods.base import TelegramMethod
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        """
+        Parameters
+        ----------
+        rate : float
+            Скорость пополнения, токенов в секунду.
+        capacity : float
+            Максимальное количество токенов.
+        now : float
+            Текущее время, в секундах.
+
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """
+        Время до появления токена (0, если токен есть).
+        """
+        self._refill(now)
+        if self.tokens >= 1 and now >= self.updated:
+            return 0
+        return max(0, self.updated - now) \
+            + max(0, 1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, now: float, seconds: float):
+        """
+        Не выдавать токены в течение seconds секунд.
+        """
+        self._refill(now)
+        self.tokens = min(self.tokens, 1)
+        self.updated = max(self.updated, now + seconds)
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.updated
+
+
+class _Outgoing:
+
+    def __init__(self, method: TelegramMethod, future: asyncio.Future):
+        self.method = method
+        self.futures = [future]
+        self.retries = 0
+
+
+class SendScheduler:
+
+    # Ограничения Telegram: около 30 сообщений в секунду всего и одно
+    # сообщение в секунду в один чат
+    DEFAULT_GLOBAL_RATE = 30
+    DEFAULT_CHAT_RATE = 1
+    DEFAULT_CHAT_BURST = 3
+    DEFAULT_MAX_RETRIES = 3
+    MAX_MESSAGE_LENGTH = 4096
+    # Количество корзин чатов, при превышении которого удаляются корзины
+    # неактивных чатов
+    MAX_CHAT_BUCKETS = 1024
+    COALESCE_SEPARATOR = '\n\n'
+
+    def __init__(self,
+                 bot: Bot,
+                 global_rate: float = None,
+                 chat_rate: float = None,
+                 chat_burst: float = None,
+                 max_retries: int = None,
+                 clock: Callable[[], float] = monotonic):
+        """
+        Parameters
+        ----------
+        bot : Bot
+            Бот, через который отправляются сообщения.
+        global_rate : float, optional
+            Максимальное общее количество сообщений в секунду.
+        chat_rate : float, optional
+            Максимальное количество сообщений в секунду в один чат.
+        chat_burst : float, optional
+            Количество сообщений, которые можно сразу отправить в чат, не
+            отправлявший сообщений некоторое время.
+        max_retries : int, optional
+            Максимальное количество повторных попыток отправки после ответа
+            "retry after".
+        clock : Callable[[], float], optional
+            Функция, возвращающая текущее время в секундах.
+
+        """
+        self.bot = bot
+        self.global_rate = self.DEFAULT_GLOBAL_RATE if global_rate is None \
+            else global_rate
+        self.chat_rate = self.DEFAULT_CHAT_RATE if chat_rate is None \
+            else chat_rate
+        self.chat_burst = self.DEFAULT_CHAT_BURST if chat_burst is None \
+            else chat_burst
+        self.max_retries = self.DEFAULT_MAX_RETRIES if max_retries is None \
+            else max_retries
+        self.clock = clock
+        self.global_bucket = TokenBucket(self.global_rate, self.global_rate,
+                                         clock())
+        self.chat_buckets: dict[Hashable, TokenBucket] = {}
+        # Очереди сообщений чатов в порядке обслуживания
+        self.queues: OrderedDict[Hashable, deque[_Outgoing]] = OrderedDict()
+        # Чаты, сообщения в которые отправляются в данный момент
+        self.in_flight: set[Hashable] = set()
+        self.send_tasks: set[asyncio.Task] = set()
+        self.wakeup = asyncio.Event()
+        self.worker = None
+        self.sent = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    @classmethod
+    def can_coalesce(cls, first: TelegramMethod,
+                     second: TelegramMethod) -> bool:
+        """
+        Можно ли объединить два сообщения в одно: оба - простой текст в
+        один и тот же чат (и ответ на одно и то же сообщение) с одинаковыми
+        параметрами, и объединённый текст не слишком длинный.
+        """
+        if not isinstance(first, SendMessage) \
+           or not isinstance(second, SendMessage):
+            return False
+        first_params = first.model_dump(exclude={'text'})
+        second_params = second.model_dump(exclude={'text'})
+        if first_params != second_params or first.entities is not None \
+           or first.reply_markup is not None:
+            return False
+        return len(first.text) + len(cls.COALESCE_SEPARATOR) \
+            + len(second.text) <= cls.MAX_MESSAGE_LENGTH
+
+    def submit(self, method: TelegramMethod) -> asyncio.Future:
+        """
+        Поставить сообщение в очередь отправки.
+
+        Parameters
+        ----------
+        method : TelegramMethod
+            Метод отправки (например, результат message.reply(...) без
+            await).
+
+        Returns
+        -------
+        asyncio.Future
+            Результат отправки (ожидать его не обязательно).
+
+        """
+        future = asyncio.get_running_loop().create_future()
+        chat_id = getattr(method, 'chat_id', None)
+        queue = self.queues.get(chat_id)
+        if queue and self.can_coalesce(queue[-1].method, method):
+            last = queue[-1]
+            last.method = last.method.model_copy(update={
+                'text': last.method.text + self.COALESCE_SEPARATOR
+                + method.text})
+            last.futures.append(future)
+            self.coalesced += 1
+        else:
+            self.queues.setdefault(chat_id, deque()).append(
+                _Outgoing(method, future))
+        self.wakeup.set()
+        return future
+
+    def _chat_bucket(self, chat_id: Hashable, now: float) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= self.MAX_CHAT_BUCKETS:
+                self.chat_buckets = {
+                    c: b for (c, b) in self.chat_buckets.items()
+                    if c in self.queues or not b.is_full(now)}
+            bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _next_chat(self, now: float) -> (Hashable, float):
+        """
+        Чат, сообщение в который можно отправить раньше всех, и время до
+        возможности отправки.
+        """
+        (best_chat, best_delay) = (None, None)
+        for chat_id in self.queues:
+            if chat_id in self.in_flight:
+                continue
+            delay = self._chat_bucket(chat_id, now).delay(now)
+            if best_delay is None or delay < best_delay:
+                (best_chat, best_delay) = (chat_id, delay)
+                if delay == 0:
+                    break
+        if best_delay is None:
+            return (None, None)
+        return (best_chat, max(best_delay, self.global_bucket.delay(now)))
+
+    async def _run(self):
+        while True:
+            now = self.clock()
+            (chat_id, delay) = self._next_chat(now)
+            if delay is None or delay > 0:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            queue = self.queues[chat_id]
+            outgoing = queue.popleft()
+            if queue:
+                self.queues.move_to_end(chat_id)
+            else:
+                del self.queues[chat_id]
+            self.global_bucket.take(now)
+            self._chat_bucket(chat_id, now).take(now)
+            self.in_flight.add(chat_id)
+            task = asyncio.create_task(self._send(chat_id, outgoing))
+            self.send_tasks.add(task)
+            task.add_done_callback(self.send_tasks.discard)
+
+    async def _send(self, chat_id: Hashable, outgoing: _Outgoing):
+        logger = logging.getLogger(__name__)
+        try:
+            result = await self.bot(outgoing.method)
+        except TelegramRetryAfter as e:
+            outgoing.retries += 1
+            logger.warning("Retry after %s sec for chat %s (attempt %d)",
+                           e.retry_after, chat_id, outgoing.retries)
+            if outgoing.retries <= self.max_retries:
+                now = self.clock()
+                if chat_id is None:
+                    self.global_bucket.pause(now, e.retry_after)
+                else:
+                    self._chat_bucket(chat_id, now).pause(now, e.retry_after)
+                self.queues.setdefault(chat_id, deque()).appendleft(outgoing)
+                self.queues.move_to_end(chat_id, last=False)
+            else:
+                self._fail(outgoing, e)
+        except Exception as e:
+            logger.error("Can't send message to chat %s: %s", chat_id, e)
+            self._fail(outgoing, e)
+        else:
+            self.sent += 1
+            for future in outgoing.futures:
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self.in_flight.discard(chat_id)
+            self.wakeup.set()
+
+    @staticmethod
+    def _fail(outgoing: _Outgoing, error: Exception):
+        for future in outgoing.futures:
+            if not future.done():
+                future.set_exception(error)
+                # Ошибка уже записана в журнал, отправитель может не ждать
+                # результата
+                future.exception()
+
+    async def start(self):
+        if self.worker is None:
+            self.worker = asyncio.create_task(self._run())
+
+    async def close(self, timeout_sec: float = 5):
+        """
+        Дождаться отправки сообщений из очереди (не дольше timeout_sec) и
+        остановить планировщик.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout_sec
+        while (self.queues or self.send_tasks) and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        if self.worker is not None:
+            self.worker.cancel()
+            await asyncio.gather(self.worker, return_exceptions=True)
+            self.worker = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'queued': len(self),
+            'in_flight': len(self.in_flight),
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+        }
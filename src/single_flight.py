@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:14:26 2026
+
+@author: askh
+
+Содержит класс для объединения одновременных одинаковых запросов: пока
+выполняется запрос с некоторым ключом, остальные запросы с тем же ключом
+ожидают его результата, а не выполняются повторно
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self.tasks: dict[Hashable, asyncio.Task] = {}
+        # Количество запросов, получивших результат чужого запроса
+        self.shared_count = 0
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    async def do(self,
+                 key: Hashable,
+                 func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполнить запрос или, если запрос с таким ключом уже выполняется,
+        дождаться его результата.
+
+        Parameters
+        ----------
+        key : Hashable
+            Ключ запроса (например, команда и нормализованное имя хоста).
+        func : Callable[[], Awaitable[Any]]
+            Функция, создающая корутину, которая выполняет запрос.
+
+        Returns
+        -------
+        Any
+            Результат запроса (одинаковый для всех ожидающих). Если запрос
+            завершился исключением, оно передаётся всем ожидающим.
+
+        """
+        task = self.tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self.tasks[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.shared_count += 1
+        # Отмена одного из ожидающих не должна прерывать запрос для остальных
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self.tasks.get(key) is task:
+            del self.tasks[key]
+        if not task.cancelled():
+            # Исключение получат ожидающие; здесь только помечаем его как
+            # полученное, чтобы asyncio не сообщал о нём, если все
+            # ожидающие были отменены
+            task.exception()
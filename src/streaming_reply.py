@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 15:27:09 2026
+
+@author: askh
+
+Содержит ответ на сообщение, текст которого поступает частями: сначала
+отправляется сообщение-заглушка, затем оно изменяется (не чаще заданного
+интервала) по мере поступления текста. Длинный текст делится по границам
+строк на несколько сообщений, а слишком длинный отправляется файлом.
+"""
+
+import asyncio
+import logging
+
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import BufferedInputFile, Message
+
+from send_scheduler import SendScheduler
+
+
+def split_text(text: str, max_length: int) -> list[str]:
+    """
+    Разделить текст на части не длиннее max_length по границам строк
+    (слишком длинные строки делятся на части).
+
+    Parameters
+    ----------
+    text : str
+        Текст.
+    max_length : int
+        Максимальная длина части.
+
+    Returns
+    -------
+    list[str]
+        Части текста (без переводов строк в конце).
+
+    """
+    chunks = []
+    current = ''
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_length:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(line[:max_length])
+            line = line[max_length:]
+        if len(current) + len(line) > max_length:
+            chunks.append(current)
+            current = ''
+        current += line
+    if current:
+        chunks.append(current)
+    chunks = [chunk.rstrip('\n') for chunk in chunks]
+    return [chunk for chunk in chunks if chunk.strip() != '']
+
+
+class StreamingReply:
+
+    DEFAULT_EDIT_INTERVAL_SEC = 2
+    DEFAULT_DOCUMENT_THRESHOLD = 16384
+    DEFAULT_DOCUMENT_NAME = 'answer.txt'
+
+    def __init__(self,
+                 message: Message,
+                 scheduler: SendScheduler,
+                 placeholder: str = None,
+                 document_message: str = None,
+                 edit_interval_sec: float = None,
+                 document_threshold: int = None,
+                 document_name: str = None,
+                 max_length: int = SendScheduler.MAX_MESSAGE_LENGTH,
+                 **kwargs):
+        """
+        Parameters
+        ----------
+        message : Message
+            Сообщение, на которое отправляется ответ.
+        scheduler : SendScheduler
+            Планировщик отправки сообщений.
+        placeholder : str, optional
+            Текст сообщения-заглушки, отправляемого в start (если не указан,
+            заглушка не отправляется).
+        document_message : str, optional
+            Текст, которым заменяется первое сообщение ответа, если ответ
+            отправлен файлом.
+        edit_interval_sec : float, optional
+            Минимальный интервал между обновлениями ответа, в секундах.
+        document_threshold : int, optional
+            Длина текста, начиная с которой ответ отправляется файлом.
+        document_name : str, optional
+            Имя файла с ответом.
+        max_length : int, optional
+            Максимальная длина одного сообщения.
+        **kwargs
+            Дополнительные параметры отправки сообщений (например,
+            link_preview_options).
+
+        """
+        self.message = message
+        self.scheduler = scheduler
+        self.placeholder = placeholder
+        self.document_message = document_message
+        self.edit_interval_sec = self.DEFAULT_EDIT_INTERVAL_SEC \
+            if edit_interval_sec is None else edit_interval_sec
+        self.document_threshold = self.DEFAULT_DOCUMENT_THRESHOLD \
+            if document_threshold is None else document_threshold
+        self.document_name = self.DEFAULT_DOCUMENT_NAME \
+            if document_name is None else document_name
+        self.max_length = max_length
+        self.kwargs = kwargs
+        self.text = ''
+        # Отправленные сообщения ответа и их текущие тексты
+        self.sent: list[Message] = []
+        self.sent_texts: list[str] = []
+        self.lock = asyncio.Lock()
+        self.flush_handle = None
+        self.flush_task = None
+        self.last_flush = None
+
+    async def start(self):
+        if self.placeholder is not None:
+            await self._send(0, self.placeholder)
+
+    async def _send(self, index: int, text: str):
+        """
+        Отправить или изменить сообщение ответа с номером index.
+        """
+        if index < len(self.sent):
+            if self.sent_texts[index] == text:
+                return
+            method = self.sent[index].edit_text(text, **self.kwargs)
+        else:
+            method = self.message.reply(text, **self.kwargs)
+        try:
+            result = await self.scheduler.submit(method)
+        except TelegramAPIError as e:
+            logging.getLogger(__name__).error("Can't send reply: %s", e)
+            return
+        if index < len(self.sent):
+            self.sent_texts[index] = text
+        else:
+            self.sent.append(result)
+            self.sent_texts.append(text)
+
+    def is_document(self) -> bool:
+        return len(self.text) >= self.document_threshold
+
+    async def flush(self):
+        """
+        Отправить текущий текст ответа (изменяя уже отправленные
+        сообщения).
+        """
+        async with self.lock:
+            self.last_flush = asyncio.get_running_loop().time()
+            if self.is_document():
+                return
+            for (index, chunk) in enumerate(split_text(self.text,
+                                                       self.max_length)):
+                await self._send(index, chunk)
+
+    def _scheduled_flush(self):
+        self.flush_handle = None
+        self.flush_task = asyncio.create_task(self.flush())
+
+    def append(self, text: str):
+        """
+        Добавить текст к ответу. Ответ обновляется не чаще, чем раз в
+        edit_interval_sec.
+        """
+        self.text += text
+        if self.flush_handle is not None:
+            return
+        loop = asyncio.get_running_loop()
+        delay = 0 if self.last_flush is None \
+            else max(0, self.last_flush + self.edit_interval_sec - loop.time())
+        self.flush_handle = loop.call_later(delay, self._scheduled_flush)
+
+    async def finish(self, text: str = None):
+        """
+        Отправить окончательный текст ответа.
+
+        Parameters
+        ----------
+        text : str, optional
+            Окончательный текст ответа (если указан, заменяет текст,
+            добавленный через append).
+
+        """
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if self.flush_task is not None:
+            # Обновление, начатое до завершения, не должно пережить ответ
+            await self.flush_task
+            self.flush_task = None
+        if text is not None:
+            self.text = text
+        if not self.is_document():
+            await self.flush()
+            return
+        async with self.lock:
+            if self.sent and self.document_message is not None:
+                await self._send(0, self.document_message)
+            try:
+                await self.scheduler.submit(self.message.reply_document(
+                    BufferedInputFile(self.text.encode('utf-8'),
+                                      self.document_name)))
+            except TelegramAPIError as e:
+                logging.getLogger(__name__).error("Can't send document: %s",
+                                                  e)
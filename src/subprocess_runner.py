@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:02:11 2026
+
+@author: askh
+
+Содержит класс для асинхронного запуска внешних программ (whois, host и т.п.)
+с ограничением времени выполнения, размера вывода и количества одновременных
+процессов
+"""
+
+import asyncio
+import codecs
+import logging
+import subprocess
+from typing import Any, Awaitable, Callable
+
+
+class SubprocessRunner:
+
+    DEFAULT_TIMEOUT_SEC = 30
+    DEFAULT_MAX_CONCURRENCY = 8
+    DEFAULT_MAX_BYTES = 64 * 1024
+    READ_CHUNK_SIZE = 4096
+
+    def __init__(self,
+                 timeout_sec: float = None,
+                 max_concurrency: int = None,
+                 max_bytes: int = None):
+        self.timeout_sec = \
+            self.DEFAULT_TIMEOUT_SEC if timeout_sec is None else timeout_sec
+        self.max_concurrency = \
+            self.DEFAULT_MAX_CONCURRENCY if max_concurrency is None \
+            else max_concurrency
+        self.max_bytes = \
+            self.DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @staticmethod
+    async def _kill(proc: asyncio.subprocess.Process):
+        """
+        Завершить процесс и дождаться его окончания, чтобы не оставлять
+        процессов-зомби.
+
+        Parameters
+        ----------
+        proc : asyncio.subprocess.Process
+            Процесс.
+
+        Returns
+        -------
+        None.
+
+        """
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+        await proc.wait()
+
+    async def _run(self,
+                   args: list[str],
+                   timeout_sec: float,
+                   read: Callable[[asyncio.subprocess.Process],
+                                  Awaitable[Any]]) -> Any:
+        """
+        Запустить программу и получить её вывод функцией read (с
+        ограничением времени выполнения).
+        """
+        logger = logging.getLogger(__name__)
+
+        if timeout_sec is None:
+            timeout_sec = self.timeout_sec
+
+        async with self.semaphore:
+            logger.debug("Run command: %s", args)
+            proc = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE)
+            try:
+                return await asyncio.wait_for(read(proc), timeout_sec)
+            except asyncio.TimeoutError:
+                logger.warning("Command timed out after %s sec: %s",
+                               timeout_sec, args)
+                raise
+            finally:
+                # Процесс, не завершившийся из-за ошибки чтения вывода,
+                # истечения времени или отмены, завершается принудительно
+                if proc.returncode is None:
+                    await self._kill(proc)
+
+    async def run(self, args: list[str], timeout_sec: float = None) -> bytes:
+        """
+        Запустить программу и получить её стандартный вывод. Если все слоты
+        для процессов заняты, ожидает освобождения слота.
+
+        Parameters
+        ----------
+        args : list[str]
+            Программа и её аргументы.
+        timeout_sec : float, optional
+            Максимальное время выполнения программы, в секундах. Если не
+            указано, используется значение, заданное при создании объекта.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            Программа не завершилась за отведённое время (процесс при этом
+            принудительно завершается).
+
+        Returns
+        -------
+        bytes
+            Стандартный вывод программы.
+
+        """
+        async def read(proc: asyncio.subprocess.Process) -> bytes:
+            (stdout, _) = await proc.communicate()
+            return stdout
+
+        return await self._run(args, timeout_sec, read)
+
+    async def run_text(self,
+                       args: list[str],
+                       timeout_sec: float = None,
+                       max_bytes: int = None,
+                       encoding: str = 'utf-8') -> (str, bool):
+        """
+        Запустить программу и получить её стандартный вывод в виде текста.
+        Вывод читается и декодируется по частям (некорректные
+        последовательности байтов заменяются); если его размер превышает
+        max_bytes, программа принудительно завершается, а вывод обрезается.
+
+        Parameters
+        ----------
+        args : list[str]
+            Программа и её аргументы.
+        timeout_sec : float, optional
+            Максимальное время выполнения программы, в секундах. Если не
+            указано, используется значение, заданное при создании объекта.
+        max_bytes : int, optional
+            Максимальный размер вывода, в байтах. Если не указан,
+            используется значение, заданное при создании объекта.
+        encoding : str, optional
+            Кодировка вывода.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            Программа не завершилась за отведённое время (процесс при этом
+            принудительно завершается).
+
+        Returns
+        -------
+        (str, bool)
+            Вывод программы и признак того, что он был обрезан.
+
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+
+        async def read(proc: asyncio.subprocess.Process) -> (str, bool):
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+            parts = []
+            size = 0
+            while True:
+                # Читаем на байт больше предела, чтобы определить, есть ли
+                # ещё данные
+                chunk = await proc.stdout.read(
+                    min(self.READ_CHUNK_SIZE, max_bytes - size + 1))
+                if not chunk:
+                    break
+                if size + len(chunk) > max_bytes:
+                    parts.append(decoder.decode(chunk[:max_bytes - size]))
+                    logging.getLogger(__name__).warning(
+                        "Command output exceeds %d bytes: %s", max_bytes,
+                        args)
+                    await self._kill(proc)
+                    # Незавершённая последовательность байтов в конце
+                    # обрезанного вывода отбрасывается
+                    return (''.join(parts), True)
+                size += len(chunk)
+                parts.append(decoder.decode(chunk))
+            parts.append(decoder.decode(b'', final=True))
+            await proc.wait()
+            return (''.join(parts), False)
+
+        return await self._run(args, timeout_sec, read)
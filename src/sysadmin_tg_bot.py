@@ -13,7 +13,8 @@ from dotenv import dotenv_values
 import logging
 import os
 import re
-import subprocess
+import sqlite3
+import ssl
 import sys
 import typing
 from urllib.parse import urlparse
@@ -33,11 +34,27 @@ from aiogram.types.inline_query import InlineQuery
 from aiogram.types.inline_query_result_article import InlineQueryResultArticle
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from request_limit import RequestLimit
+from request_limit_storage import SqliteStorage
+from blocklist_index import BlocklistFormatError, BlocklistIndex
+from connection_pool import ConnectionPool
+from execution_lanes import Lane, LaneFullError, LaneMiddleware
+from fsm_storage import BoundedMemoryStorage, SqliteFsmStorage
+from fair_scheduler import FairScheduler, QueueFullError, QueueTimeoutError
 from host_check import HostChecker
+from http_probe import AccessDeniedError, HeadersTooBigError, HttpProbe, \
+    ProbeError, ProbeTimings, ProbeTimeoutError, ResolveError
+from single_flight import SingleFlight
+from streaming_reply import StreamingReply
+from subprocess_runner import SubprocessRunner
+from dns_client import DnsCache, DnsError, DnsResolver
+from send_scheduler import SendScheduler
+from ttl_cache import TtlLruCache
+from webhook_server import WebhookServer
+from whois_client import WhoisClient, idna_domain, \
+    whois_server_for_domain  # noqa: F401
 
 HELP_TEXT = """\
 Бот для сисадмина.
@@ -47,15 +64,24 @@ HELP_TEXT = """\
 /dns - показ информации DNS о хосте
 
 /http_headers - показ заголовков HTTP сайта. После ввода команды вводите \
-далее адреса сайтов по одному, в формате вида example.com, по умолчанию \
+далее адреса сайтов, в формате вида example.com, по умолчанию \
 обращение идёт по протоколу HTTPS, можно указать адрес в формате \
-http://example.com для проверки незащищённого соединения
+http://example.com для проверки незащищённого соединения. Параметр -t перед \
+адресом добавляет время выполнения этапов запроса (DNS, соединение TCP, \
+рукопожатие TLS, первый байт ответа), параметр -L - заголовки для всех \
+перенаправлений, например: -t -L example.com
 
 /whois - показ информации WHOIS о сайтах. После ввода команды вводите имена \
-доменов по одному, без указания протокола, порта и т.д., например: example.com
+доменов, без указания протокола, порта и т.д., например: example.com \
+(данные WHOIS кэшируются, для получения свежих данных укажите перед именем \
+домена параметр -f, например: -f example.com)
 
 /cancel - отменить предыдущую команду (например, перестать выполнять команду \
-whois для вводимых имён доменов)\
+whois для вводимых имён доменов)
+
+В одном сообщении (или после команды, например: /dns example.com \
+example.org) можно указать несколько имён или адресов через пробел или с \
+новой строки, запросы для них выполняются одновременно.\
 """
 
 DEFAULT_CONFIG_FILE = 'sysadmin-tg-bot.yaml'
@@ -221,25 +247,6 @@ def data_to_str(data: typing.Any) -> str:
     return str(data)
 
 
-def whois_server_for_domain(domain: str) -> str:
-    """
-    Определяет имя сервера WHOIS для домена, используя whois-servers.net
-
-    Parameters
-    ----------
-    domain : str
-        Имя домена верхнего уровня, без точки.
-
-    Returns
-    -------
-    str
-        Имя сервера WHOIS, который может ответить на запросы о выбранном
-        домене.
-
-    """
-    return domain + ".whois-servers.net"
-
-
 # Коды ошибок
 NO_ERROR = 0  # Ошибка отсутствует
 ERROR_INCORRECT_VALUE = 1  # Было передано некорректное значение
@@ -248,6 +255,8 @@ ERROR_NO_DATA = 3  # Не были получены необходимые да
 ERROR_DATA_TOO_BIG = 4  # Полученные данные слишком велики для того, чтобы
 #                         дать ответ
 ERROR_ACCESS_DENIED = 5  # Доступ запрещён
+ERROR_TIMEOUT = 6  # Истекло время ожидания ответа
+ERROR_CONNECT = 7  # Не удалось установить соединение
 
 # Текстовые сообщения для ошибок при обработке команд
 WHOIS_ERROR_MESSAGES = {
@@ -255,12 +264,93 @@ WHOIS_ERROR_MESSAGES = {
     ERROR_INTERNAL_ERROR: "Внутренняя ошибка",
     ERROR_NO_DATA: "Нет данных",
     ERROR_DATA_TOO_BIG: "Размер данных слишком большой",
-    ERROR_ACCESS_DENIED: "Доступ запрещён"
+    ERROR_ACCESS_DENIED: "Доступ запрещён",
+    ERROR_TIMEOUT: "Превышено время ожидания ответа",
+    ERROR_CONNECT: "Не удалось установить соединение"
 }
 
 DEFAULT_REQUEST_LIMIT_TIME_INTERVAL_SEC = 60
 DEFAULT_REQUEST_LIMIT_FOR_ID = 2
 DEFAULT_REQUEST_LIMIT_TOTAL = 10
+DEFAULT_REQUEST_LIMIT_ALGORITHM = RequestLimit.ALGORITHM_WINDOW
+
+# Хранилища данных о запросах: в памяти процесса или в базе SQLite (общей
+# для нескольких процессов бота и сохраняющейся при перезапуске)
+REQUEST_LIMIT_STORAGE_MEMORY = 'memory'
+REQUEST_LIMIT_STORAGE_SQLITE = 'sqlite'
+DEFAULT_REQUEST_LIMIT_STORAGE = REQUEST_LIMIT_STORAGE_MEMORY
+DEFAULT_REQUEST_LIMIT_SQLITE_PATH = 'sysadmin-tg-bot-limits.sqlite3'
+
+# Хранилища состояний пользователей: в памяти процесса (с ограничением
+# количества записей) или в базе SQLite (сохраняющейся при перезапуске)
+FSM_STORAGE_MEMORY = 'memory'
+FSM_STORAGE_SQLITE = 'sqlite'
+DEFAULT_FSM_STORAGE = FSM_STORAGE_MEMORY
+DEFAULT_FSM_SQLITE_PATH = 'sysadmin-tg-bot-fsm.sqlite3'
+
+DEFAULT_SUBPROCESS_MAX_CONCURRENCY = 8
+# Максимальный размер вывода внешней программы, в байтах
+DEFAULT_SUBPROCESS_MAX_BYTES = 64 * 1024
+DEFAULT_DNS_TIMEOUT_SEC = 15
+DEFAULT_WHOIS_TIMEOUT_SEC = 30
+DEFAULT_WHOIS_MAX_BYTES = 64 * 1024
+DEFAULT_WHOIS_MAX_REFERRALS = 2
+
+# Способы получения данных WHOIS: собственным клиентом или внешней
+# программой whois
+WHOIS_BACKEND_NATIVE = 'native'
+WHOIS_BACKEND_SUBPROCESS = 'subprocess'
+DEFAULT_WHOIS_BACKEND = WHOIS_BACKEND_NATIVE
+
+DEFAULT_WHOIS_CACHE_MAX_BYTES = 8 * 1024 * 1024
+DEFAULT_WHOIS_CACHE_TTL_SEC = 3600
+
+# Оценка накладных расходов памяти на запись кэша WHOIS
+WHOIS_CACHE_ENTRY_OVERHEAD_BYTES = 300
+
+# Параметр команды: запросить данные заново, не используя кэш
+OPTION_FORCE = '-f'
+# Параметр команды /http_headers: показать время выполнения этапов запроса
+OPTION_TIMINGS = '-t'
+# Параметр команды /http_headers: следовать перенаправлениям
+OPTION_FOLLOW = '-L'
+
+DEFAULT_HTTP_MAX_REDIRECTS = 5
+
+# Полосы выполнения обработчиков: быстрые обработчики (статические ответы и
+# смена состояния) и обработчики, обращающиеся к внешним источникам данных
+LANE_FAST = 'fast'
+LANE_SUBPROCESS = 'subprocess'
+LANE_DNS = 'dns'
+LANE_WHOIS = 'whois'
+LANE_HTTP = 'http'
+# Полоса -> (количество одновременно выполняемых обработчиков, длина очереди)
+DEFAULT_LANES = {
+    LANE_FAST: (64, 256),
+    LANE_SUBPROCESS: (8, 32),
+    LANE_DNS: (32, 64),
+    LANE_WHOIS: (16, 64),
+    LANE_HTTP: (16, 64),
+}
+
+# Способы получения обновлений от Telegram: long polling или webhook (сервер
+# HTTP, на который Telegram отправляет обновления)
+UPDATES_MODE_POLLING = 'polling'
+UPDATES_MODE_WEBHOOK = 'webhook'
+DEFAULT_UPDATES_MODE = UPDATES_MODE_POLLING
+
+# Максимальное количество объектов (хостов, сайтов) в одном запросе и
+# количество одновременно выполняемых запросов для них
+DEFAULT_BATCH_MAX_TARGETS = 20
+DEFAULT_BATCH_CONCURRENCY = 5
+
+# Способы получения данных DNS: собственным клиентом или внешней программой
+# host
+DNS_BACKEND_NATIVE = 'native'
+DNS_BACKEND_SUBPROCESS = 'subprocess'
+DEFAULT_DNS_BACKEND = DNS_BACKEND_NATIVE
+
+DEFAULT_DNS_CACHE_MAX_BYTES = 4 * 1024 * 1024
 
 # Объект для контроля за количеством запросов к боту
 net_request_limit = None
@@ -268,9 +358,68 @@ net_request_limit = None
 # Объект для контроля корректности хостов и IP-адресов
 host_checker = None
 
+# Объект для запуска внешних программ (host, whois)
+subprocess_runner = None
+
+# Клиент DNS (если None, используется внешняя программа host)
+dns_resolver = None
+
+# Клиент WHOIS (если None, используется внешняя программа whois)
+whois_client = None
+
+# Объект для получения заголовков HTTP
+http_probe = None
+
+# Максимальное количество перенаправлений для /http_headers -L
+http_max_redirects = DEFAULT_HTTP_MAX_REDIRECTS
+
+# Ограничения для запросов с несколькими объектами
+batch_max_targets = DEFAULT_BATCH_MAX_TARGETS
+batch_concurrency = DEFAULT_BATCH_CONCURRENCY
+
+# Объединение одновременных одинаковых запросов к внешним источникам данных
+lookup_flight = SingleFlight()
+
+# Очереди запросов пользователей к внешним источникам данных
+work_scheduler = FairScheduler()
+
+# Полосы выполнения по именам (создаются в main, см. create_lanes)
+lanes = {}
+
+# Планировщик отправки сообщений (создаётся в main после создания бота)
+send_scheduler = None
+
+# Минимальный интервал обновления ответа, который выводится по частям, и
+# длина ответа, начиная с которой он отправляется файлом (None - значения по
+# умолчанию, см. StreamingReply)
+reply_edit_interval_sec = None
+reply_document_threshold = None
+
+# Кэш ответов WHOIS (если None, ответы не кэшируются)
+whois_cache = None
+whois_cache_ttl_sec = DEFAULT_WHOIS_CACHE_TTL_SEC
+
+# Максимальное время выполнения внешних программ, в секундах
+dns_timeout_sec = DEFAULT_DNS_TIMEOUT_SEC
+whois_timeout_sec = DEFAULT_WHOIS_TIMEOUT_SEC
+
 REQUEST_LIMIT_MESSAGE = "Достигнут лимит обращений, попробуйте повторить " + \
                         "запрос немного позднее"
 
+LANE_FULL_MESSAGE = "Бот перегружен, попробуйте повторить запрос немного " + \
+                    "позднее"
+
+QUEUED_MESSAGE = "Запрос поставлен в очередь, номер в очереди: {}"
+
+BATCH_TOO_BIG_MESSAGE = "Слишком много объектов в одном запросе " + \
+                        "(допускается не больше {})"
+
+TRUNCATED_MESSAGE = "[Ответ слишком большой, выведена только его часть]"
+
+PROGRESS_MESSAGE = "Запрос выполняется..."
+
+DOCUMENT_MESSAGE = "Ответ слишком большой, он отправлен файлом"
+
 # def get_whois_data_old(host: str) -> (str, int):
 
 #     logger = logging.getLogger(__name__)
@@ -305,7 +454,43 @@ REQUEST_LIMIT_MESSAGE = "Достигнут лимит обращений, по
 #     return (text_data, NO_ERROR)
 
 
-def get_dns_data(host: str) -> (str, int):
+async def run_lookup_command(args: list[str],
+                             timeout_sec: float) -> (str, int):
+    """
+    Выполнить внешнюю программу для получения данных о хосте.
+
+    Parameters
+    ----------
+    args : list[str]
+        Программа и её аргументы.
+    timeout_sec : float
+        Максимальное время выполнения программы, в секундах.
+
+    Returns
+    -------
+    (str, int)
+        Вывод программы (или None) и код ошибки.
+
+    """
+
+    logger = logging.getLogger(__name__)
+
+    try:
+        (text_data, truncated) = await subprocess_runner.run_text(
+            args, timeout_sec=timeout_sec)
+        if text_data == '':
+            return (None, ERROR_NO_DATA)
+        if truncated:
+            text_data += "\n" + TRUNCATED_MESSAGE
+        return (text_data, NO_ERROR)
+    except asyncio.TimeoutError:
+        return (None, ERROR_TIMEOUT)
+    except Exception as e:
+        logger.error(e)
+        return (None, ERROR_INTERNAL_ERROR)
+
+
+async def get_dns_data(host: str) -> (str, int):
 
     logger = logging.getLogger(__name__)
 
@@ -314,21 +499,85 @@ def get_dns_data(host: str) -> (str, int):
     if not host_checker.ok(host):
         return (None, ERROR_INCORRECT_VALUE)
 
-    text_data = ''
+    if dns_resolver is None:
+        return await run_lookup_command(['host', '-a', host],
+                                        dns_timeout_sec)
+
     try:
-        with subprocess.Popen(['host', '-a', host],
-                              stdout=subprocess.PIPE) as proc:
-            text_data_b = proc.stdout.read()
-            if text_data_b is None or len(text_data_b) == 0:
-                return (None, ERROR_NO_DATA)
-            text_data = text_data_b.decode('utf-8')
-            return (text_data, NO_ERROR)
+        text_data = await dns_resolver.lookup(host)
+    except asyncio.TimeoutError:
+        return (None, ERROR_TIMEOUT)
+    except ValueError:
+        return (None, ERROR_INCORRECT_VALUE)
+    except (DnsError, OSError) as e:
+        logger.error("DNS query error for host %s: %s", host, e)
+        return (None, ERROR_NO_DATA)
     except Exception as e:
         logger.error(e)
         return (None, ERROR_INTERNAL_ERROR)
+    finally:
+        if dns_resolver.cache is not None:
+            logger.debug("DNS cache stats: %s", dns_resolver.cache.stats())
+
+    return (text_data, NO_ERROR)
+
+
+async def query_whois_data(host: str) -> (str, int):
+    """
+    Получить данные WHOIS для хоста (без использования кэша).
+
+    Parameters
+    ----------
+    host : str
+        Имя домена или IP-адрес.
 
+    Returns
+    -------
+    (str, int)
+        Данные WHOIS (или None) и код ошибки.
 
-def get_whois_data(host: str) -> (str, int):
+    """
+
+    logger = logging.getLogger(__name__)
+
+    if whois_client is None:
+        return await run_lookup_command(['whois', host], whois_timeout_sec)
+
+    try:
+        (text_data, truncated) = await whois_client.query(host)
+    except asyncio.TimeoutError:
+        return (None, ERROR_TIMEOUT)
+    except OSError as e:
+        logger.error("Whois query error for host %s: %s", host, e)
+        return (None, ERROR_NO_DATA)
+    except Exception as e:
+        logger.error(e)
+        return (None, ERROR_INTERNAL_ERROR)
+
+    if text_data.strip() == '':
+        return (None, ERROR_NO_DATA)
+    if truncated:
+        text_data += "\n" + TRUNCATED_MESSAGE
+    return (text_data, NO_ERROR)
+
+
+async def get_whois_data(host: str, use_cache: bool = True) -> (str, int):
+    """
+    Получить данные WHOIS для хоста, по возможности из кэша.
+
+    Parameters
+    ----------
+    host : str
+        Имя домена или IP-адрес.
+    use_cache : bool, optional
+        Если False, данные запрашиваются заново (и обновляются в кэше).
+
+    Returns
+    -------
+    (str, int)
+        Данные WHOIS (или None) и код ошибки.
+
+    """
 
     logger = logging.getLogger(__name__)
 
@@ -337,111 +586,298 @@ def get_whois_data(host: str) -> (str, int):
     if not host_checker.ok(host):
         return (None, ERROR_INCORRECT_VALUE)
 
-    text_data = ''
-    try:
-        with subprocess.Popen(['whois', host], stdout=subprocess.PIPE) as proc:
-            text_data_b = proc.stdout.read()
-            if text_data_b is None or len(text_data_b) == 0:
-                return (None, ERROR_NO_DATA)
-            text_data = text_data_b.decode('utf-8')
+    cache_key = idna_domain(host)
+    if use_cache and whois_cache is not None:
+        text_data = whois_cache.get(cache_key)
+        if text_data is not None:
+            logger.debug("Whois cache hit for host %s, cache stats: %s",
+                         host, whois_cache.stats())
             return (text_data, NO_ERROR)
-    except Exception as e:
-        logger.error(e)
-        return (None, ERROR_INTERNAL_ERROR)
 
+    (text_data, error) = await query_whois_data(host)
 
-dp = Dispatcher(storage=MemoryStorage())
+    if error == NO_ERROR and whois_cache is not None:
+        whois_cache.put(cache_key,
+                        text_data,
+                        whois_cache_ttl_sec,
+                        WHOIS_CACHE_ENTRY_OVERHEAD_BYTES +
+                        len(text_data.encode('utf-8')))
+    return (text_data, error)
 
 
-async def dns_answer(message: Message,
-                     text: str):
-    user_id = message.from_user.id
+def split_options(text: str, known_options: tuple) -> (set, str):
+    """
+    Отделить параметры команды, указанные перед её аргументом.
 
-    if net_request_limit.request(user_id):
+    Parameters
+    ----------
+    text : str
+        Текст аргумента команды, например: "-f example.com".
+    known_options : tuple
+        Допустимые параметры. Прочие слова, начинающиеся с "-", считаются
+        частью аргумента.
 
-        host = text
+    Returns
+    -------
+    (set, str)
+        Множество найденных параметров и оставшийся текст.
 
-        (dns_text, error) = get_dns_data(host)
+    """
+    options = set()
+    words = text.split()
+    while words and words[0] in known_options:
+        options.add(words.pop(0))
+    if not options:
+        return (options, text)
+    return (options, ' '.join(words))
 
-        if dns_text is None:
-            if error == ERROR_INTERNAL_ERROR:
-                logger = logging.getLogger(__name__)
-                logger.error("Internal error for /dns for host %s", host)
-            dns_text = WHOIS_ERROR_MESSAGES.get(error, "Неизвестная ошибка")
 
-        dns_text = 'DNS records for ' + host + "\n\n" + dns_text
+dp = Dispatcher(storage=BoundedMemoryStorage())
 
-        await message.reply(dns_text,
-                            link_preview_options=LinkPreviewOptions(
-                                is_disabled=True))
-    else:
-        await message.reply(REQUEST_LIMIT_MESSAGE)
+def command_lane(command: str) -> str:
+    """
+    Полоса выполнения для запросов команды к внешним источникам данных
+    (зависит от способа получения данных). Обработчики команд выполняются в
+    быстрой полосе, а место в полосе команды занимается только на время
+    самого запроса, после допуска по лимиту запросов (см. batch_answer).
+    """
+    if command == CMD_DNS:
+        return LANE_DNS if dns_resolver is not None else LANE_SUBPROCESS
+    if command == CMD_WHOIS:
+        return LANE_WHOIS if whois_client is not None else LANE_SUBPROCESS
+    if command == CMD_HTTP_HEADERS:
+        return LANE_HTTP
+    return LANE_FAST
 
 
-async def whois_answer(message: Message,
-                       text: str):
-    user_id = message.from_user.id
+async def lane_full_answer(event, lane: Lane):
+    if isinstance(event, Message):
+        send_scheduler.submit(event.reply(LANE_FULL_MESSAGE))
 
-    if net_request_limit.request(user_id):
 
-        host = text
+def create_lanes(lanes_config: dict) -> dict:
+    """
+    Создать полосы выполнения по настройкам (для полос, не указанных в
+    настройках, используются значения по умолчанию).
+    """
+    lanes = {}
+    for (name, (max_concurrency, max_queue)) in DEFAULT_LANES.items():
+        lane_config = lanes_config.get(name, {})
+        lanes[name] = Lane(
+            name,
+            max_concurrency=lane_config.get('max_concurrency',
+                                            max_concurrency),
+            max_queue=lane_config.get('max_queue', max_queue))
+    return lanes
+
+
+async def batch_answer(message: Message,
+                       text: str,
+                       known_options: tuple,
+                       lookup: typing.Callable[[str, set],
+                                               typing.Awaitable[str]],
+                       lane: Lane = None):
+    """
+    Ответить на запрос для одного или нескольких объектов (имён хостов,
+    адресов сайтов), указанных через пробел или с новой строки. Каждый
+    объект учитывается в лимите запросов; запросы выполняются одновременно
+    (не больше batch_concurrency) через общий планировщик work_scheduler:
+    если лимит запросов исчерпан, запрос ожидает в очереди, и пользователю
+    сообщается его номер в очереди. Место в полосе выполнения lane
+    занимается только на время самого запроса, поэтому запросы, ожидающие
+    лимита, не занимают полосу. Ответы выводятся по мере получения (в
+    порядке объектов в запросе) в одно сообщение, которое при необходимости
+    делится на несколько или заменяется файлом (см. StreamingReply).
+
+    Parameters
+    ----------
+    message : Message
+        Обрабатываемое сообщение.
+    text : str
+        Параметры команды и объекты запроса.
+    known_options : tuple
+        Допустимые параметры команды (см. split_options).
+    lookup : Callable[[str, set], Awaitable[str]]
+        Функция, возвращающая текст ответа для одного объекта с учётом
+        параметров команды.
+    lane : Lane, optional
+        Полоса выполнения запросов (если None, количество одновременных
+        запросов ограничивается только планировщиком).
+
+    Returns
+    -------
+    None.
 
-        (whois_text, error) = get_whois_data(host)
+    """
+    user_id = message.from_user.id
 
-        if whois_text is None:
-            if error == ERROR_INTERNAL_ERROR:
+    (options, targets_text) = split_options(text, known_options)
+    targets = targets_text.split()
+
+    if not targets:
+        send_scheduler.submit(
+            message.reply(WHOIS_ERROR_MESSAGES[ERROR_INCORRECT_VALUE]))
+        return
+    if len(targets) > batch_max_targets:
+        send_scheduler.submit(
+            message.reply(BATCH_TOO_BIG_MESSAGE.format(batch_max_targets)))
+        return
+
+    semaphore = asyncio.Semaphore(batch_concurrency)
+    queued_notified = False
+
+    async def notify_queued(position: int):
+        nonlocal queued_notified
+        if not queued_notified:
+            queued_notified = True
+            send_scheduler.submit(
+                message.reply(QUEUED_MESSAGE.format(position)))
+
+    reply = StreamingReply(
+        message, send_scheduler,
+        placeholder=PROGRESS_MESSAGE,
+        document_message=DOCUMENT_MESSAGE,
+        edit_interval_sec=reply_edit_interval_sec,
+        document_threshold=reply_document_threshold,
+        # reply_markup=create_menu_main(),
+        link_preview_options=LinkPreviewOptions(is_disabled=True))
+    await reply.start()
+
+    answers = [None] * len(targets)
+    done = [False] * len(targets)
+    appended = 0
+
+    def append_ready():
+        # Ответы выводятся в порядке объектов в запросе
+        nonlocal appended
+        while appended < len(targets) and done[appended]:
+            answer = answers[appended]
+            if answer is None:
+                answer = targets[appended] + "\n\n" + REQUEST_LIMIT_MESSAGE
+            reply.append(answer if appended == 0 else "\n\n" + answer)
+            appended += 1
+
+    async def lane_lookup(target: str) -> str:
+        if lane is None:
+            return await lookup(target, options)
+        async with lane.slot():
+            return await lookup(target, options)
+
+    async def target_answer(index: int, target: str):
+        async with semaphore:
+            try:
+                answers[index] = await work_scheduler.run(
+                    user_id,
+                    lambda: lane_lookup(target),
+                    admit=lambda: net_request_limit.request_async(user_id),
+                    on_queued=notify_queued)
+            except (QueueFullError, QueueTimeoutError) as e:
+                logger = logging.getLogger(__name__)
+                logger.info("Request for %s rejected: %s", target, e)
+            except LaneFullError as e:
                 logger = logging.getLogger(__name__)
-                logger.error("Internal error for /whois for host %s", host)
-            whois_text = WHOIS_ERROR_MESSAGES.get(error, "Неизвестная ошибка")
+                logger.warning("%s, stats: %s", e, lane.stats())
+                answers[index] = target + "\n\n" + LANE_FULL_MESSAGE
+            except Exception:
+                # Ошибка одного объекта не должна оставить пользователя
+                # без ответа по остальным
+                logger = logging.getLogger(__name__)
+                logger.exception("Request for %s failed", target)
+                answers[index] = target + "\n\n" + \
+                    WHOIS_ERROR_MESSAGES[ERROR_INTERNAL_ERROR]
+        done[index] = True
+        append_ready()
+
+    await asyncio.gather(*(target_answer(index, target)
+                           for (index, target) in enumerate(targets)))
+    if all(answer is None for answer in answers):
+        await reply.finish(REQUEST_LIMIT_MESSAGE)
+    else:
+        await reply.finish()
 
-        whois_text = 'whois ' + host + "\n\n" + whois_text
 
-        await message.reply(whois_text,
-                            # reply_markup=create_menu_main(),
-                            link_preview_options=LinkPreviewOptions(
-                                is_disabled=True))
+async def dns_lookup_text(host: str, options: set) -> str:
 
-    else:
-        await message.reply(REQUEST_LIMIT_MESSAGE)
+    (dns_text, error) = await lookup_flight.do(
+        (CMD_DNS, idna_domain(host)),
+        lambda: get_dns_data(host))
 
+    if dns_text is None:
+        if error == ERROR_INTERNAL_ERROR:
+            logger = logging.getLogger(__name__)
+            logger.error("Internal error for /dns for host %s", host)
+        dns_text = WHOIS_ERROR_MESSAGES.get(error, "Неизвестная ошибка")
 
-async def http_headers_answer(message: Message,
-                              text: str):
+    return 'DNS records for ' + host + "\n\n" + dns_text
+
+
+async def dns_answer(message: Message,
+                     text: str):
+    await batch_answer(message, text, (), dns_lookup_text,
+                       lane=lanes.get(command_lane(CMD_DNS)))
+
+
+async def whois_lookup_text(host: str, options: set) -> str:
+
+    use_cache = OPTION_FORCE not in options
+    (whois_text, error) = await lookup_flight.do(
+        (CMD_WHOIS, idna_domain(host), use_cache),
+        lambda: get_whois_data(host, use_cache=use_cache))
+
+    if whois_text is None:
+        if error == ERROR_INTERNAL_ERROR:
+            logger = logging.getLogger(__name__)
+            logger.error("Internal error for /whois for host %s", host)
+        whois_text = WHOIS_ERROR_MESSAGES.get(error, "Неизвестная ошибка")
+
+    return 'whois ' + host + "\n\n" + whois_text
+
+
+async def whois_answer(message: Message,
+                       text: str):
+    await batch_answer(message, text, (OPTION_FORCE,), whois_lookup_text,
+                       lane=lanes.get(command_lane(CMD_WHOIS)))
+
+
+async def http_headers_lookup_text(site: str, options: set) -> str:
 
     logger = logging.getLogger(__name__)
 
-    logger.debug('Headers request for site: %s', text)
+    normalized_site = normalize_site(site)
 
-    user_id = message.from_user.id
+    logger.debug('Headers request for normalized site name: %s',
+                 normalized_site)
 
-    if net_request_limit.request(user_id):
+    show_timings = OPTION_TIMINGS in options
+    follow_redirects = OPTION_FOLLOW in options
+    (headers_text, error) = await lookup_flight.do(
+        (CMD_HTTP_HEADERS, normalized_site.lower(), show_timings,
+         follow_redirects),
+        lambda: get_headers_data(normalized_site,
+                                 show_timings=show_timings,
+                                 follow_redirects=follow_redirects))
 
-        site = text
+    if headers_text is None:
+        if error == ERROR_INTERNAL_ERROR:
+            logger.error("Internal error for /http_headers for site %s",
+                         site)
+        headers_text = WHOIS_ERROR_MESSAGES.get(error,
+                                                "Неизвестная ошибка")
 
-        normalized_site = normalize_site(site)
+    return 'Заголовки HTTP для сайта ' + normalized_site + ":\n\n" + \
+        headers_text
 
-        logger.debug('Headers request for normalized site name: %s',
-                     normalized_site)
 
-        (headers_text, error) = await get_headers_data(normalized_site)
+async def http_headers_answer(message: Message,
+                              text: str):
 
-        if headers_text is None:
-            if error == ERROR_INTERNAL_ERROR:
-                logger.error("Internal error for /http_headers for site %s",
-                             site)
-            headers_text = WHOIS_ERROR_MESSAGES.get(error,
-                                                    "Неизвестная ошибка")
+    logger = logging.getLogger(__name__)
 
-        headers_text = \
-            'Заголовки HTTP для сайта ' + normalized_site + ":\n\n" + \
-            headers_text
+    logger.debug('Headers request for sites: %s', text)
 
-        await message.reply(headers_text,
-                            # reply_markup=create_menu_main(),
-                            link_preview_options=LinkPreviewOptions(
-                                is_disabled=True))
-    else:
-        await message.reply(REQUEST_LIMIT_MESSAGE)
+    await batch_answer(message, text, (OPTION_TIMINGS, OPTION_FOLLOW),
+                       http_headers_lookup_text,
+                       lane=lanes.get(command_lane(CMD_HTTP_HEADERS)))
 
 
 @dp.message(CommandStart())
@@ -458,7 +894,7 @@ async def command_start_handler(message: Message) -> None:
     None
     """
     # await message.answer(HELP_TEXT, reply_markup=create_menu_main())
-    await message.answer(HELP_TEXT)
+    send_scheduler.submit(message.answer(HELP_TEXT))
 
 
 @dp.message(Command('help'))
@@ -475,7 +911,7 @@ async def command_help_handler(message: Message) -> None:
     None
     """
     # await message.answer(HELP_TEXT, reply_markup=create_menu_main())
-    await message.answer(HELP_TEXT)
+    send_scheduler.submit(message.answer(HELP_TEXT))
 
 
 @dp.message(Command('cancel'))
@@ -493,8 +929,8 @@ async def cmd_cancel_handler(message: Message, state: FSMContext):
     None.
     """
 
-    await message.answer('Команда отменена',
-                         reply_markup=ReplyKeyboardRemove())
+    send_scheduler.submit(message.answer('Команда отменена',
+                                         reply_markup=ReplyKeyboardRemove()))
     await state.set_state(UserState.command)
 
 
@@ -516,8 +952,10 @@ async def cmd_dns_handler(message: Message,
     """
 
     if command.args is None:
-        await message.answer('Вводите имена хостов (по одному):',
-                             reply_markup=ReplyKeyboardRemove())
+        send_scheduler.submit(
+            message.answer('Вводите имена хостов (одно или несколько '
+                           'в сообщении):',
+                           reply_markup=ReplyKeyboardRemove()))
         await state.set_state(UserState.dns_host)
     else:
         await dns_answer(message, command.args)
@@ -542,8 +980,10 @@ async def cmd_whois_handler(message: Message,
     """
 
     if command.args is None:
-        await message.answer('Вводите имена хостов (по одному):',
-                             reply_markup=ReplyKeyboardRemove())
+        send_scheduler.submit(
+            message.answer('Вводите имена хостов (одно или несколько '
+                           'в сообщении):',
+                           reply_markup=ReplyKeyboardRemove()))
         await state.set_state(UserState.whois_host)
     else:
         await whois_answer(message, command.args)
@@ -571,9 +1011,11 @@ async def cmd_http_headers_handler(message: Message,
     """
 
     if command.args is None:
-        await message.answer('Вводите адреса (по одному, ' +
-                             'по умолчанию предполагается https://):',
-                             reply_markup=ReplyKeyboardRemove())
+        send_scheduler.submit(
+            message.answer('Вводите адреса (один или несколько в ' +
+                           'сообщении, по умолчанию предполагается ' +
+                           'https://):',
+                           reply_markup=ReplyKeyboardRemove()))
         await state.set_state(UserState.http_headers_host)
     else:
         await http_headers_answer(message, command.args)
@@ -622,9 +1064,56 @@ def normalize_site(site: str) -> str:
     return site
 
 
-async def get_headers_data(site: str) -> (str, int):
+def format_ms(seconds: float) -> str:
+    return f'{seconds * 1000:.0f} мс'
+
+
+def timings_text(timings: ProbeTimings) -> str:
+    """
+    Время выполнения этапов запроса в виде текста для ответа пользователю.
+    """
+    parts = []
+    if timings.dns_sec is not None:
+        parts.append('DNS ' + format_ms(timings.dns_sec))
+    if timings.reused:
+        parts.append(f'соединение с {timings.address} использовано повторно')
+    else:
+        parts.append(f'TCP {format_ms(timings.connect_sec)} '
+                     f'({timings.address})')
+        if timings.tls_sec is not None:
+            parts.append('TLS ' + format_ms(timings.tls_sec) +
+                         (' (сессия возобновлена)' if timings.tls_resumed
+                          else ''))
+    parts.append('первый байт ' + format_ms(timings.first_byte_sec))
+    parts.append('всего ' + format_ms(timings.total_sec))
+    return 'Время: ' + ', '.join(parts) + '\n'
+
+
+async def get_headers_data(site: str,
+                           show_timings: bool = False,
+                           follow_redirects: bool = False) -> (str, int):
+    """
+    Получить заголовки HTTP сайта.
+
+    Parameters
+    ----------
+    site : str
+        Адрес сайта.
+    show_timings : bool, optional
+        Добавить к заголовкам время выполнения этапов запроса.
+    follow_redirects : bool, optional
+        Следовать перенаправлениям и показать заголовки для каждого из них.
+
+    Returns
+    -------
+    (str, int)
+        Заголовки (или None) и код ошибки.
+
+    """
 
     global host_checker
+    global http_probe
+    global http_max_redirects
 
     logger = logging.getLogger(__name__)
 
@@ -653,51 +1142,42 @@ async def get_headers_data(site: str) -> (str, int):
     #         return (None, ERROR_NO_DATA)
 
     try:
-        site_parsed = urlparse(site)
-        use_ssl = site_parsed.scheme == 'https'
-        host = site_parsed.hostname
-        port = site_parsed.port
-
+        host = urlparse(site).hostname
         if not host_checker.ok(host):
             return (None, ERROR_INCORRECT_VALUE)
-
-        if port is None:
-            port = 443 if use_ssl else 80
-        logger.debug('Connect data: %s %s %s', str(use_ssl), host, str(port))
-        if not re.match(r'\A[a-z0-9.-]*\Z', host, re.I):
-            host_parts = []
-            for p in host.split('.'):
-                if not re.match(r'\A[a-z0-9-]*\Z', p, re.I):
-                    host_parts.append('xn--' + p.encode('punycode').decode())
-                else:
-                    host_parts.append(p)
-            host = '.'.join(host_parts)
-
-        request_text = f"GET / HTTP/1.1\r\nHost: {host}\r\n\r\n"
-        logger.debug("Request text: %s", request_text)
-        request_data = request_text.encode()
-        reader, writer = \
-            await asyncio.open_connection(host=site_parsed.hostname,
-                                          port=port,
-                                          ssl=use_ssl)
-        writer.write(request_data)
-        await writer.drain()
-        lines = ''
-        logger.debug('Start reading from stream from host: %s',
-                     site_parsed.hostname)
-        while line := await reader.readline():
-            line_str = line.decode()
-            logger.debug('Read line: %s', line_str)
-            if re.match(r'\A\r?\n\Z', line_str):
-                break
-            lines += line_str
-        writer.close()
-        # await writer.wait_closed()
-        headers_text = lines
-        if len(headers_text) > HTTP_HEADERS_MAX_LENGTH:
-            logger.error("HTTP headers are to big for site %s",
-                         site)
-            return (None, ERROR_DATA_TOO_BIG)
+        if follow_redirects:
+            results = await http_probe.follow(site, http_max_redirects)
+        else:
+            results = [await http_probe.probe(site)]
+        hop_texts = []
+        for result in results:
+            hop_text = result.head.text
+            if follow_redirects:
+                hop_text = result.url + '\n' + hop_text
+            if show_timings:
+                hop_text += timings_text(result.timings)
+            hop_texts.append(hop_text)
+        headers_text = '\n'.join(hop_texts)
+    except AccessDeniedError as e:
+        logger.warning(str(e))
+        return (None, ERROR_ACCESS_DENIED)
+    except ResolveError as e:
+        logger.error(str(e))
+        return (None, ERROR_NO_DATA)
+    except HeadersTooBigError as e:
+        logger.error("%s: %s", site, e)
+        return (None, ERROR_DATA_TOO_BIG)
+    except ProbeTimeoutError as e:
+        logger.error("%s: %s", site, e)
+        return (None, ERROR_TIMEOUT)
+    except ProbeError as e:
+        logger.error("%s: %s", site, e)
+        return (None, ERROR_NO_DATA)
+    except (OSError, ssl.SSLError) as e:
+        # Соединение отвергнуто, сброшено или не прошла проверка
+        # сертификата - ошибка сайта, а не бота
+        logger.info("%s: %s", site, e)
+        return (None, ERROR_CONNECT)
     except Exception as e:
         logger.error("Exception: " + str(e))
         return (None, ERROR_INTERNAL_ERROR)
@@ -755,6 +1235,22 @@ Returns
 
     global net_request_limit
     global host_checker
+    global subprocess_runner
+    global dns_timeout_sec
+    global whois_timeout_sec
+    global whois_client
+    global whois_cache
+    global whois_cache_ttl_sec
+    global dns_resolver
+    global http_probe
+    global http_max_redirects
+    global batch_max_targets
+    global batch_concurrency
+    global work_scheduler
+    global lanes
+    global send_scheduler
+    global reply_edit_interval_sec
+    global reply_document_threshold
 
     arg_parser = argparse.ArgumentParser(
         prog=PROG_NAME
@@ -805,25 +1301,197 @@ Returns
         logger.setLevel(logging.DEBUG)
         logger.debug("Debug mode enabled")
 
-    net_request_limit = RequestLimit(
-        max_total_value=config.get('limit_max_total_value',
-                                   DEFAULT_REQUEST_LIMIT_TOTAL),
-        max_id_value=config.get('limit_max_id_value',
-                                DEFAULT_REQUEST_LIMIT_FOR_ID),
-        time_interval_sec=config.get('imit_time_interval_sec',
-                                     DEFAULT_REQUEST_LIMIT_TIME_INTERVAL_SEC))
+    limit_storage_type = config.get('limit_storage',
+                                    DEFAULT_REQUEST_LIMIT_STORAGE)
+    if limit_storage_type == REQUEST_LIMIT_STORAGE_MEMORY:
+        limit_storage = None
+    elif limit_storage_type == REQUEST_LIMIT_STORAGE_SQLITE:
+        try:
+            limit_storage = SqliteStorage(
+                config.get('limit_sqlite_path',
+                           DEFAULT_REQUEST_LIMIT_SQLITE_PATH))
+        except sqlite3.Error as e:
+            logger.error(f"Can't open the request limit database: {e}")
+            sys.exit(1)
+    else:
+        logger.error("Config error, unknown request limit storage: %s",
+                     limit_storage_type)
+        sys.exit(1)
+
+    fsm_storage_type = config.get('fsm_storage', DEFAULT_FSM_STORAGE)
+    if fsm_storage_type == FSM_STORAGE_MEMORY:
+        dp.fsm.storage = BoundedMemoryStorage(
+            max_entries=config.get('fsm_max_entries', None),
+            idle_ttl_sec=config.get('fsm_idle_ttl_sec', None))
+    elif fsm_storage_type == FSM_STORAGE_SQLITE:
+        try:
+            dp.fsm.storage = SqliteFsmStorage(
+                config.get('fsm_sqlite_path', DEFAULT_FSM_SQLITE_PATH),
+                idle_ttl_sec=config.get('fsm_idle_ttl_sec', None))
+        except sqlite3.Error as e:
+            logger.error(f"Can't open the FSM state database: {e}")
+            sys.exit(1)
+    else:
+        logger.error("Config error, unknown FSM storage: %s",
+                     fsm_storage_type)
+        sys.exit(1)
+
+    try:
+        net_request_limit = RequestLimit(
+            max_total_value=config.get('limit_max_total_value',
+                                       DEFAULT_REQUEST_LIMIT_TOTAL),
+            max_id_value=config.get('limit_max_id_value',
+                                    DEFAULT_REQUEST_LIMIT_FOR_ID),
+            time_interval_sec=config.get(
+                'limit_time_interval_sec',
+                DEFAULT_REQUEST_LIMIT_TIME_INTERVAL_SEC),
+            algorithm=config.get('limit_algorithm',
+                                 DEFAULT_REQUEST_LIMIT_ALGORITHM),
+            storage=limit_storage)
+    except ValueError as e:
+        logger.error(f"Config error: {e}")
+        sys.exit(1)
+
+    blocklist = None
+    blocklist_path = config.get('blocklist_index', None)
+    if blocklist_path is not None:
+        try:
+            blocklist = BlocklistIndex(blocklist_path)
+        except (OSError, BlocklistFormatError) as e:
+            logger.error(f"Can't load the blocklist index: {e}")
+            sys.exit(1)
 
     host_checker = HostChecker(
         hostname_min_len=config.get('hostname_min_len', None),
         hostname_max_len=config.get('hostname_max_len', None),
         restricted_hostnames=config.get('restricted_hostnames', []),
         restricted_ipv4=config.get('restricted_ipv4', []),
-        restricted_ipv6=config.get('restricted_ipv6', [])
+        restricted_ipv6=config.get('restricted_ipv6', []),
+        blocklist=blocklist
         )
 
+    http_max_redirects = config.get('http_max_redirects',
+                                    DEFAULT_HTTP_MAX_REDIRECTS)
+    batch_max_targets = config.get('batch_max_targets',
+                                   DEFAULT_BATCH_MAX_TARGETS)
+    batch_concurrency = config.get('batch_concurrency',
+                                   DEFAULT_BATCH_CONCURRENCY)
+    reply_edit_interval_sec = config.get('reply_edit_interval_sec', None)
+    reply_document_threshold = config.get('reply_document_threshold', None)
+    work_scheduler = FairScheduler(
+        max_concurrency=config.get('work_max_concurrency', None),
+        max_queue_per_user=config.get('work_max_queue_per_user', None),
+        max_wait_sec=config.get('work_max_wait_sec', None))
+    http_probe = HttpProbe(
+        host_checker,
+        max_headers_length=HTTP_HEADERS_MAX_LENGTH,
+        pool=ConnectionPool(
+            max_idle=config.get('http_pool_max_idle', None),
+            max_idle_per_key=config.get('http_pool_max_idle_per_host', None),
+            idle_timeout_sec=config.get('http_pool_idle_timeout_sec', None)),
+        read_timeout_sec=config.get('http_read_timeout_sec', None),
+        resolve_timeout_sec=config.get('http_resolve_timeout_sec', None),
+        connect_timeout_sec=config.get('http_connect_timeout_sec', None),
+        tls_timeout_sec=config.get('http_tls_timeout_sec', None),
+        first_byte_timeout_sec=config.get('http_first_byte_timeout_sec',
+                                          None),
+        happy_eyeballs_delay_sec=config.get('http_happy_eyeballs_delay_sec',
+                                            None))
+
+    subprocess_runner = SubprocessRunner(
+        max_concurrency=config.get('subprocess_max_concurrency',
+                                   DEFAULT_SUBPROCESS_MAX_CONCURRENCY),
+        max_bytes=config.get('subprocess_max_bytes',
+                             DEFAULT_SUBPROCESS_MAX_BYTES))
+    dns_timeout_sec = config.get('dns_timeout_sec', DEFAULT_DNS_TIMEOUT_SEC)
+    whois_timeout_sec = config.get('whois_timeout_sec',
+                                   DEFAULT_WHOIS_TIMEOUT_SEC)
+
+    dns_backend = config.get('dns_backend', DEFAULT_DNS_BACKEND)
+    if dns_backend == DNS_BACKEND_NATIVE:
+        dns_cache_max_bytes = config.get('dns_cache_max_bytes',
+                                         DEFAULT_DNS_CACHE_MAX_BYTES)
+        dns_cache = None
+        if dns_cache_max_bytes > 0:
+            dns_cache = DnsCache(
+                max_bytes=dns_cache_max_bytes,
+                negative_ttl_sec=config.get('dns_cache_negative_ttl_sec',
+                                            None),
+                servfail_ttl_sec=config.get('dns_cache_servfail_ttl_sec',
+                                            None),
+                max_ttl_sec=config.get('dns_cache_max_ttl_sec', None))
+        dns_resolver = DnsResolver(
+            nameserver=config.get('dns_nameserver', None),
+            port=config.get('dns_port', None),
+            timeout_sec=dns_timeout_sec,
+            cache=dns_cache)
+    elif dns_backend != DNS_BACKEND_SUBPROCESS:
+        logger.error("Config error, unknown DNS backend: %s", dns_backend)
+        sys.exit(1)
+
+    whois_cache_max_bytes = config.get('whois_cache_max_bytes',
+                                       DEFAULT_WHOIS_CACHE_MAX_BYTES)
+    if whois_cache_max_bytes > 0:
+        whois_cache = TtlLruCache(max_bytes=whois_cache_max_bytes)
+    whois_cache_ttl_sec = config.get('whois_cache_ttl_sec',
+                                     DEFAULT_WHOIS_CACHE_TTL_SEC)
+
+    whois_backend = config.get('whois_backend', DEFAULT_WHOIS_BACKEND)
+    if whois_backend == WHOIS_BACKEND_NATIVE:
+        whois_client = WhoisClient(
+            timeout_sec=whois_timeout_sec,
+            max_bytes=config.get('whois_max_bytes', DEFAULT_WHOIS_MAX_BYTES),
+            max_referrals=config.get('whois_max_referrals',
+                                     DEFAULT_WHOIS_MAX_REFERRALS),
+            server_checker=host_checker.ok,
+            address_checker=lambda address: host_checker.check_ip(address)
+            == HostChecker.ADDRESS_OK)
+    elif whois_backend != WHOIS_BACKEND_SUBPROCESS:
+        logger.error("Config error, unknown whois backend: %s", whois_backend)
+        sys.exit(1)
+
+    lanes = create_lanes(config.get('lanes', {}))
+    lane_middleware = LaneMiddleware(lanes,
+                                     default_lane=LANE_FAST,
+                                     on_full=lane_full_answer)
+    dp.message.middleware(lane_middleware)
+    dp.inline_query.middleware(lane_middleware)
+
     bot = Bot(token=token)
+    send_scheduler = SendScheduler(
+        bot,
+        global_rate=config.get('send_global_rate', None),
+        chat_rate=config.get('send_chat_rate', None),
+        chat_burst=config.get('send_chat_burst', None),
+        max_retries=config.get('send_max_retries', None))
+
+    updates_mode = config.get('updates_mode', DEFAULT_UPDATES_MODE)
+    if updates_mode == UPDATES_MODE_WEBHOOK:
+        try:
+            webhook_server = WebhookServer(
+                dp, bot,
+                secret_token=env.get('WEBHOOK_SECRET_TOKEN',
+                                     config.get('webhook_secret_token')),
+                host=config.get('webhook_host', None),
+                port=config.get('webhook_port', None),
+                path=config.get('webhook_path', None),
+                url=config.get('webhook_url', None))
+        except ValueError as e:
+            logger.error(f"Config error: {e}")
+            sys.exit(1)
+    elif updates_mode != UPDATES_MODE_POLLING:
+        logger.error("Config error, unknown updates mode: %s", updates_mode)
+        sys.exit(1)
 
-    await dp.start_polling(bot)
+    await send_scheduler.start()
+    try:
+        if updates_mode == UPDATES_MODE_WEBHOOK:
+            await webhook_server.serve_forever()
+        else:
+            await dp.start_polling(bot)
+    finally:
+        await send_scheduler.close()
+        await http_probe.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 15:10:26 2026
+
+@author: askh
+"""
+
+import ipaddress
+import os
+import random
+import tempfile
+import unittest
+from blocklist_index import BlocklistFormatError, BlocklistIndex, \
+    compile_blocklist
+from host_check import HostChecker
+
+
+class BlocklistIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmp_dir.name, name)
+
+    def write(self, name: str, text: str) -> str:
+        path = self.path(name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def compile(self, *sources) -> BlocklistIndex:
+        compile_blocklist(sources, self.path('blocklist.idx'))
+        index = BlocklistIndex(self.path('blocklist.idx'))
+        self.addCleanup(index.close)
+        return index
+
+    def test_text_and_yaml(self):
+        text = self.write('list.txt', """\
+# Комментарий
+10.0.0.0/8
+192.0.2.1  # адрес
+fd00::/8
+bad.example.com
+*.internal.corp
+Пример.рф.
+""")
+        config = self.write('config.yaml', """\
+restricted_hostnames:
+  - localhost
+restricted_ipv4:
+  - 127.0.0.0/8
+restricted_ipv6:
+  - ::1/128
+""")
+        index = self.compile(text, config)
+        for addr in ('10.1.2.3', '192.0.2.1', 'fd12::1', '127.0.0.1', '::1'):
+            self.assertTrue(index.contains_ip(ipaddress.ip_address(addr)),
+                            msg=addr)
+        for addr in ('11.0.0.1', '192.0.2.2', 'fe80::1', '::2'):
+            self.assertFalse(index.contains_ip(ipaddress.ip_address(addr)),
+                             msg=addr)
+        for name in ('bad.example.com', 'BAD.example.com.', 'localhost',
+                     'a.internal.corp', 'a.b.internal.corp', 'пример.рф'):
+            self.assertTrue(index.match_hostname(name), msg=name)
+        for name in ('example.com', 'x.bad.example.com', 'internal.corp',
+                     'corp', 'localhost.example.com'):
+            self.assertFalse(index.match_hostname(name), msg=name)
+
+    def test_same_as_host_checker(self):
+        rnd = random.Random(77)
+        networks = []
+        for _ in range(2000):
+            prefix = rnd.randint(8, 32)
+            addr = ipaddress.IPv4Address(rnd.getrandbits(32))
+            networks.append(str(ipaddress.ip_network(f"{addr}/{prefix}",
+                                                     strict=False)))
+        index = self.compile(self.write('list.txt', "\n".join(networks)))
+        host_checker = HostChecker(restricted_ipv4=networks)
+        for _ in range(5000):
+            addr = ipaddress.IPv4Address(rnd.getrandbits(32))
+            self.assertEqual(
+                index.contains_ip(addr),
+                host_checker.check_ip(str(addr)) ==
+                HostChecker.ADDRESS_DENIED,
+                msg=str(addr))
+
+    def test_empty(self):
+        index = self.compile(self.write('list.txt', ''))
+        self.assertFalse(index.contains_ip(ipaddress.ip_address('1.2.3.4')))
+        self.assertFalse(index.match_hostname('example.com'))
+
+    def test_bad_file(self):
+        with self.assertRaises(BlocklistFormatError):
+            BlocklistIndex(self.write('bad.idx', 'x' * 100))
+
+    def test_host_checker_blocklist(self):
+        index = self.compile(self.write('list.txt',
+                                        "203.0.113.0/24\nbad.example.com\n"))
+        host_checker = HostChecker(blocklist=index)
+        self.assertFalse(host_checker.ok('203.0.113.5'))
+        self.assertFalse(host_checker.ok('bad.example.com'))
+        self.assertTrue(host_checker.ok('good.example.com'))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 18:52:14 2026
+
+@author: askh
+"""
+
+import asyncio
+import unittest
+from connection_pool import ConnectionPool
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeConnection:
+
+    def __init__(self, alive: bool = True):
+        self.alive = alive
+        self.closed = False
+        self.idle_since = None
+
+    def is_alive(self) -> bool:
+        return self.alive and not self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_reuse(self):
+        pool = ConnectionPool()
+        connection = FakeConnection()
+        await pool.release('a', connection)
+        self.assertIsNone(await pool.acquire('b'))
+        self.assertIs(await pool.acquire('a'), connection)
+        self.assertIsNone(await pool.acquire('a'))
+        self.assertEqual(pool.reused, 1)
+
+    async def test_not_reusable(self):
+        pool = ConnectionPool()
+        connections = [FakeConnection(), FakeConnection(alive=False)]
+        await pool.release('a', connections[0], reusable=False)
+        await pool.release('a', connections[1])
+        self.assertEqual(len(pool), 0)
+        self.assertTrue(all(c.closed for c in connections))
+
+    async def test_idle_timeout(self):
+        clock = FakeClock()
+        pool = ConnectionPool(idle_timeout_sec=10, clock=clock)
+        connection = FakeConnection()
+        await pool.release('a', connection)
+        clock.now = 10
+        self.assertIsNone(await pool.acquire('a'))
+        self.assertTrue(connection.closed)
+
+    async def test_idle_timeout_without_acquire(self):
+        pool = ConnectionPool(idle_timeout_sec=0.1)
+        connections = [FakeConnection(), FakeConnection()]
+        await pool.release('a', connections[0])
+        await asyncio.sleep(0.06)
+        await pool.release('b', connections[1])
+        await asyncio.sleep(0.06)
+        # Соединение закрывается, даже если пул больше не используется
+        self.assertEqual([c.closed for c in connections], [True, False])
+        self.assertEqual(len(pool), 1)
+        await asyncio.sleep(0.1)
+        self.assertTrue(connections[1].closed)
+        self.assertEqual(len(pool), 0)
+        await pool.close()
+
+    async def test_limits(self):
+        pool = ConnectionPool(max_idle=3, max_idle_per_key=2)
+        connections = [FakeConnection() for _ in range(5)]
+        for (key, connection) in zip('aaabc', connections):
+            await pool.release(key, connection)
+        self.assertEqual(len(pool), 3)
+        self.assertEqual([c.closed for c in connections],
+                         [True, True, False, False, False])
+
+    async def test_close(self):
+        pool = ConnectionPool()
+        connection = FakeConnection()
+        await pool.release('a', connection)
+        await pool.close()
+        self.assertEqual(len(pool), 0)
+        self.assertTrue(connection.closed)
+        self.assertIsNone(pool.reaper)
+
+
+if __name__ == '__main__':
+    unittest.main()
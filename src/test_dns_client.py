@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:10:44 2026
+
+@author: askh
+"""
+
+import asyncio
+import ipaddress
+import struct
+import unittest
+import dns_client
+from dns_client import DnsCache, DnsResolver, encode_name, \
+    parse_response, build_query
+from test_ttl_cache import FakeClock
+
+
+class StubDnsServer:
+    """
+    Сервер DNS для тестов, отвечающий записями из словаря
+    {(имя, тип): [rdata, ...]}. Имена, отсутствующие в словаре, не существуют
+    (NXDOMAIN).
+    """
+
+    BIND_ATTEMPTS = 20
+
+    def __init__(self, zone: dict, ttl: int = 300, truncate_udp=False,
+                 rcode: int = None):
+        self.zone = zone
+        self.ttl = ttl
+        self.truncate_udp = truncate_udp
+        self.rcode = rcode
+        self.udp_queries = []
+        self.tcp_queries = []
+
+    def answer(self, query: bytes, truncate: bool = False) -> bytes:
+        (qid, _, _, _, _, _) = dns_client.HEADER.unpack_from(query, 0)
+        (name, offset) = dns_client._decode_name(query, dns_client.HEADER.size)
+        (rtype, _) = struct.unpack_from('!HH', query, offset)
+        question = query[dns_client.HEADER.size:offset + 4]
+        name = name.lower()
+        if self.rcode is not None:
+            rcode = self.rcode
+        else:
+            rcode = 0 if any(n == name for (n, _) in self.zone) else 3
+        records = [] if truncate else self.zone.get((name, rtype), [])
+        flags = 0x8180 | rcode | (dns_client.FLAG_TC if truncate else 0)
+        message = dns_client.HEADER.pack(qid, flags, 1, len(records), 0, 0)
+        message += question
+        for rdata in records:
+            message += b'\xc0\x0c' + struct.pack('!HHIH', rtype, 1, self.ttl,
+                                                 len(rdata)) + rdata
+        return message
+
+    def datagram_received(self, data, addr):
+        self.udp_queries.append(data)
+        self.transport.sendto(self.answer(data, self.truncate_udp), addr)
+
+    async def handle_tcp(self, reader, writer):
+        (length,) = struct.unpack('!H', await reader.readexactly(2))
+        data = await reader.readexactly(length)
+        self.tcp_queries.append(data)
+        response = self.answer(data)
+        writer.write(struct.pack('!H', len(response)) + response)
+        await writer.drain()
+        writer.close()
+
+    async def start(self) -> int:
+        loop = asyncio.get_running_loop()
+        server = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def connection_made(self, transport):
+                server.transport = transport
+
+            def datagram_received(self, data, addr):
+                server.datagram_received(data, addr)
+
+        # Клиент использует один номер порта для UDP и TCP: сначала
+        # занимаем свободный порт TCP, затем тот же порт UDP (если он занят,
+        # повторяем с другим портом)
+        for attempt in range(self.BIND_ATTEMPTS):
+            self.tcp_server = await asyncio.start_server(self.handle_tcp,
+                                                         '127.0.0.1', 0)
+            port = self.tcp_server.sockets[0].getsockname()[1]
+            try:
+                await loop.create_datagram_endpoint(
+                    Protocol, local_addr=('127.0.0.1', port))
+                return port
+            except OSError:
+                self.tcp_server.close()
+                await self.tcp_server.wait_closed()
+        raise OSError("Can't bind UDP and TCP to the same port")
+
+    async def stop(self):
+        self.transport.close()
+        self.tcp_server.close()
+        await self.tcp_server.wait_closed()
+
+
+EXAMPLE_ZONE = {
+    ('example.com.', dns_client.TYPE_A): [bytes([93, 184, 216, 34])],
+    ('example.com.', dns_client.TYPE_AAAA): [
+        ipaddress.IPv6Address('2606:2800:220:1::1').packed],
+    ('example.com.', dns_client.TYPE_MX): [
+        struct.pack('!H', 10) + encode_name('mail.example.com')],
+    ('example.com.', dns_client.TYPE_NS): [encode_name('a.iana-servers.net')],
+    ('example.com.', dns_client.TYPE_TXT): [b'\x0bv=spf1 -all'],
+    ('example.com.', dns_client.TYPE_SOA): [
+        encode_name('ns.icann.org') + encode_name('noc.dns.icann.org') +
+        struct.pack('!IIIII', 2024, 7200, 3600, 1209600, 3600)],
+    ('example.com.', dns_client.TYPE_CAA): [b'\x00\x05issueletsencrypt.org'],
+}
+
+
+class DnsClientTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = StubDnsServer(EXAMPLE_ZONE)
+        self.port = await self.server.start()
+
+    async def asyncTearDown(self):
+        await self.server.stop()
+
+    def resolver(self, **kwargs) -> DnsResolver:
+        return DnsResolver(nameserver='127.0.0.1', port=self.port, **kwargs)
+
+    def test_encode_name(self):
+        self.assertEqual(encode_name('example.com.'),
+                         b'\x07example\x03com\x00')
+        self.assertEqual(encode_name('пример.рф'),
+                         b'\x0cxn--e1afmkfd\x08xn--p1ai\x00')
+        with self.assertRaises(ValueError):
+            encode_name('a..b')
+
+    def test_parse_query(self):
+        (qid, flags, answer) = parse_response(
+            build_query('example.com', dns_client.TYPE_A, 1234))
+        self.assertEqual(qid, 1234)
+        self.assertEqual(answer.answer, [])
+
+    async def test_query(self):
+        resolver = self.resolver()
+        answer = await resolver.query('example.com', dns_client.TYPE_MX)
+        self.assertEqual(answer.rcode, dns_client.RCODE_NOERROR)
+        self.assertEqual(len(answer.answer), 1)
+        self.assertEqual(answer.answer[0].data, '10 mail.example.com.')
+        self.assertEqual(answer.answer[0].ttl, 300)
+
+    async def test_lookup(self):
+        resolver = self.resolver()
+        text = await resolver.lookup('example.com')
+        for line in (
+                'example.com.\t300\tIN\tA\t93.184.216.34',
+                'example.com.\t300\tIN\tAAAA\t2606:2800:220:1::1',
+                'example.com.\t300\tIN\tMX\t10 mail.example.com.',
+                'example.com.\t300\tIN\tNS\ta.iana-servers.net.',
+                'example.com.\t300\tIN\tTXT\t"v=spf1 -all"',
+                'example.com.\t300\tIN\tSOA\tns.icann.org. '
+                'noc.dns.icann.org. 2024 7200 3600 1209600 3600',
+                'example.com.\t300\tIN\tCAA\t0 issue "letsencrypt.org"'):
+            self.assertIn(line, text)
+        self.assertEqual(len(self.server.udp_queries),
+                         len(dns_client.LOOKUP_TYPES))
+
+    async def test_lookup_nxdomain(self):
+        resolver = self.resolver()
+        text = await resolver.lookup('nonexistent.example')
+        self.assertEqual(text,
+                         'Host nonexistent.example not found: 3(NXDOMAIN)\n')
+
+    async def test_tcp_fallback(self):
+        self.server.truncate_udp = True
+        resolver = self.resolver()
+        answer = await resolver.query('example.com', dns_client.TYPE_A)
+        self.assertEqual(answer.answer[0].data, '93.184.216.34')
+        self.assertEqual(len(self.server.udp_queries), 1)
+        self.assertEqual(len(self.server.tcp_queries), 1)
+
+    async def test_timeout(self):
+        self.server.datagram_received = lambda data, addr: None
+        resolver = self.resolver(timeout_sec=0.2)
+        with self.assertRaises(asyncio.TimeoutError):
+            await resolver.query('example.com', dns_client.TYPE_A)
+
+    async def test_cache(self):
+        clock = FakeClock()
+        resolver = self.resolver(cache=DnsCache(clock=clock))
+        text = await resolver.lookup('example.com')
+        queries_count = len(self.server.udp_queries)
+        self.assertEqual(await resolver.lookup('EXAMPLE.com.'), text)
+        self.assertEqual(len(self.server.udp_queries), queries_count)
+        self.assertEqual(resolver.cache.stats()['hits'],
+                         len(dns_client.LOOKUP_TYPES))
+
+        clock.now += 100
+        answer = await resolver.query('example.com', dns_client.TYPE_A)
+        self.assertEqual(answer.answer[0].ttl, 200)
+        self.assertEqual(len(self.server.udp_queries), queries_count)
+
+        clock.now += 200
+        await resolver.query('example.com', dns_client.TYPE_A)
+        self.assertEqual(len(self.server.udp_queries), queries_count + 1)
+
+    async def test_cache_negative(self):
+        clock = FakeClock()
+        resolver = self.resolver(cache=DnsCache(negative_ttl_sec=60,
+                                                clock=clock))
+        await resolver.query('nonexistent.example', dns_client.TYPE_A)
+        await resolver.query('nonexistent.example', dns_client.TYPE_A)
+        self.assertEqual(len(self.server.udp_queries), 1)
+        clock.now += 60
+        await resolver.query('nonexistent.example', dns_client.TYPE_A)
+        self.assertEqual(len(self.server.udp_queries), 2)
+
+    async def test_cache_servfail(self):
+        self.server.rcode = dns_client.RCODE_SERVFAIL
+        clock = FakeClock()
+        resolver = self.resolver(cache=DnsCache(servfail_ttl_sec=5,
+                                                clock=clock))
+        for _ in range(3):
+            answer = await resolver.query('example.com', dns_client.TYPE_A)
+            self.assertEqual(answer.rcode, dns_client.RCODE_SERVFAIL)
+        self.assertEqual(len(self.server.udp_queries), 1)
+
+    def test_cache_soa_negative_ttl(self):
+        cache = DnsCache(negative_ttl_sec=1000)
+        soa = dns_client.DnsRecord(
+            name='example.', rtype=dns_client.TYPE_SOA, ttl=900,
+            data='ns.example. admin.example. 1 7200 3600 1209600 120')
+        answer = dns_client.DnsAnswer(rcode=dns_client.RCODE_NXDOMAIN,
+                                      authority=[soa])
+        self.assertEqual(cache.ttl(answer), 120)
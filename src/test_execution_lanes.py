@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 17:51:26 2026
+
+@author: askh
+"""
+
+import asyncio
+import unittest
+
+from aiogram.dispatcher.event.handler import HandlerObject
+
+from execution_lanes import Lane, LaneFullError, LaneMiddleware
+
+
+class LaneTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_queue_limit(self):
+        lane = Lane('slow', max_concurrency=1, max_queue=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with lane.slot():
+                await release.wait()
+
+        tasks = [asyncio.create_task(hold()) for _ in range(2)]
+        await asyncio.sleep(0)
+        self.assertEqual(lane.stats(),
+                         {'running': 1, 'waiting': 1, 'rejected': 0})
+        with self.assertRaises(LaneFullError):
+            await lane.acquire()
+        release.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(lane.stats(),
+                         {'running': 0, 'waiting': 0, 'rejected': 1})
+
+
+class LaneMiddlewareTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.lanes = {'fast': Lane('fast', 10, 10),
+                      'slow': Lane('slow', 1, 0)}
+        self.full_events = []
+
+        async def on_full(event, lane):
+            self.full_events.append((event, lane.name))
+
+        self.middleware = LaneMiddleware(
+            self.lanes, 'fast',
+            resolve=lambda flag: 'slow' if flag == 'lookup' else 'fast',
+            on_full=on_full)
+        self.release = asyncio.Event()
+
+    def call(self, event: str, flags: dict):
+        async def handler(event, data):
+            if event.startswith('slow'):
+                await self.release.wait()
+            return 'done ' + event
+
+        data = {'handler': HandlerObject(callback=handler, flags=flags)}
+        return self.middleware(handler, event, data)
+
+    async def test_lanes(self):
+        slow = asyncio.create_task(self.call('slow1', {'lane': 'lookup'}))
+        await asyncio.sleep(0)
+        # Быстрый обработчик не ждёт медленный
+        self.assertEqual(await self.call('fast', {}), 'done fast')
+        # Очередь медленной полосы заполнена
+        self.assertIsNone(await self.call('slow2', {'lane': 'lookup'}))
+        self.assertEqual(self.full_events, [('slow2', 'slow')])
+        self.release.set()
+        self.assertEqual(await slow, 'done slow1')
+        self.assertEqual(self.lanes['slow'].running, 0)
+
+    async def test_unknown_lane(self):
+        self.middleware.resolve = None
+        self.assertEqual(await self.call('x', {'lane': 'unknown'}),
+                         'done x')
+
+
+if __name__ == '__main__':
+    unittest.main()
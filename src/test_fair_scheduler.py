@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 15:20:48 2026
+
+@author: askh
+"""
+
+import asyncio
+import unittest
+from fair_scheduler import FairScheduler, QueueFullError, QueueTimeoutError
+
+
+class FairSchedulerTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.order = []
+        self.release = asyncio.Event()
+
+    def job(self, name: str):
+        async def run():
+            self.order.append(name)
+            await self.release.wait()
+            return name
+        return run
+
+    async def test_round_robin(self):
+        scheduler = FairScheduler(max_concurrency=1)
+        tasks = [asyncio.create_task(scheduler.run('heavy',
+                                                   self.job(f'h{i}')))
+                 for i in range(4)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(scheduler.run('light',
+                                                    self.job(f'l{i}')))
+                  for i in range(2)]
+        await asyncio.sleep(0)
+        self.release.set()
+        results = await asyncio.gather(*tasks)
+        self.assertEqual(results, ['h0', 'h1', 'h2', 'h3', 'l0', 'l1'])
+        self.assertEqual(self.order, ['h0', 'h1', 'l0', 'h2', 'l1', 'h3'])
+        self.assertEqual(scheduler.running, 0)
+        self.assertEqual(len(scheduler), 0)
+
+    async def test_concurrency(self):
+        scheduler = FairScheduler(max_concurrency=2)
+        tasks = [asyncio.create_task(scheduler.run(i, self.job(str(i))))
+                 for i in range(5)]
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.order, ['0', '1'])
+        self.assertEqual(len(scheduler), 3)
+        self.release.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(scheduler.running, 0)
+
+    async def test_queue_position(self):
+        scheduler = FairScheduler(max_concurrency=1)
+        positions = []
+
+        async def on_queued(position):
+            positions.append(position)
+
+        tasks = [asyncio.create_task(scheduler.run(user, self.job(user),
+                                                   on_queued=on_queued))
+                 for user in ('a', 'b', 'b', 'c')]
+        await asyncio.sleep(0.01)
+        self.assertEqual(positions, [1, 2, 2])
+        self.release.set()
+        await asyncio.gather(*tasks)
+
+    async def test_queue_full(self):
+        scheduler = FairScheduler(max_concurrency=1, max_queue_per_user=1)
+        first = asyncio.create_task(scheduler.run('a', self.job('a0')))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(scheduler.run('a', self.job('a1')))
+        await asyncio.sleep(0)
+        with self.assertRaises(QueueFullError):
+            await scheduler.run('a', self.job('a2'))
+        self.release.set()
+        await asyncio.gather(first, second)
+
+    async def test_timeout(self):
+        scheduler = FairScheduler(max_concurrency=1, max_wait_sec=0.05)
+        first = asyncio.create_task(scheduler.run('a', self.job('a')))
+        await asyncio.sleep(0)
+        with self.assertRaises(QueueTimeoutError):
+            await scheduler.run('b', self.job('b'))
+        self.assertEqual(len(scheduler), 0)
+        self.release.set()
+        await first
+        self.assertEqual(self.order, ['a'])
+
+    async def test_admit_retry(self):
+        scheduler = FairScheduler(retry_interval_sec=0.01)
+        checks = []
+
+        async def admit():
+            checks.append(True)
+            return len(checks) >= 3
+
+        self.release.set()
+        self.assertEqual(await scheduler.run('a', self.job('a'), admit=admit),
+                         'a')
+        self.assertEqual(len(checks), 3)
+
+    async def test_admit_does_not_block_others(self):
+        scheduler = FairScheduler(max_concurrency=2, max_wait_sec=0.05,
+                                  retry_interval_sec=0.01)
+        self.release.set()
+
+        async def deny():
+            return False
+
+        denied = asyncio.create_task(
+            scheduler.run('a', self.job('a'), admit=deny))
+        self.assertEqual(await scheduler.run('b', self.job('b')), 'b')
+        with self.assertRaises(QueueTimeoutError):
+            await denied
+
+    async def test_admit_when_can_run(self):
+        scheduler = FairScheduler(max_concurrency=1, retry_interval_sec=0.01)
+        checks = []
+
+        async def admit():
+            checks.append(True)
+            return True
+
+        first = asyncio.create_task(scheduler.run('a', self.job('a')))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(
+            scheduler.run('b', self.job('b'), admit=admit))
+        await asyncio.sleep(0.05)
+        # Допуск не проверяется (и лимит не расходуется), пока запрос
+        # нельзя начать выполнять
+        self.assertEqual(checks, [])
+        self.release.set()
+        self.assertEqual(await asyncio.gather(first, second), ['a', 'b'])
+        self.assertEqual(len(checks), 1)
+
+    async def test_cancel(self):
+        scheduler = FairScheduler(max_concurrency=1)
+        running = asyncio.create_task(scheduler.run('a', self.job('a')))
+        queued = asyncio.create_task(scheduler.run('b', self.job('b')))
+        await asyncio.sleep(0)
+        queued.cancel()
+        running.cancel()
+        await asyncio.gather(running, queued, return_exceptions=True)
+        self.assertEqual(scheduler.running, 0)
+        self.assertEqual(len(scheduler), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
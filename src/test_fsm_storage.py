@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 22 11:12:06 2026
+
+@author: askh
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+
+from fsm_storage import BoundedMemoryStorage, SqliteFsmStorage
+
+
+class TestState(StatesGroup):
+    host = State()
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def user_key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=42, chat_id=user_id, user_id=user_id)
+
+
+class FsmStorageTests:
+    """
+    Общие тесты хранилищ (storage и clock создаются в setUp).
+    """
+
+    async def test_state_and_data(self):
+        key = user_key(1)
+        self.assertIsNone(await self.storage.get_state(key))
+        self.assertEqual(await self.storage.get_data(key), {})
+        await self.storage.set_state(key, TestState.host)
+        self.assertEqual(await self.storage.get_state(key), 'TestState:host')
+        await self.storage.update_data(key, {'a': 1})
+        self.assertEqual(await self.storage.update_data(key, {'b': [2]}),
+                         {'a': 1, 'b': [2]})
+        self.assertEqual(await self.storage.get_data(key),
+                         {'a': 1, 'b': [2]})
+        self.assertIsNone(await self.storage.get_state(user_key(2)))
+
+    async def test_idle_expiration(self):
+        key = user_key(1)
+        await self.storage.set_state(key, 'state')
+        self.clock.now += 50
+        await self.storage.set_data(key, {'a': 1})
+        self.clock.now += 80
+        self.assertEqual(await self.storage.get_state(key), 'state')
+        self.clock.now += 101
+        self.assertIsNone(await self.storage.get_state(key))
+        self.assertEqual(await self.storage.get_data(key), {})
+
+    async def test_reset(self):
+        key = user_key(1)
+        await self.storage.set_state(key, 'state')
+        await self.storage.set_state(key, None)
+        self.assertIsNone(await self.storage.get_state(key))
+        self.assertEqual(self.count(), 0)
+
+
+class BoundedMemoryStorageTest(FsmStorageTests,
+                               unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.storage = BoundedMemoryStorage(max_entries=3, idle_ttl_sec=100,
+                                            clock=self.clock)
+
+    def count(self) -> int:
+        return len(self.storage)
+
+    async def test_lru_eviction(self):
+        for user_id in range(3):
+            await self.storage.set_state(user_key(user_id), 'state')
+        # Обращение к записи делает её недавно использовавшейся
+        await self.storage.get_state(user_key(0))
+        await self.storage.set_state(user_key(3), 'state')
+        self.assertEqual(len(self.storage), 3)
+        self.assertIsNone(await self.storage.get_state(user_key(1)))
+        self.assertEqual(await self.storage.get_state(user_key(0)), 'state')
+        self.assertEqual(self.storage.stats()['evictions'], 1)
+
+    async def test_data_copy(self):
+        key = user_key(1)
+        data = {'a': 1}
+        await self.storage.set_data(key, data)
+        data['a'] = 2
+        (await self.storage.get_data(key))['a'] = 3
+        self.assertEqual(await self.storage.get_data(key), {'a': 1})
+
+
+class SqliteFsmStorageTest(FsmStorageTests,
+                           unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db_path = os.path.join(self.tmp_dir.name, 'fsm.sqlite3')
+        self.clock = FakeClock()
+        self.storage = self.create_storage()
+
+    async def asyncTearDown(self):
+        await self.storage.close()
+
+    def create_storage(self) -> SqliteFsmStorage:
+        return SqliteFsmStorage(self.db_path, idle_ttl_sec=100,
+                                purge_interval_sec=0, clock=self.clock)
+
+    def count(self) -> int:
+        (count,) = self.storage.connection.execute(
+            'SELECT COUNT(*) FROM fsm').fetchone()
+        return count
+
+    async def test_idle_expiration(self):
+        # Чтение не продлевает время жизни записи
+        key = user_key(1)
+        await self.storage.set_state(key, 'state')
+        self.clock.now += 80
+        self.assertEqual(await self.storage.get_state(key), 'state')
+        self.clock.now += 21
+        self.assertIsNone(await self.storage.get_state(key))
+        self.assertEqual(self.count(), 0)
+
+    async def test_restart(self):
+        key = user_key(1)
+        await self.storage.set_state(key, TestState.host)
+        await self.storage.set_data(key, {'host': 'example.com'})
+        await self.storage.close()
+        self.storage = self.create_storage()
+        self.assertEqual(await self.storage.get_state(key), 'TestState:host')
+        self.assertEqual(await self.storage.get_data(key),
+                         {'host': 'example.com'})
+
+    async def test_locked(self):
+        key = user_key(1)
+        await self.storage.set_state(key, 'state')
+        other = sqlite3.connect(self.db_path, isolation_level=None)
+        self.addCleanup(other.close)
+        other.execute('BEGIN IMMEDIATE')
+        # Блокировка снимается из цикла событий, поэтому изменение
+        # сохранится, только если ожидание блокировки его не останавливает
+        asyncio.get_running_loop().call_later(0.1, other.execute,
+                                              'ROLLBACK')
+        await self.storage.set_state(key, 'other')
+        self.assertFalse(other.in_transaction)
+        self.assertEqual(await self.storage.get_state(key), 'other')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,8 @@ Created on Sun Nov 17 21:50:17 2024
 @author: askh
 """
 
+import ipaddress
+import random
 import unittest
 from host_check import HostChecker
 
@@ -68,7 +70,74 @@ class HostCheckerTest(unittest.TestCase):
                 msg=f"Problem for name {name}")
 
     def test_restricted_hosts(self):
-        for addr in ('localhost', '127.0.0.1', '127.1.0.1', '::1'):
+        for addr in ('localhost', '127.0.0.1', '127.1.0.1', '127.0.0.10',
+                     '::1'):
             self.assertEqual(
                 self.host_checker.check_host(addr),
                 self.host_checker.ADDRESS_DENIED)
+
+    def test_restricted_networks_same_as_linear(self):
+        rnd = random.Random(2024)
+        for version in (4, 6):
+            max_prefix = 32 if version == 4 else 128
+            networks = []
+            for _ in range(300):
+                prefix = rnd.randint(max_prefix // 4, max_prefix)
+                addr = ipaddress.ip_address(
+                    rnd.getrandbits(max_prefix) if version == 6
+                    else rnd.getrandbits(32))
+                networks.append(
+                    ipaddress.ip_network(f"{addr}/{prefix}", strict=False))
+            host_checker = HostChecker(
+                restricted_ipv4=[str(n) for n in networks if version == 4],
+                restricted_ipv6=[str(n) for n in networks if version == 6])
+            addresses = [n.network_address for n in networks] + \
+                [n.broadcast_address for n in networks] + \
+                [ipaddress.ip_address(int(n.broadcast_address) + 1)
+                 for n in networks
+                 if int(n.broadcast_address) < 2 ** max_prefix - 1] + \
+                [ipaddress.ip_address(rnd.getrandbits(max_prefix))
+                 for _ in range(1000)]
+            for addr in addresses:
+                expected = host_checker.ADDRESS_DENIED \
+                    if any(addr in n for n in networks) \
+                    else host_checker.ADDRESS_OK
+                self.assertEqual(host_checker.check_ip(str(addr)), expected,
+                                 msg=f"Problem for address {addr}")
+
+    def test_restricted_networks_merge(self):
+        host_checker = HostChecker(restricted_ipv4=['10.0.0.0/8',
+                                                    '10.1.0.0/16',
+                                                    '11.0.0.0/8',
+                                                    '192.168.1.0/24'])
+        self.assertEqual(len(host_checker.restricted_ipv4), 2)
+        for (addr, result) in (('9.255.255.255', HostChecker.ADDRESS_OK),
+                               ('10.0.0.0', HostChecker.ADDRESS_DENIED),
+                               ('11.255.255.255', HostChecker.ADDRESS_DENIED),
+                               ('12.0.0.0', HostChecker.ADDRESS_OK),
+                               ('192.168.1.7', HostChecker.ADDRESS_DENIED),
+                               ('192.168.2.7', HostChecker.ADDRESS_OK)):
+            self.assertEqual(host_checker.check_ip(addr), result, msg=addr)
+
+    def test_restricted_hostnames(self):
+        host_checker = HostChecker(
+            restricted_hostnames=['localhost',
+                                  'Exact.Example.com.',
+                                  '*.internal.corp',
+                                  '*.metadata.google.internal',
+                                  'пример.рф'])
+        for name in ('localhost', 'LOCALHOST', 'localhost.',
+                     'exact.example.com', 'EXACT.EXAMPLE.COM.',
+                     'a.internal.corp', 'a.b.internal.corp',
+                     'x.metadata.google.internal',
+                     'пример.рф', 'ПРИМЕР.РФ', 'xn--e1afmkfd.xn--p1ai'):
+            self.assertEqual(host_checker.check_name(name),
+                             HostChecker.ADDRESS_DENIED,
+                             msg=f"Problem for name {name}")
+        for name in ('localhost.example.com', 'example.com',
+                     'a.exact.example.com', 'internal.corp',
+                     'internal.corp.example.com', 'metadata.google.internal',
+                     'www.пример.рф'):
+            self.assertEqual(host_checker.check_name(name),
+                             HostChecker.ADDRESS_OK,
+                             msg=f"Problem for name {name}")
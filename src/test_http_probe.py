@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 16:48:02 2026
+
+@author: askh
+"""
+
+import asyncio
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import unittest
+from connection_pool import ResumingSSLContext
+from host_check import HostChecker
+from http_probe import AccessDeniedError, BadResponseError, \
+    EmptyResponseError, HeadersTooBigError, HttpProbe, PHASE_CONNECT, \
+    PHASE_FIRST_BYTE, PHASE_RESOLVE, PHASE_TLS, ProbeTimeoutError, ResolveError, \
+    connect_happy_eyeballs, idna_host, interleave_addresses, \
+    read_response_head
+
+
+class FakeHttpServer:
+    """
+    Сервер HTTP для тестов. На каждый запрос отвечает заданным ответом и
+    запоминает полученные запросы.
+    """
+
+    def __init__(self, answer: bytes, keep_alive: bool = False,
+                 ssl_context: ssl.SSLContext = None):
+        self.answer = answer
+        self.keep_alive = keep_alive
+        self.ssl_context = ssl_context
+        self.requests = []
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request = b''
+                while line := await reader.readline():
+                    request += line
+                    if line == b'\r\n':
+                        break
+                if not request:
+                    break
+                self.requests.append(request)
+                writer.write(self.response(request))
+                await writer.drain()
+                if not self.keep_alive:
+                    break
+        except (OSError, ssl.SSLError):
+            pass
+        writer.close()
+
+    def response(self, request: bytes) -> bytes:
+        return self.answer
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0,
+                                                 ssl=self.ssl_context)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+class FakeResolver:
+
+    def __init__(self, addresses: list[str]):
+        self.addresses = addresses
+        self.queries = []
+
+    async def __call__(self, host: str, port: int) -> list[str]:
+        self.queries.append((host, port))
+        if not self.addresses:
+            raise OSError('Name or service not known')
+        return self.addresses
+
+
+ANSWER = (b'HTTP/1.1 200 OK\r\n'
+          b'Server: test\r\n'
+          b'\r\n'
+          b'body')
+
+KEEP_ALIVE_ANSWER = (b'HTTP/1.1 200 OK\r\n'
+                     b'Content-Length: 4\r\n'
+                     b'\r\n'
+                     b'body')
+
+
+class HttpProbeTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = FakeHttpServer(ANSWER)
+        self.port = await self.server.start()
+
+    async def asyncTearDown(self):
+        await self.server.stop()
+
+    def test_idna_host(self):
+        self.assertEqual(idna_host('example.com'), 'example.com')
+        self.assertEqual(idna_host('пример.рф'), 'xn--e1afmkfd.xn--p1ai')
+
+    async def test_pinned_address(self):
+        resolver = FakeResolver(['127.0.0.1'])
+        probe = HttpProbe(HostChecker(), resolver=resolver)
+        headers = await probe.fetch_headers(
+            f'http://example.com:{self.port}/')
+        self.assertEqual(headers, 'HTTP/1.1 200 OK\r\nServer: test\r\n')
+        self.assertEqual(resolver.queries, [('example.com', self.port)])
+        self.assertEqual(self.server.requests,
+                         [b'GET / HTTP/1.1\r\nHost: example.com\r\n\r\n'])
+
+    async def test_restricted_address(self):
+        checker = HostChecker(restricted_ipv4=['10.0.0.0/8'])
+        resolver = FakeResolver(['127.0.0.1', '10.0.0.1'])
+        probe = HttpProbe(checker, resolver=resolver)
+        with self.assertRaises(AccessDeniedError):
+            await probe.fetch_headers(f'http://example.com:{self.port}/')
+        self.assertEqual(self.server.requests, [])
+
+    async def test_resolve_error(self):
+        probe = HttpProbe(HostChecker(), resolver=FakeResolver([]))
+        with self.assertRaises(ResolveError):
+            await probe.fetch_headers(f'http://example.com:{self.port}/')
+
+    async def test_resolve_timeout(self):
+        async def resolver(host, port):
+            await asyncio.sleep(5)
+
+        probe = HttpProbe(HostChecker(), resolver=resolver,
+                          resolve_timeout_sec=0.05)
+        with self.assertRaises(ProbeTimeoutError) as cm:
+            await probe.fetch_headers(f'http://example.com:{self.port}/')
+        self.assertEqual(cm.exception.phase, PHASE_RESOLVE)
+
+    async def test_fallback_address(self):
+        # На 127.0.0.2 сервер не слушает, соединение отвергается
+        probe = HttpProbe(HostChecker(),
+                          resolver=FakeResolver(['127.0.0.2', '127.0.0.1']))
+        headers = await probe.fetch_headers(
+            f'http://example.com:{self.port}/')
+        self.assertEqual(headers, 'HTTP/1.1 200 OK\r\nServer: test\r\n')
+
+    async def test_headers_too_big(self):
+        probe = HttpProbe(HostChecker(),
+                          resolver=FakeResolver(['127.0.0.1']),
+                          max_headers_length=10)
+        with self.assertRaises(HeadersTooBigError):
+            await probe.fetch_headers(f'http://example.com:{self.port}/')
+
+
+class ReadResponseHeadTest(unittest.IsolatedAsyncioTestCase):
+
+    def stream(self, chunks: list[bytes], eof: bool = True):
+        reader = asyncio.StreamReader()
+        for chunk in chunks:
+            reader.feed_data(chunk)
+        if eof:
+            reader.feed_eof()
+        return reader
+
+    async def test_parse(self):
+        reader = self.stream([b'HTTP/1.1 301 Moved Permanently\r\n',
+                              b'Location: https://example.com/\r',
+                              b'\n\r', b'\nbody'])
+        head = await read_response_head(reader, 1024)
+        self.assertEqual(head.version, 'HTTP/1.1')
+        self.assertEqual(head.status, 301)
+        self.assertEqual(head.reason, 'Moved Permanently')
+        self.assertEqual(head.header('location'), 'https://example.com/')
+        self.assertIsNone(head.header('server'))
+        self.assertEqual(head.text,
+                         'HTTP/1.1 301 Moved Permanently\r\n'
+                         'Location: https://example.com/\r\n')
+        self.assertEqual(head.body_prefix, b'body')
+
+    async def test_too_big(self):
+        reader = self.stream([b'HTTP/1.1 200 OK\r\n',
+                              b'X-Big: ' + b'a' * 10000 + b'\r\n\r\n'])
+        with self.assertRaises(HeadersTooBigError):
+            await read_response_head(reader, 100)
+        # Лишние данные не прочитаны
+        self.assertGreater(len(await reader.read()), 9000)
+
+    async def test_empty(self):
+        with self.assertRaises(EmptyResponseError):
+            await read_response_head(self.stream([]), 100)
+
+    async def test_bad_response(self):
+        for data in (b'HTTP/1.1 200 OK\r\n', b'SSH-2.0-OpenSSH\r\n\r\n'):
+            with self.assertRaises(BadResponseError, msg=repr(data)):
+                await read_response_head(self.stream([data]), 100)
+
+    async def test_timeout(self):
+        reader = self.stream([b'HTTP/1.1 200 OK\r\n'], eof=False)
+        with self.assertRaises(asyncio.TimeoutError):
+            await read_response_head(reader, 100, timeout_sec=0.05)
+
+    async def test_first_byte_timeout(self):
+        reader = self.stream([], eof=False)
+        with self.assertRaises(ProbeTimeoutError) as cm:
+            await read_response_head(reader, 100, timeout_sec=10,
+                                     first_byte_timeout_sec=0.05)
+        self.assertEqual(cm.exception.phase, PHASE_FIRST_BYTE)
+
+
+class FakeConnector:
+    """
+    Функция соединения для тестов: соединение с адресом устанавливается
+    через заданное время или завершается ошибкой.
+    """
+
+    def __init__(self, delays: dict[str, float], failed: set[str] = set()):
+        self.delays = delays
+        self.failed = failed
+        self.started = []
+        self.cancelled = []
+
+    async def __call__(self, address: str, port: int) -> str:
+        self.started.append(address)
+        try:
+            await asyncio.sleep(self.delays.get(address, 0))
+        except asyncio.CancelledError:
+            self.cancelled.append(address)
+            raise
+        if address in self.failed:
+            raise ConnectionRefusedError(f"Refused by {address}")
+        return address
+
+
+class HappyEyeballsTest(unittest.IsolatedAsyncioTestCase):
+
+    def test_interleave(self):
+        self.assertEqual(
+            interleave_addresses(['::1', '::2', '::3', '1.1.1.1', '2.2.2.2']),
+            ['::1', '1.1.1.1', '::2', '2.2.2.2', '::3'])
+        self.assertEqual(interleave_addresses(['1.1.1.1', '::1']),
+                         ['1.1.1.1', '::1'])
+
+    async def test_first_success_wins(self):
+        connect = FakeConnector({'::1': 10, '1.1.1.1': 0.01})
+        result = await connect_happy_eyeballs(['::1', '1.1.1.1'], 80,
+                                              delay_sec=0.05, connect=connect)
+        self.assertEqual(result, '1.1.1.1')
+        self.assertEqual(connect.cancelled, ['::1'])
+
+    async def test_next_attempt_after_failure(self):
+        connect = FakeConnector({}, failed={'::1'})
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await connect_happy_eyeballs(['::1', '1.1.1.1'], 80,
+                                              delay_sec=10, connect=connect)
+        self.assertEqual(result, '1.1.1.1')
+        self.assertLess(loop.time() - start, 1)
+
+    async def test_all_failed(self):
+        connect = FakeConnector({}, failed={'::1', '1.1.1.1'})
+        with self.assertRaises(OSError):
+            await connect_happy_eyeballs(['::1', '1.1.1.1'], 80,
+                                         delay_sec=0.01, connect=connect)
+
+    async def test_timeout(self):
+        connect = FakeConnector({'::1': 10, '1.1.1.1': 10})
+        with self.assertRaises(ProbeTimeoutError) as cm:
+            await connect_happy_eyeballs(['::1', '1.1.1.1'], 80,
+                                         delay_sec=0.01, timeout_sec=0.05,
+                                         connect=connect)
+        self.assertEqual(cm.exception.phase, PHASE_CONNECT)
+        self.assertEqual(sorted(connect.cancelled), ['1.1.1.1', '::1'])
+
+
+class SilentServer:
+    """
+    Сервер, принимающий соединения, но ничего не отправляющий.
+    """
+
+    async def handle(self, reader, writer):
+        await reader.read()
+        writer.close()
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+class HttpProbeTimeoutTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = SilentServer()
+        self.port = await self.server.start()
+        self.probe = HttpProbe(HostChecker(),
+                               resolver=FakeResolver(['127.0.0.1']),
+                               tls_timeout_sec=0.1,
+                               first_byte_timeout_sec=0.1)
+
+    async def asyncTearDown(self):
+        await self.probe.close()
+        await self.server.stop()
+
+    async def test_first_byte_timeout(self):
+        with self.assertRaises(ProbeTimeoutError) as cm:
+            await self.probe.fetch_headers(f'http://localhost:{self.port}/')
+        self.assertEqual(cm.exception.phase, PHASE_FIRST_BYTE)
+
+    async def test_tls_timeout(self):
+        with self.assertRaises(ProbeTimeoutError) as cm:
+            await self.probe.fetch_headers(f'https://localhost:{self.port}/')
+        self.assertEqual(cm.exception.phase, PHASE_TLS)
+
+
+class RedirectServer(FakeHttpServer):
+    """
+    Сервер HTTP для тестов, перенаправляющий запросы по таблице путей.
+    """
+
+    def __init__(self, redirects: dict[str, str]):
+        super().__init__(KEEP_ALIVE_ANSWER, keep_alive=True)
+        self.redirects = redirects
+
+    def response(self, request: bytes) -> bytes:
+        path = request.split(b' ')[1].decode()
+        if path not in self.redirects:
+            return self.answer
+        return (b'HTTP/1.1 302 Found\r\n'
+                b'Location: ' + self.redirects[path].encode() + b'\r\n'
+                b'Content-Length: 0\r\n'
+                b'\r\n')
+
+
+class HttpProbeFollowTest(unittest.IsolatedAsyncioTestCase):
+
+    async def follow(self, redirects, max_redirects=5, checker=None):
+        self.server = RedirectServer(redirects)
+        port = await self.server.start()
+        resolver = FakeResolver(['127.0.0.1'])
+        probe = HttpProbe(HostChecker() if checker is None else checker,
+                          resolver=resolver)
+        try:
+            return await probe.follow(f'http://localhost:{port}/',
+                                      max_redirects)
+        finally:
+            self.resolver_queries = resolver.queries
+            await probe.close()
+            await self.server.stop()
+
+    async def test_timings(self):
+        results = await self.follow({})
+        self.assertEqual(len(results), 1)
+        timings = results[0].timings
+        self.assertEqual(timings.address, '127.0.0.1')
+        self.assertFalse(timings.reused)
+        self.assertIsNone(timings.tls_sec)
+        for value in (timings.dns_sec, timings.connect_sec,
+                      timings.first_byte_sec):
+            self.assertGreaterEqual(value, 0)
+            self.assertLessEqual(value, timings.total_sec)
+
+    async def test_chain(self):
+        results = await self.follow({'/': '/a', '/a': '/b?x=1'})
+        self.assertEqual([r.head.status for r in results], [302, 302, 200])
+        self.assertTrue(results[2].url.endswith('/b?x=1'))
+        self.assertEqual(self.server.requests[2].split(b'\r\n')[0],
+                         b'GET /b?x=1 HTTP/1.1')
+        # Один хост: одно разрешение имени и одно соединение
+        self.assertEqual(len(self.resolver_queries), 1)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual([r.timings.reused for r in results],
+                         [False, True, True])
+        self.assertIsNone(results[1].timings.dns_sec)
+
+    async def test_max_redirects_and_loop(self):
+        results = await self.follow({'/': '/a', '/a': '/b', '/b': '/c'},
+                                    max_redirects=1)
+        self.assertEqual(len(results), 2)
+        results = await self.follow({'/': '/a', '/a': '/'})
+        self.assertEqual(len(results), 2)
+
+    async def test_redirect_to_denied_host(self):
+        checker = HostChecker(restricted_hostnames=['internal.example'])
+        with self.assertRaises(AccessDeniedError):
+            await self.follow({'/': 'http://internal.example/'},
+                              checker=checker)
+
+
+class HttpProbeReuseTest(unittest.IsolatedAsyncioTestCase):
+
+    async def fetch_twice(self, server, url_scheme, **kwargs):
+        port = await server.start()
+        probe = HttpProbe(HostChecker(),
+                          resolver=FakeResolver(['127.0.0.1']),
+                          **kwargs)
+        try:
+            url = f'{url_scheme}://localhost:{port}/'
+            return [await probe.fetch_headers(url),
+                    await probe.fetch_headers(url)]
+        finally:
+            await probe.close()
+            await server.stop()
+
+    async def test_keep_alive(self):
+        server = FakeHttpServer(KEEP_ALIVE_ANSWER, keep_alive=True)
+        headers = await self.fetch_twice(server, 'http')
+        self.assertEqual(headers[0], headers[1])
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(server.connections, 1)
+
+    async def test_no_keep_alive_without_length(self):
+        server = FakeHttpServer(ANSWER, keep_alive=True)
+        await self.fetch_twice(server, 'http')
+        self.assertEqual(server.connections, 2)
+
+    async def test_server_closed_pooled_connection(self):
+        server = FakeHttpServer(KEEP_ALIVE_ANSWER)
+        headers = await self.fetch_twice(server, 'http')
+        self.assertEqual(headers[0], headers[1])
+        self.assertEqual(server.connections, 2)
+
+    async def test_bad_answer_on_pooled_connection(self):
+        server = FakeHttpServer(KEEP_ALIVE_ANSWER, keep_alive=True)
+        answers = [KEEP_ALIVE_ANSWER,
+                   b'HTTP/1.1 200 OK\r\nX-Big: ' + b'x' * 200 + b'\r\n\r\n']
+        server.response = lambda request: answers.pop(0)
+        port = await server.start()
+        probe = HttpProbe(HostChecker(),
+                          resolver=FakeResolver(['127.0.0.1']),
+                          max_headers_length=100)
+        acquired = []
+        acquire = probe.pool.acquire
+
+        async def acquire_spy(key):
+            connection = await acquire(key)
+            acquired.append(connection)
+            return connection
+
+        probe.pool.acquire = acquire_spy
+        try:
+            url = f'http://localhost:{port}/'
+            await probe.fetch_headers(url)
+            with self.assertRaises(HeadersTooBigError):
+                await probe.fetch_headers(url)
+        finally:
+            await probe.close()
+            await server.stop()
+        # Соединение из пула закрыто, а не потеряно
+        self.assertIsNotNone(acquired[1])
+        self.assertTrue(acquired[1].writer.is_closing())
+        self.assertEqual(len(probe.pool), 0)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        (cls.cert, cls.key) = (os.path.join(cls.tmp_dir.name, 'cert.pem'),
+                               os.path.join(cls.tmp_dir.name, 'key.pem'))
+        if shutil.which('openssl') is not None:
+            subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048',
+                            '-nodes', '-days', '1', '-subj', '/CN=localhost',
+                            '-addext', 'subjectAltName=DNS:localhost',
+                            '-keyout', cls.key, '-out', cls.cert],
+                           check=True, capture_output=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    @unittest.skipIf(shutil.which('openssl') is None, 'openssl not found')
+    async def test_tls_session_resumption(self):
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(self.cert, self.key)
+        client_context = ResumingSSLContext()
+        client_context.load_verify_locations(self.cert)
+        server = FakeHttpServer(KEEP_ALIVE_ANSWER, ssl_context=server_context)
+        reused = []
+        wrap_bio = client_context.wrap_bio
+
+        def wrap_bio_spy(*args, **kwargs):
+            ssl_object = wrap_bio(*args, **kwargs)
+            reused.append(ssl_object)
+            return ssl_object
+
+        client_context.wrap_bio = wrap_bio_spy
+        headers = await self.fetch_twice(server, 'https',
+                                         ssl_context=client_context)
+        self.assertEqual(headers[0], headers[1])
+        self.assertEqual(server.connections, 2)
+        self.assertEqual(list(client_context.sessions),
+                         [('localhost', server.port)])
+        self.assertEqual([s.session_reused for s in reused], [False, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
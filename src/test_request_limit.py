@@ -6,10 +6,37 @@ Created on Wed Nov 13 03:24:43 2024
 @author: askh
 """
 
+import random
 import unittest
 from request_limit import RequestLimit
 
 
+class ReferenceRequestLimit:
+    """
+    Простая реализация ограничения запросов (полный перебор) для проверки
+    RequestLimit.
+    """
+
+    def __init__(self, max_total_value, max_id_value, time_interval_sec):
+        self.max_total_value = max_total_value
+        self.max_id_value = max_id_value
+        self.time_interval_sec = time_interval_sec
+        self.requests = []
+
+    def request(self, src_id, req_time_sec):
+        old_time_sec = req_time_sec - self.time_interval_sec
+        self.requests = [r for r in self.requests if r[0] > old_time_sec]
+        if len(self.requests) >= self.max_total_value:
+            return False
+        if self.max_id_value == 0:
+            return False
+        if sum(1 for r in self.requests if r[1] == src_id) >= \
+           self.max_id_value:
+            return False
+        self.requests.append((req_time_sec, src_id))
+        return True
+
+
 class RequestLimitTest(unittest.TestCase):
 
     def test_create(self):
@@ -68,3 +95,70 @@ class RequestLimitTest(unittest.TestCase):
 
         r = rl.request(id4, time0 + time_interval_sec + 2)
         self.assertFalse(r, msg="Start time + time interval + 2, id4")
+
+    def test_same_as_reference(self):
+        rnd = random.Random(12345)
+        for (max_total_value, max_id_value) in ((20, 5), (5, 5), (10, 0)):
+            rl = RequestLimit(max_total_value, max_id_value, 10)
+            ref = ReferenceRequestLimit(max_total_value, max_id_value, 10)
+            req_time = 1000.0
+            for i in range(3000):
+                # Время обычно растёт, но иногда запрос приходит "из прошлого"
+                req_time += rnd.choice((0, 0.1, 0.5, 1, 3, -2))
+                src_id = rnd.randrange(8)
+                self.assertEqual(rl.request(src_id, req_time),
+                                 ref.request(src_id, req_time),
+                                 msg=f"Step {i}")
+                self.assertEqual(rl.storage.total_count, len(ref.requests))
+
+    def test_purge_ids(self):
+        rl = RequestLimit(100, 10, 10)
+        for src_id in range(50):
+            rl.request(src_id, 1000.0)
+        self.assertEqual(len(rl.storage.id_requests), 50)
+        rl.request(0, 1010.0)
+        self.assertEqual(len(rl.storage.id_requests), 1)
+        self.assertEqual(rl.storage.id_count(0), 1)
+
+
+class GcraRequestLimitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rl = RequestLimit(max_total_value=4,
+                               max_id_value=2,
+                               time_interval_sec=10,
+                               algorithm=RequestLimit.ALGORITHM_GCRA)
+
+    def test_unknown_algorithm(self):
+        with self.assertRaises(ValueError):
+            RequestLimit(1, 1, 10, algorithm='unknown')
+
+    def test_id_limit(self):
+        time0 = 1000.0
+        self.assertTrue(self.rl.request(1, time0))
+        self.assertTrue(self.rl.request(1, time0))
+        self.assertFalse(self.rl.request(1, time0 + 1))
+        # Лимит восстанавливается равномерно: один запрос за 10 / 2 секунд
+        self.assertTrue(self.rl.request(1, time0 + 5))
+        self.assertFalse(self.rl.request(1, time0 + 6))
+        self.assertTrue(self.rl.request(2, time0 + 6))
+
+    def test_total_limit(self):
+        time0 = 1000.0
+        for src_id in range(4):
+            self.assertTrue(self.rl.request(src_id, time0))
+        self.assertFalse(self.rl.request(4, time0))
+        self.assertFalse(self.rl.request(4, time0 + 2))
+        self.assertTrue(self.rl.request(4, time0 + 2.5))
+
+    def test_zero_limit(self):
+        rl = RequestLimit(10, 0, 10, algorithm=RequestLimit.ALGORITHM_GCRA)
+        self.assertFalse(rl.request(1, 1000.0))
+
+    def test_evict_idle_ids(self):
+        rl = RequestLimit(1000, 2, 10, algorithm=RequestLimit.ALGORITHM_GCRA)
+        for src_id in range(100):
+            rl.request(src_id, 1000.0)
+        self.assertEqual(len(rl.storage.id_tat), 100)
+        rl.request(0, 1005.0)
+        self.assertEqual(len(rl.storage.id_tat), 1)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:05:32 2026
+
+@author: askh
+"""
+
+import asyncio
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from request_limit import RequestLimit, RequestLimitStorage
+from request_limit_storage import LocalNetworkStore, NetworkStorage, \
+    NetworkStore, SqliteStorage
+
+
+def sqlite_worker(args) -> int:
+    (path, algorithm, worker_id, count) = args
+    rl = RequestLimit(max_total_value=60,
+                      max_id_value=1000,
+                      time_interval_sec=600,
+                      algorithm=algorithm,
+                      storage=SqliteStorage(path, timeout_sec=30))
+    accepted = 0
+    for i in range(count):
+        if rl.request(f"{worker_id}-{i}", 1000.0):
+            accepted += 1
+    rl.storage.close()
+    return accepted
+
+
+class RequestLimitStorageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db_path = os.path.join(self.tmp_dir.name, 'limits.sqlite3')
+
+    def sqlite_storage(self) -> SqliteStorage:
+        storage = SqliteStorage(self.db_path)
+        self.addCleanup(storage.close)
+        return storage
+
+    def check_same_as_memory(self, make_storage):
+        for algorithm in RequestLimit.ALGORITHMS:
+            for (max_total_value, max_id_value) in ((20, 5), (5, 5), (10, 0)):
+                rnd = random.Random(54321)
+                memory = RequestLimit(max_total_value, max_id_value, 10,
+                                      algorithm=algorithm)
+                other = RequestLimit(max_total_value, max_id_value, 10,
+                                     algorithm=algorithm,
+                                     storage=make_storage())
+                req_time = 1000.0
+                for i in range(500):
+                    req_time += rnd.choice((0, 0.1, 0.5, 1, 3))
+                    src_id = rnd.randrange(8)
+                    self.assertEqual(other.request(src_id, req_time),
+                                     memory.request(src_id, req_time),
+                                     msg=f"{algorithm}, step {i}")
+
+    def test_sqlite_same_as_memory(self):
+        counter = iter(range(1000))
+
+        def make_storage():
+            storage = SqliteStorage(
+                os.path.join(self.tmp_dir.name, f"{next(counter)}.sqlite3"))
+            self.addCleanup(storage.close)
+            return storage
+
+        self.check_same_as_memory(make_storage)
+
+    def test_network_same_as_memory(self):
+        self.check_same_as_memory(
+            lambda: NetworkStorage(LocalNetworkStore()))
+
+    def test_sqlite_persistent(self):
+        rl = RequestLimit(10, 2, 60, storage=self.sqlite_storage())
+        self.assertTrue(rl.request(1, 1000.0))
+        self.assertTrue(rl.request(1, 1001.0))
+        rl = RequestLimit(10, 2, 60, storage=self.sqlite_storage())
+        self.assertFalse(rl.request(1, 1002.0))
+        self.assertTrue(rl.request(2, 1002.0))
+
+    def test_sqlite_locked(self):
+        rl = RequestLimit(10, 2, 60, storage=self.sqlite_storage())
+        other = sqlite3.connect(self.db_path, isolation_level=None)
+        self.addCleanup(other.close)
+
+        async def request():
+            other.execute('BEGIN IMMEDIATE')
+            # Блокировка снимается из цикла событий, поэтому запрос будет
+            # допущен, только если ожидание блокировки его не останавливает
+            asyncio.get_running_loop().call_later(0.1, other.execute,
+                                                  'ROLLBACK')
+            return await rl.request_async(1, 1000.0)
+
+        self.assertTrue(asyncio.run(request()))
+        self.assertFalse(other.in_transaction)
+        self.assertTrue(rl.request(1, 1000.0))
+        self.assertFalse(rl.request(1, 1000.0))
+
+    def test_network_shared(self):
+        store = LocalNetworkStore()
+        rl1 = RequestLimit(3, 2, 60, storage=NetworkStorage(store))
+        rl2 = RequestLimit(3, 2, 60, storage=NetworkStorage(store))
+        self.assertTrue(rl1.request(1, 1000.0))
+        self.assertTrue(rl2.request(1, 1000.0))
+        self.assertFalse(rl1.request(1, 1000.0))
+        self.assertTrue(rl1.request(2, 1000.0))
+        self.assertFalse(rl2.request(3, 1000.0))
+
+    def test_network_expiration(self):
+        for algorithm in RequestLimit.ALGORITHMS:
+            store = LocalNetworkStore()
+            rl = RequestLimit(100, 2, 10, algorithm=algorithm,
+                              storage=NetworkStorage(store))
+            for src_id in range(1000):
+                self.assertTrue(rl.request(src_id, 1000.0 + src_id),
+                                msg=algorithm)
+            # Остаются только ключи, обновлявшиеся за время наблюдения
+            self.assertLessEqual(len(store), 12, msg=algorithm)
+            self.assertLessEqual(len(store.lists) + len(store.values), 12,
+                                 msg=algorithm)
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            RequestLimitStorage()
+        with self.assertRaises(TypeError):
+            NetworkStore()
+
+    def test_sqlite_concurrent_processes(self):
+        self.sqlite_storage()
+        workers = 4
+        for algorithm in RequestLimit.ALGORITHMS:
+            context = multiprocessing.get_context('fork')
+            with context.Pool(workers) as pool:
+                accepted = pool.map(
+                    sqlite_worker,
+                    [(self.db_path, algorithm, w, 40)
+                     for w in range(workers)])
+            self.assertEqual(sum(accepted), 60, msg=algorithm)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 11:02:37 2026
+
+@author: askh
+"""
+
+import asyncio
+import unittest
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+from aiogram.types import ReplyParameters
+
+from send_scheduler import SendScheduler, TokenBucket
+from test_webhook_server import FakeTelegramServer
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_rate(self):
+        bucket = TokenBucket(rate=2, capacity=2, now=0)
+        self.assertEqual(bucket.delay(0), 0)
+        bucket.take(0)
+        bucket.take(0)
+        self.assertAlmostEqual(bucket.delay(0), 0.5)
+        self.assertEqual(bucket.delay(0.5), 0)
+        self.assertFalse(bucket.is_full(0.5))
+        self.assertTrue(bucket.is_full(10))
+
+    def test_pause(self):
+        bucket = TokenBucket(rate=1, capacity=3, now=0)
+        bucket.pause(0, 5)
+        self.assertAlmostEqual(bucket.delay(1), 4)
+        self.assertEqual(bucket.delay(5), 0)
+        bucket.take(5)
+        self.assertAlmostEqual(bucket.delay(5), 1)
+
+
+class CoalesceTest(unittest.TestCase):
+
+    def test_can_coalesce(self):
+        reply = ReplyParameters(message_id=1)
+        first = SendMessage(chat_id=1, text='a', reply_parameters=reply)
+        self.assertTrue(SendScheduler.can_coalesce(
+            first, SendMessage(chat_id=1, text='b', reply_parameters=reply)))
+        self.assertFalse(SendScheduler.can_coalesce(
+            first, SendMessage(chat_id=2, text='b', reply_parameters=reply)))
+        self.assertFalse(SendScheduler.can_coalesce(
+            first, SendMessage(chat_id=1, text='b')))
+        self.assertFalse(SendScheduler.can_coalesce(
+            first, SendMessage(chat_id=1, text='b' * 4096,
+                               reply_parameters=reply)))
+
+
+class SendSchedulerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.telegram = FakeTelegramServer()
+        self.bot = self.telegram.create_bot(await self.telegram.start())
+        self.schedulers = []
+
+    async def asyncTearDown(self):
+        for scheduler in self.schedulers:
+            await scheduler.close(timeout_sec=0)
+        await self.bot.session.close()
+        await self.telegram.stop()
+
+    async def create_scheduler(self, **kwargs) -> SendScheduler:
+        scheduler = SendScheduler(self.bot, **kwargs)
+        self.schedulers.append(scheduler)
+        await scheduler.start()
+        return scheduler
+
+    def texts(self) -> list[str]:
+        return [d['text'] for (m, d) in self.telegram.calls
+                if m == 'sendMessage']
+
+    async def test_submit_does_not_wait(self):
+        scheduler = await self.create_scheduler()
+        future = scheduler.submit(SendMessage(chat_id=1, text='hello'))
+        self.assertFalse(future.done())
+        message = await asyncio.wait_for(future, 5)
+        self.assertEqual(message.text, 'hello')
+        self.assertEqual(self.texts(), ['hello'])
+
+    async def test_coalesce(self):
+        scheduler = SendScheduler(self.bot, chat_rate=10, chat_burst=1)
+        self.schedulers.append(scheduler)
+        first = scheduler.submit(SendMessage(chat_id=1, text='a'))
+        await scheduler.start()
+        await asyncio.sleep(0)
+        # Первое сообщение уже отправляется, следующие ждут и объединяются
+        futures = [scheduler.submit(SendMessage(chat_id=1, text=text))
+                   for text in ('b', 'c')]
+        futures.append(scheduler.submit(SendMessage(chat_id=2, text='d')))
+        results = await asyncio.wait_for(asyncio.gather(first, *futures), 5)
+        self.assertEqual(sorted(self.texts()), ['a', 'b\n\nc', 'd'])
+        self.assertIs(results[1], results[2])
+        self.assertEqual(results[1].text, 'b\n\nc')
+        self.assertEqual(scheduler.stats()['coalesced'], 1)
+
+    async def test_chat_rate(self):
+        scheduler = await self.create_scheduler(chat_rate=20, chat_burst=1)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        futures = [scheduler.submit(SendMessage(
+            chat_id=1, text=str(i),
+            reply_parameters=ReplyParameters(message_id=i)))
+            for i in range(4)]
+        # Сообщения в другой чат не ждут
+        other = scheduler.submit(SendMessage(chat_id=2, text='other'))
+        await asyncio.wait_for(other, 5)
+        self.assertLess(loop.time() - start, 0.1)
+        await asyncio.wait_for(asyncio.gather(*futures), 5)
+        self.assertGreaterEqual(loop.time() - start, 0.14)
+        self.assertEqual([t for t in self.texts() if t != 'other'],
+                         ['0', '1', '2', '3'])
+
+    async def test_global_rate(self):
+        scheduler = await self.create_scheduler(global_rate=20)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        futures = [scheduler.submit(SendMessage(chat_id=i, text=str(i)))
+                   for i in range(25)]
+        await asyncio.wait_for(asyncio.gather(*futures), 5)
+        # Сначала отправляется запас токенов (20), затем по 20 в секунду
+        self.assertGreaterEqual(loop.time() - start, 0.2)
+        self.assertEqual(len(self.texts()), 25)
+
+    async def test_retry_after(self):
+        self.telegram.flood_responses = 1
+        scheduler = await self.create_scheduler()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        message = await asyncio.wait_for(
+            scheduler.submit(SendMessage(chat_id=1, text='hello')), 5)
+        self.assertEqual(message.text, 'hello')
+        self.assertGreaterEqual(loop.time() - start,
+                                self.telegram.retry_after)
+        self.assertEqual(self.texts(), ['hello', 'hello'])
+
+    async def test_retry_after_exhausted(self):
+        self.telegram.flood_responses = 1
+        scheduler = await self.create_scheduler(max_retries=0)
+        with self.assertRaises(TelegramRetryAfter):
+            await asyncio.wait_for(
+                scheduler.submit(SendMessage(chat_id=1, text='hello')), 5)
+        self.assertEqual(scheduler.stats()['sent'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
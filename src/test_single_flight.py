@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:40:18 2026
+
+@author: askh
+"""
+
+import asyncio
+import unittest
+from single_flight import SingleFlight
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.flight = SingleFlight()
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def lookup(self, value):
+        self.calls += 1
+        await self.release.wait()
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    async def test_coalesce(self):
+        waiters = [asyncio.ensure_future(
+            self.flight.do('key', lambda: self.lookup('result')))
+            for _ in range(10)]
+        await asyncio.sleep(0)
+        self.release.set()
+        results = await asyncio.gather(*waiters)
+        self.assertEqual(results, ['result'] * 10)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.shared_count, 9)
+        self.assertEqual(len(self.flight), 0)
+
+    async def test_different_keys(self):
+        self.release.set()
+        results = await asyncio.gather(
+            self.flight.do('a', lambda: self.lookup('a')),
+            self.flight.do('b', lambda: self.lookup('b')))
+        self.assertEqual(results, ['a', 'b'])
+        self.assertEqual(self.calls, 2)
+
+    async def test_sequential(self):
+        self.release.set()
+        await self.flight.do('key', lambda: self.lookup('first'))
+        result = await self.flight.do('key', lambda: self.lookup('second'))
+        self.assertEqual(result, 'second')
+        self.assertEqual(self.calls, 2)
+
+    async def test_exception(self):
+        waiters = [asyncio.ensure_future(
+            self.flight.do('key', lambda: self.lookup(ValueError('error'))))
+            for _ in range(3)]
+        await asyncio.sleep(0)
+        self.release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        for r in results:
+            self.assertIsInstance(r, ValueError)
+        self.assertEqual(self.calls, 1)
+
+    async def test_cancel_waiter(self):
+        first = asyncio.ensure_future(
+            self.flight.do('key', lambda: self.lookup('result')))
+        second = asyncio.ensure_future(
+            self.flight.do('key', lambda: self.lookup('result')))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.release.set()
+        self.assertEqual(await second, 'result')
+        self.assertTrue(first.cancelled())
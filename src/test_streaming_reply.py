@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 16:40:18 2026
+
+@author: askh
+"""
+
+import asyncio
+import json
+import unittest
+
+from aiogram.types import Message
+
+from send_scheduler import SendScheduler
+from streaming_reply import StreamingReply, split_text
+from test_webhook_server import FakeTelegramServer, message_update
+
+
+class SplitTextTest(unittest.TestCase):
+
+    def test_short(self):
+        self.assertEqual(split_text('a\nb\n', 10), ['a\nb'])
+        self.assertEqual(split_text('', 10), [])
+
+    def test_lines(self):
+        self.assertEqual(split_text('aaa\nbbb\nccc\n', 8),
+                         ['aaa\nbbb', 'ccc'])
+
+    def test_long_line(self):
+        self.assertEqual(split_text('ab\n' + 'x' * 7 + '\ncd', 3),
+                         ['ab', 'xxx', 'xxx', 'x', 'cd'])
+
+    def test_max_length(self):
+        text = '\n'.join(str(i) * (i % 50) for i in range(300))
+        chunks = split_text(text, 100)
+        self.assertTrue(all(len(c) <= 100 for c in chunks))
+        self.assertEqual(''.join(chunks).replace('\n', ''),
+                         text.replace('\n', ''))
+
+
+class StreamingReplyTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.telegram = FakeTelegramServer()
+        self.bot = self.telegram.create_bot(await self.telegram.start())
+        self.scheduler = SendScheduler(self.bot, chat_rate=100,
+                                       chat_burst=100)
+        await self.scheduler.start()
+        self.message = Message.model_validate(
+            message_update(1, 'request')['message'],
+            context={'bot': self.bot})
+
+    async def asyncTearDown(self):
+        await self.scheduler.close(timeout_sec=0)
+        await self.bot.session.close()
+        await self.telegram.stop()
+
+    def create_reply(self, **kwargs) -> StreamingReply:
+        return StreamingReply(self.message, self.scheduler,
+                              document_message='document',
+                              **kwargs)
+
+    def methods(self) -> list[str]:
+        return [m for (m, d) in self.telegram.calls]
+
+    async def test_stream(self):
+        reply = self.create_reply(placeholder='wait', edit_interval_sec=0.1)
+        await reply.start()
+        reply.append('a')
+        await asyncio.sleep(0.05)
+        # Следующие изменения объединяются до истечения интервала
+        reply.append('\nb')
+        reply.append('\nc')
+        await asyncio.sleep(0.2)
+        await reply.finish()
+        texts = [(m, d['text']) for (m, d) in self.telegram.calls]
+        self.assertEqual(texts, [('sendMessage', 'wait'),
+                                 ('editMessageText', 'a'),
+                                 ('editMessageText', 'a\nb\nc')])
+
+    async def test_finish_waits_for_flush(self):
+        reply = self.create_reply(placeholder='wait')
+        await reply.start()
+        reply.append('a')
+        # Запланированное обновление уже выполняется
+        await asyncio.sleep(0.01)
+        self.assertIsNotNone(reply.flush_task)
+        flush_task = reply.flush_task
+        await reply.finish('a\nb')
+        self.assertTrue(flush_task.done())
+        self.assertIsNone(reply.flush_task)
+        self.assertEqual(self.telegram.calls[-1][1]['text'], 'a\nb')
+
+    async def test_split(self):
+        reply = self.create_reply(max_length=10)
+        reply.append('0123456\n')
+        await reply.finish('0123456\nabcdef\nxyz')
+        self.assertEqual(self.methods(), ['sendMessage', 'sendMessage'])
+        self.assertEqual([d['text'] for (m, d) in self.telegram.calls],
+                         ['0123456', 'abcdef\nxyz'])
+        for (m, d) in self.telegram.calls:
+            self.assertEqual(json.loads(d['reply_parameters'])['message_id'],
+                             1)
+
+    async def test_document(self):
+        reply = self.create_reply(placeholder='wait', document_threshold=20)
+        await reply.start()
+        await reply.finish('x\n' * 20)
+        self.assertEqual(self.methods(),
+                         ['sendMessage', 'editMessageText', 'sendDocument'])
+        self.assertEqual(self.telegram.calls[1][1]['text'], 'document')
+        data = self.telegram.calls[2][1]
+        self.assertEqual(data[data['document'].removeprefix('attach://')],
+                         ('answer.txt', b'x\n' * 20))
+
+
+if __name__ == '__main__':
+    unittest.main()
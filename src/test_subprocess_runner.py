@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:40:52 2026
+
+@author: askh
+"""
+
+import asyncio
+import sys
+import time
+import unittest
+from unittest import mock
+from subprocess_runner import SubprocessRunner
+
+
+class SubprocessRunnerTest(unittest.IsolatedAsyncioTestCase):
+
+    def test_create(self):
+        runner = SubprocessRunner(timeout_sec=5, max_concurrency=3,
+                                  max_bytes=100)
+        self.assertEqual(runner.timeout_sec, 5)
+        self.assertEqual(runner.max_concurrency, 3)
+        self.assertEqual(runner.max_bytes, 100)
+
+    async def test_run(self):
+        runner = SubprocessRunner()
+        out = await runner.run([sys.executable, '-c', 'print("test")'])
+        self.assertEqual(out.strip(), b'test')
+
+    async def test_timeout(self):
+        runner = SubprocessRunner(timeout_sec=0.2)
+        start = time.monotonic()
+        with self.assertRaises(asyncio.TimeoutError):
+            await runner.run([sys.executable, '-c',
+                              'import time; time.sleep(30)'])
+        self.assertLess(time.monotonic() - start, 10)
+
+    async def test_max_concurrency(self):
+        runner = SubprocessRunner(max_concurrency=2)
+        sleep_sec = 0.3
+        args = [sys.executable, '-c', f"import time; time.sleep({sleep_sec})"]
+        start = time.monotonic()
+        await asyncio.gather(*(runner.run(args) for _ in range(4)))
+        self.assertGreaterEqual(time.monotonic() - start, sleep_sec * 2)
+
+    async def test_run_text(self):
+        runner = SubprocessRunner()
+        (text, truncated) = await runner.run_text(
+            [sys.executable, '-c',
+             'import sys; sys.stdout.buffer.write("тест".encode() * 3000)'])
+        self.assertEqual(text, 'тест' * 3000)
+        self.assertFalse(truncated)
+
+    async def test_run_text_bad_utf8(self):
+        runner = SubprocessRunner()
+        (text, truncated) = await runner.run_text(
+            [sys.executable, '-c',
+             r'import sys; sys.stdout.buffer.write(b"a\xffb")'])
+        self.assertEqual(text, 'a\ufffdb')
+        self.assertFalse(truncated)
+
+    async def test_run_text_max_bytes(self):
+        runner = SubprocessRunner(max_bytes=10)
+        # Ровно max_bytes байтов - вывод не обрезан
+        (text, truncated) = await runner.run_text(
+            [sys.executable, '-c', 'print("x" * 9)'])
+        self.assertEqual(text, 'x' * 9 + '\n')
+        self.assertFalse(truncated)
+        # Программа, выводящая данные бесконечно, завершается
+        start = time.monotonic()
+        (text, truncated) = await runner.run_text(
+            [sys.executable, '-c',
+             'while True: print("ж" * 1000, flush=True)'],
+            max_bytes=5)
+        self.assertLess(time.monotonic() - start, 10)
+        # Обрезанный в середине символ отбрасывается
+        self.assertEqual(text, 'жж')
+        self.assertTrue(truncated)
+
+    async def test_read_error(self):
+        runner = SubprocessRunner()
+        create = asyncio.create_subprocess_exec
+        procs = []
+
+        async def create_spy(*args, **kwargs):
+            procs.append(await create(*args, **kwargs))
+            return procs[-1]
+
+        with mock.patch('asyncio.create_subprocess_exec', create_spy), \
+                self.assertRaises(LookupError):
+            await runner.run_text([sys.executable, '-c',
+                                   'import time; time.sleep(30)'],
+                                  encoding='no-such-encoding')
+        # Процесс завершён, несмотря на ошибку при чтении вывода
+        self.assertIsNotNone(procs[0].returncode)
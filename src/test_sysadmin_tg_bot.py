@@ -6,13 +6,24 @@ Created on Sun Nov 10 01:45:14 2024
 @author: askh
 """
 
+import asyncio
+import ssl
 import unittest
+from unittest import mock
 
 # from sysadmin_tg_bot import DOMAIN_NAME_MAX_LENGTH, \
     # check_host_name, data_to_str, \
     # check_site_url
 
-from sysadmin_tg_bot import data_to_str, check_site_url
+import sysadmin_tg_bot
+from sysadmin_tg_bot import data_to_str, check_site_url, split_options, \
+    timings_text
+from host_check import HostChecker
+from execution_lanes import Lane
+from fair_scheduler import FairScheduler
+from http_probe import PHASE_RESOLVE, ProbeTimeoutError, ProbeTimings
+from request_limit import RequestLimit
+from ttl_cache import TtlLruCache
 
 class GeneralTest(unittest.TestCase):
 
@@ -59,3 +70,295 @@ class GeneralTest(unittest.TestCase):
                 self.assertFalse(
                     check_site_url(url),
                     msg=f"Problem for url {url}")
+
+    def test_split_options(self):
+        self.assertEqual(split_options('example.com', ('-f',)),
+                         (set(), 'example.com'))
+        self.assertEqual(split_options('-f example.com', ('-f',)),
+                         ({'-f'}, 'example.com'))
+        self.assertEqual(split_options('-x example.com', ('-f',)),
+                         (set(), '-x example.com'))
+        self.assertEqual(split_options('-t -L example.com', ('-t', '-L')),
+                         ({'-t', '-L'}, 'example.com'))
+
+    def test_timings_text(self):
+        self.assertEqual(
+            timings_text(ProbeTimings(dns_sec=0.012, connect_sec=0.03,
+                                      tls_sec=0.0451, first_byte_sec=0.08,
+                                      total_sec=0.17, address='192.0.2.1',
+                                      tls_resumed=True)),
+            'Время: DNS 12 мс, TCP 30 мс (192.0.2.1), '
+            'TLS 45 мс (сессия возобновлена), первый байт 80 мс, '
+            'всего 170 мс\n')
+        self.assertEqual(
+            timings_text(ProbeTimings(first_byte_sec=0.08, total_sec=0.08,
+                                      address='192.0.2.1', reused=True)),
+            'Время: соединение с 192.0.2.1 использовано повторно, '
+            'первый байт 80 мс, всего 80 мс\n')
+
+
+class FakeWhoisClient:
+
+    def __init__(self):
+        self.queries = []
+
+    async def query(self, domain: str) -> (str, bool):
+        self.queries.append(domain)
+        return (f"domain: {domain}\n", False)
+
+
+class WhoisCacheTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.whois_client = FakeWhoisClient()
+        patcher = mock.patch.multiple(
+            sysadmin_tg_bot,
+            host_checker=HostChecker(),
+            whois_client=self.whois_client,
+            whois_cache=TtlLruCache(max_bytes=1024 * 1024))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_cache(self):
+        (text, error) = await sysadmin_tg_bot.get_whois_data('example.com')
+        self.assertEqual(error, sysadmin_tg_bot.NO_ERROR)
+        for host in ('example.com', 'EXAMPLE.COM', 'example.com.'):
+            self.assertEqual(await sysadmin_tg_bot.get_whois_data(host),
+                             (text, error))
+        self.assertEqual(self.whois_client.queries, ['example.com'])
+
+    async def test_cache_idna(self):
+        await sysadmin_tg_bot.get_whois_data('пример.рф')
+        await sysadmin_tg_bot.get_whois_data('ПРИМЕР.РФ')
+        self.assertEqual(len(self.whois_client.queries), 1)
+
+    async def test_cache_bypass(self):
+        await sysadmin_tg_bot.get_whois_data('example.com')
+        await sysadmin_tg_bot.get_whois_data('example.com', use_cache=False)
+        self.assertEqual(len(self.whois_client.queries), 2)
+
+
+class FailingProbe:
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+    async def probe(self, url: str):
+        raise self.error
+
+
+class HeadersDataTest(unittest.IsolatedAsyncioTestCase):
+
+    async def get_error(self, error: Exception) -> int:
+        with mock.patch.multiple(sysadmin_tg_bot,
+                                 host_checker=HostChecker(),
+                                 http_probe=FailingProbe(error)):
+            (text, error) = await sysadmin_tg_bot.get_headers_data(
+                'https://example.com/')
+        self.assertIsNone(text)
+        return error
+
+    async def test_errors(self):
+        for (error, code) in (
+                (ProbeTimeoutError(PHASE_RESOLVE, 10),
+                 sysadmin_tg_bot.ERROR_TIMEOUT),
+                (ConnectionRefusedError(111, 'Connection refused'),
+                 sysadmin_tg_bot.ERROR_CONNECT),
+                (OSError("Can't connect to port 443 of any address"),
+                 sysadmin_tg_bot.ERROR_CONNECT),
+                (ssl.SSLCertVerificationError('certificate verify failed'),
+                 sysadmin_tg_bot.ERROR_CONNECT),
+                (ValueError('bug'), sysadmin_tg_bot.ERROR_INTERNAL_ERROR)):
+            self.assertEqual(await self.get_error(error), code, msg=error)
+
+
+class FakeLookup:
+
+    def __init__(self, delay_sec: float = 0.05):
+        self.delay_sec = delay_sec
+        self.targets = []
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, target: str, options: set) -> str:
+        self.targets.append((target, options))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delay_sec)
+        self.running -= 1
+        return 'answer ' + target
+
+
+class FakeSendScheduler:
+    """
+    Планировщик отправки сообщений для тестов: запоминает методы отправки
+    (пары из действия и текста, см. BatchAnswerTest) и сразу возвращает
+    отправленное сообщение.
+    """
+
+    def __init__(self):
+        self.methods = []
+
+    def texts(self) -> list[str]:
+        return [text for (action, text) in self.methods]
+
+    def submit(self, method: tuple) -> asyncio.Future:
+        self.methods.append(method)
+        sent = mock.Mock()
+        sent.edit_text = lambda text, **kwargs: ('edit', text)
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(sent)
+        return future
+
+
+class BatchAnswerTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.send_scheduler = FakeSendScheduler()
+        patcher = mock.patch.multiple(
+            sysadmin_tg_bot,
+            net_request_limit=RequestLimit(max_total_value=100,
+                                           max_id_value=4),
+            batch_max_targets=5,
+            batch_concurrency=2,
+            work_scheduler=FairScheduler(max_wait_sec=0.1,
+                                         retry_interval_sec=0.02),
+            send_scheduler=self.send_scheduler,
+            reply_edit_interval_sec=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.message = mock.Mock()
+        self.message.from_user.id = 1
+        self.message.reply = lambda text, **kwargs: ('reply', text)
+
+    def reply_text(self) -> str:
+        return self.send_scheduler.texts()[-1]
+
+    async def test_batch(self):
+        lookup = FakeLookup()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await sysadmin_tg_bot.batch_answer(
+            self.message, '-f a.example b.example\nc.example', ('-f',),
+            lookup)
+        # Три запроса по два одновременно - два интервала ожидания
+        self.assertLess(loop.time() - start, 3 * lookup.delay_sec)
+        self.assertEqual(lookup.max_running, 2)
+        self.assertEqual(lookup.targets,
+                         [(t, {'-f'})
+                          for t in ('a.example', 'b.example', 'c.example')])
+        self.assertEqual(self.reply_text(),
+                         'answer a.example\n\nanswer b.example\n\n'
+                         'answer c.example')
+
+    async def test_progress(self):
+        await sysadmin_tg_bot.batch_answer(self.message, 'a b', (),
+                                           FakeLookup(0))
+        self.assertEqual(self.send_scheduler.methods[0],
+                         ('reply', sysadmin_tg_bot.PROGRESS_MESSAGE))
+        self.assertEqual(self.send_scheduler.methods[-1],
+                         ('edit', 'answer a\n\nanswer b'))
+
+    async def test_single_target_placeholder(self):
+        await sysadmin_tg_bot.batch_answer(self.message, 'a', (),
+                                           FakeLookup(0))
+        self.assertEqual(self.send_scheduler.methods,
+                         [('reply', sysadmin_tg_bot.PROGRESS_MESSAGE),
+                          ('edit', 'answer a')])
+
+    async def test_long_answer(self):
+        async def lookup(target: str, options: set) -> str:
+            return 'line\n' * 1000
+
+        await sysadmin_tg_bot.batch_answer(self.message, 'a', (), lookup)
+        # Заглушка заменяется первой частью ответа, вторая часть - новое
+        # сообщение
+        self.assertEqual([action for (action, text)
+                          in self.send_scheduler.methods],
+                         ['reply', 'edit', 'reply'])
+        self.assertTrue(all(len(text) <= 4096
+                            for text in self.send_scheduler.texts()))
+
+        self.send_scheduler.methods.clear()
+        self.message.reply_document = \
+            lambda document, **kwargs: ('document', document.filename)
+        with mock.patch.object(sysadmin_tg_bot, 'reply_document_threshold',
+                               1000):
+            await sysadmin_tg_bot.batch_answer(self.message, 'a b', (),
+                                               lookup)
+        self.assertEqual(self.send_scheduler.methods,
+                         [('reply', sysadmin_tg_bot.PROGRESS_MESSAGE),
+                          ('edit', sysadmin_tg_bot.DOCUMENT_MESSAGE),
+                          ('document', 'answer.txt')])
+
+    async def test_request_limit(self):
+        lookup = FakeLookup(0)
+        await sysadmin_tg_bot.batch_answer(self.message, 'a b c d e', (),
+                                           lookup)
+        self.assertEqual(len(lookup.targets), 4)
+        # Пятый запрос ожидал в очереди, но лимит не освободился
+        self.assertIn(('reply', sysadmin_tg_bot.QUEUED_MESSAGE.format(1)),
+                      self.send_scheduler.methods)
+        self.assertTrue(self.reply_text().endswith(
+            'e\n\n' + sysadmin_tg_bot.REQUEST_LIMIT_MESSAGE))
+        self.send_scheduler.methods.clear()
+        await sysadmin_tg_bot.batch_answer(self.message, 'a', (), lookup)
+        self.assertEqual(self.send_scheduler.methods[-1],
+                         ('edit', sysadmin_tg_bot.REQUEST_LIMIT_MESSAGE))
+
+    async def test_wait_for_limit(self):
+        # Лимит освобождается, пока запрос ожидает в очереди
+        sysadmin_tg_bot.net_request_limit = RequestLimit(
+            max_total_value=1, max_id_value=1, time_interval_sec=0.05)
+        lookup = FakeLookup(0)
+        await sysadmin_tg_bot.batch_answer(self.message, 'a b', (), lookup)
+        self.assertEqual(self.reply_text(), 'answer a\n\nanswer b')
+
+    async def test_lookup_error(self):
+        lookup = FakeLookup(0)
+
+        async def failing_lookup(target: str, options: set) -> str:
+            if target == 'b':
+                raise RuntimeError('lookup failed')
+            return await lookup(target, options)
+
+        with self.assertLogs(sysadmin_tg_bot.__name__, 'ERROR'):
+            await sysadmin_tg_bot.batch_answer(self.message, 'a b c', (),
+                                               failing_lookup)
+        self.assertEqual(
+            self.reply_text(),
+            'answer a\n\nb\n\n'
+            + sysadmin_tg_bot.WHOIS_ERROR_MESSAGES[
+                sysadmin_tg_bot.ERROR_INTERNAL_ERROR]
+            + '\n\nanswer c')
+
+    async def test_lane_full(self):
+        lookup = FakeLookup()
+        lane = Lane('test', max_concurrency=1, max_queue=0)
+        with self.assertLogs(sysadmin_tg_bot.__name__, 'WARNING'):
+            await sysadmin_tg_bot.batch_answer(self.message, 'a b', (),
+                                               lookup, lane=lane)
+        self.assertEqual(self.reply_text(),
+                         'answer a\n\nb\n\n'
+                         + sysadmin_tg_bot.LANE_FULL_MESSAGE)
+        self.assertEqual(lane.stats(),
+                         {'running': 0, 'waiting': 0, 'rejected': 1})
+
+    async def test_lane_after_admit(self):
+        # Запрос, ожидающий лимита, не занимает место в полосе
+        sysadmin_tg_bot.net_request_limit = RequestLimit(
+            max_total_value=1, max_id_value=1, time_interval_sec=0.05)
+        lookup = FakeLookup(0)
+        lane = Lane('test', max_concurrency=1, max_queue=0)
+        await sysadmin_tg_bot.batch_answer(self.message, 'a b', (), lookup,
+                                           lane=lane)
+        self.assertEqual(self.reply_text(), 'answer a\n\nanswer b')
+        self.assertEqual(lane.rejected, 0)
+
+    async def test_too_many_targets(self):
+        lookup = FakeLookup(0)
+        await sysadmin_tg_bot.batch_answer(self.message, 'a b c d e f', (),
+                                           lookup)
+        self.assertEqual(lookup.targets, [])
+        self.assertEqual(self.reply_text(),
+                         sysadmin_tg_bot.BATCH_TOO_BIG_MESSAGE.format(5))
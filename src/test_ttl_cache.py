@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:31:05 2026
+
+@author: askh
+"""
+
+import unittest
+from ttl_cache import TtlLruCache
+
+
+class FakeClock:
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TtlLruCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TtlLruCache(max_bytes=100, clock=self.clock)
+
+    def test_get_put(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.put('a', 'value', ttl_sec=10, size=10)
+        self.assertEqual(self.cache.get('a'), 'value')
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.size_bytes, 10)
+
+    def test_ttl(self):
+        self.cache.put('a', 'value', ttl_sec=10, size=10)
+        self.clock.now += 9
+        self.assertEqual(self.cache.get('a'), 'value')
+        self.clock.now += 1
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.size_bytes, 0)
+
+    def test_lru_eviction(self):
+        for key in ('a', 'b', 'c'):
+            self.cache.put(key, key, ttl_sec=10, size=40)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('b'), 'b')
+        self.cache.put('d', 'd', ttl_sec=10, size=40)
+        self.assertIsNone(self.cache.get('c'))
+        self.assertEqual(self.cache.get('b'), 'b')
+        self.assertEqual(self.cache.get('d'), 'd')
+        self.assertEqual(self.cache.evictions, 2)
+        self.assertLessEqual(self.cache.size_bytes, self.cache.max_bytes)
+
+    def test_too_big(self):
+        self.cache.put('a', 'value', ttl_sec=10, size=101)
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_replace(self):
+        self.cache.put('a', 'old', ttl_sec=10, size=30)
+        self.cache.put('a', 'new', ttl_sec=10, size=20)
+        self.assertEqual(self.cache.get('a'), 'new')
+        self.assertEqual(self.cache.size_bytes, 20)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 12:02:41 2026
+
+@author: askh
+"""
+
+import asyncio
+import unittest
+
+import aiohttp
+from aiohttp import web
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Message
+
+from webhook_server import WebhookServer
+
+
+TOKEN = '42:TEST'
+SECRET_TOKEN = 'test-secret_1'
+
+
+class FakeTelegramServer:
+    """
+    Сервер Telegram Bot API для тестов. Запоминает вызовы методов и отвечает
+    на них успешно (кроме первых flood_responses вызовов sendMessage, на
+    которые отвечает "Too Many Requests" с retry_after).
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.called = asyncio.Event()
+        self.message_id = 0
+        self.flood_responses = 0
+        self.retry_after = 1
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        # Содержимое файлов читается сразу: после ответа они закрываются
+        data = {k: (v.filename, v.file.read())
+                if isinstance(v, web.FileField) else v
+                for (k, v) in (await request.post()).items()}
+        self.calls.append((method, data))
+        self.called.set()
+        if method == 'sendMessage' and self.flood_responses > 0:
+            self.flood_responses -= 1
+            return web.json_response(
+                {'ok': False, 'error_code': 429,
+                 'description': 'Too Many Requests: retry after '
+                 f'{self.retry_after}',
+                 'parameters': {'retry_after': self.retry_after}},
+                status=429)
+        if method in ('sendMessage', 'sendDocument', 'editMessageText'):
+            if method == 'editMessageText':
+                message_id = int(data['message_id'])
+            else:
+                self.message_id += 1
+                message_id = self.message_id
+            result = {'message_id': message_id,
+                      'date': 0,
+                      'chat': {'id': int(data['chat_id']), 'type': 'private'}}
+            if 'text' in data:
+                result['text'] = data['text']
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        return f'http://127.0.0.1:{self.runner.addresses[0][1]}'
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    def create_bot(self, base_url: str) -> Bot:
+        return Bot(token=TOKEN,
+                   session=AiohttpSession(
+                       api=TelegramAPIServer.from_base(base_url)))
+
+    async def wait_calls(self, method: str, count: int = 1,
+                         timeout_sec: float = 5) -> list[dict]:
+        async def wait():
+            while True:
+                calls = [d for (m, d) in self.calls if m == method]
+                if len(calls) >= count:
+                    return calls
+                self.called.clear()
+                await self.called.wait()
+        return await asyncio.wait_for(wait(), timeout_sec)
+
+
+def message_update(update_id: int, text: str) -> dict:
+    return {'update_id': update_id,
+            'message': {'message_id': update_id,
+                        'date': 0,
+                        'chat': {'id': 1, 'type': 'private'},
+                        'from': {'id': 1, 'is_bot': False,
+                                 'first_name': 'Test'},
+                        'text': text}}
+
+
+class WebhookServerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.telegram = FakeTelegramServer()
+        self.bot = self.telegram.create_bot(await self.telegram.start())
+        self.handler_started = asyncio.Event()
+        self.handler_release = asyncio.Event()
+        router = Router()
+
+        @router.message()
+        async def echo(message: Message):
+            self.handler_started.set()
+            await self.handler_release.wait()
+            await message.answer('echo ' + message.text)
+
+        dispatcher = Dispatcher()
+        dispatcher.include_router(router)
+        self.server = WebhookServer(dispatcher, self.bot, SECRET_TOKEN,
+                                    host='127.0.0.1', port=0,
+                                    url='https://bot.example/webhook')
+        await self.server.start()
+        self.url = f'http://127.0.0.1:{self.server.bound_port}/webhook'
+        self.session = aiohttp.ClientSession()
+
+    async def asyncTearDown(self):
+        self.handler_release.set()
+        await self.session.close()
+        await self.server.stop()
+        await self.bot.session.close()
+        await self.telegram.stop()
+
+    async def post(self, update: dict, secret_token: str) -> int:
+        async with self.session.post(
+                self.url, json=update,
+                headers={'X-Telegram-Bot-Api-Secret-Token': secret_token}
+                ) as response:
+            return response.status
+
+    def test_bad_secret_token(self):
+        for secret_token in (None, '', 'with space', 'a' * 257):
+            with self.assertRaises(ValueError):
+                WebhookServer(None, None, secret_token)
+
+    async def test_set_webhook(self):
+        (data,) = await self.telegram.wait_calls('setWebhook')
+        self.assertEqual(data['url'], 'https://bot.example/webhook')
+        self.assertEqual(data['secret_token'], SECRET_TOKEN)
+
+    async def test_update(self):
+        # Ответ отправляется до завершения обработки обновления
+        self.assertEqual(await self.post(message_update(1, 'ping'),
+                                         SECRET_TOKEN), 200)
+        await asyncio.wait_for(self.handler_started.wait(), 5)
+        self.handler_release.set()
+        (data,) = await self.telegram.wait_calls('sendMessage')
+        self.assertEqual(data['text'], 'echo ping')
+
+    async def test_wrong_secret(self):
+        self.assertEqual(await self.post(message_update(1, 'ping'),
+                                         'wrong'), 401)
+        await asyncio.sleep(0.05)
+        self.assertFalse(self.handler_started.is_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
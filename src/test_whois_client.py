@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:48:20 2026
+
+@author: askh
+"""
+
+import asyncio
+import unittest
+from whois_client import WhoisClient, idna_domain, whois_server_for_domain
+
+
+class FakeWhoisServer:
+    """
+    Сервер WHOIS для тестов. Отвечает на очередное соединение очередным
+    ответом из списка (последний ответ повторяется).
+    """
+
+    def __init__(self, answers: list[bytes], delay_sec: float = 0):
+        self.answers = answers
+        self.delay_sec = delay_sec
+        self.queries = []
+
+    async def handle(self, reader, writer):
+        query = await reader.readline()
+        self.queries.append(query)
+        answer = self.answers[min(len(self.queries), len(self.answers)) - 1]
+        if self.delay_sec:
+            try:
+                await asyncio.sleep(self.delay_sec)
+            except asyncio.CancelledError:
+                writer.close()
+                return
+        writer.write(answer)
+        await writer.drain()
+        writer.close()
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+class WhoisClientTest(unittest.IsolatedAsyncioTestCase):
+
+    async def query(self, server, domain, **kwargs):
+        port = await server.start()
+        try:
+            client = WhoisClient(port=port,
+                                 server_for_domain=lambda tld: '127.0.0.1',
+                                 **kwargs)
+            return await client.query(domain)
+        finally:
+            await server.stop()
+
+    def test_whois_server_for_domain(self):
+        self.assertEqual(whois_server_for_domain('ru'), 'ru.whois-servers.net')
+
+    def test_idna_domain(self):
+        self.assertEqual(idna_domain('Example.COM.'), 'example.com')
+        self.assertEqual(idna_domain('пример.рф'), 'xn--e1afmkfd.xn--p1ai')
+
+    async def test_query(self):
+        server = FakeWhoisServer([b'domain: example.com\r\n'])
+        (text, truncated) = await self.query(server, 'Example.com')
+        self.assertEqual(text, 'domain: example.com\r\n')
+        self.assertFalse(truncated)
+        self.assertEqual(server.queries, [b'example.com\r\n'])
+
+    async def test_referral(self):
+        server = FakeWhoisServer([
+            b'Domain Name: EXAMPLE.COM\r\n'
+            b'   Registrar WHOIS Server: localhost\r\n',
+            b'Registrant: Example\r\n'])
+        (text, truncated) = await self.query(server, 'example.com')
+        self.assertEqual(len(server.queries), 2)
+        self.assertIn('Registrar WHOIS Server', text)
+        self.assertIn('Registrant: Example', text)
+
+    async def test_referral_loop(self):
+        server = FakeWhoisServer([b'refer: 127.0.0.1\r\n'])
+        await self.query(server, 'example.com')
+        self.assertEqual(len(server.queries), 1)
+
+    async def test_referral_denied(self):
+        server = FakeWhoisServer([b'refer: localhost\r\n'])
+        await self.query(server, 'example.com',
+                         server_checker=lambda name: name != 'localhost')
+        self.assertEqual(len(server.queries), 1)
+
+    async def test_referral_resolved(self):
+        server = FakeWhoisServer([b'refer: whois.example\r\n',
+                                  b'Registrant: Example\r\n'])
+        resolved = []
+
+        async def resolver(host, port):
+            resolved.append(host)
+            return ['127.0.0.1']
+
+        (text, truncated) = await self.query(
+            server, 'example.com', resolver=resolver,
+            address_checker=lambda address: True)
+        self.assertEqual(resolved, ['whois.example'])
+        self.assertEqual(len(server.queries), 2)
+        self.assertIn('Registrant: Example', text)
+
+    async def test_referral_denied_address(self):
+        server = FakeWhoisServer([b'refer: whois.example\r\n'])
+
+        async def resolver(host, port):
+            return ['192.0.2.1', '127.0.0.1']
+
+        (text, truncated) = await self.query(
+            server, 'example.com', resolver=resolver,
+            address_checker=lambda address: address != '127.0.0.1')
+        self.assertEqual(len(server.queries), 1)
+        self.assertEqual(text, 'refer: whois.example\r\n')
+
+    async def test_max_bytes(self):
+        server = FakeWhoisServer([b'x' * 100000])
+        (text, truncated) = await self.query(server, 'example.com',
+                                             max_bytes=1000)
+        self.assertEqual(len(text), 1000)
+        self.assertTrue(truncated)
+
+    async def test_timeout(self):
+        server = FakeWhoisServer([b'domain: example.com\r\n'], delay_sec=5)
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.query(server, 'example.com', timeout_sec=0.2)
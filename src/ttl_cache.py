@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:52:30 2026
+
+@author: askh
+
+Содержит класс кэша с ограничением времени жизни записей и общего объёма
+(при превышении объёма удаляются давно не использовавшиеся записи)
+"""
+
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Callable, Hashable
+
+
+class TtlLruCache:
+
+    def __init__(self,
+                 max_bytes: int,
+                 clock: Callable[[], float] = monotonic):
+        """
+        Parameters
+        ----------
+        max_bytes : int
+            Максимальный суммарный размер записей, в байтах.
+        clock : Callable[[], float], optional
+            Функция, возвращающая текущее время в секундах.
+
+        """
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Ключ -> (момент устаревания, размер, значение). Порядок - от давно
+        # использовавшихся записей к недавно использовавшимся.
+        self.entries: OrderedDict[Hashable, tuple] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _remove(self, key: Hashable):
+        (_, size, _) = self.entries.pop(key)
+        self.size_bytes -= size
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Получить значение из кэша.
+
+        Parameters
+        ----------
+        key : Hashable
+            Ключ.
+
+        Returns
+        -------
+        Any
+            Значение, либо None, если его нет в кэше или оно устарело.
+
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] > self.clock():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self._remove(key)
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value: Any, ttl_sec: float, size: int):
+        """
+        Поместить значение в кэш. Если значение больше всего кэша или время
+        жизни не положительно, значение не сохраняется.
+
+        Parameters
+        ----------
+        key : Hashable
+            Ключ.
+        value : Any
+            Значение.
+        ttl_sec : float
+            Время жизни записи, в секундах.
+        size : int
+            Размер записи, в байтах (оценка).
+
+        Returns
+        -------
+        None.
+
+        """
+        if key in self.entries:
+            self._remove(key)
+        if ttl_sec <= 0 or size > self.max_bytes:
+            return
+        while self.entries and self.size_bytes + size > self.max_bytes:
+            (_, (_, evicted_size, _)) = self.entries.popitem(last=False)
+            self.size_bytes -= evicted_size
+            self.evictions += 1
+        self.entries[key] = (self.clock() + ttl_sec, size, value)
+        self.size_bytes += size
+
+    def delete(self, key: Hashable):
+        """
+        Удалить значение из кэша (если оно есть).
+        """
+        if key in self.entries:
+            self._remove(key)
+
+    def stats(self) -> dict:
+        """
+        Статистика использования кэша.
+
+        Returns
+        -------
+        dict
+            Количество попаданий, промахов, вытеснений, записей и их
+            суммарный размер.
+
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'size_bytes': self.size_bytes,
+        }
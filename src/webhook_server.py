@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 11:24:09 2026
+
+@author: askh
+
+Содержит сервер для получения обновлений Telegram через webhook (вместо
+long polling). Запросы Telegram проверяются по секретному токену, ответ 200
+отправляется сразу, а обработка обновления выполняется в фоне, поэтому
+несколько экземпляров бота могут работать за балансировщиком нагрузки.
+"""
+
+import asyncio
+import logging
+import re
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, \
+    setup_application
+
+
+# Допустимый секретный токен (требования Telegram Bot API к параметру
+# secret_token метода setWebhook)
+SECRET_TOKEN_RE = re.compile(r'\A[A-Za-z0-9_-]{1,256}\Z')
+
+
+class WebhookServer:
+
+    DEFAULT_HOST = '0.0.0.0'
+    DEFAULT_PORT = 8080
+    DEFAULT_PATH = '/webhook'
+
+    def __init__(self,
+                 dispatcher: Dispatcher,
+                 bot: Bot,
+                 secret_token: str,
+                 host: str = None,
+                 port: int = None,
+                 path: str = None,
+                 url: str = None):
+        """
+        Parameters
+        ----------
+        dispatcher : Dispatcher
+            Диспетчер обновлений.
+        bot : Bot
+            Бот.
+        secret_token : str
+            Секретный токен, который Telegram передаёт в заголовке
+            X-Telegram-Bot-Api-Secret-Token каждого запроса.
+        host : str, optional
+            Адрес, на котором принимаются соединения.
+        port : int, optional
+            Порт (0 - любой свободный).
+        path : str, optional
+            Путь, по которому принимаются обновления.
+        url : str, optional
+            Внешний адрес webhook (например, адрес балансировщика нагрузки),
+            который регистрируется в Telegram при запуске сервера. Если не
+            указан, webhook не регистрируется (например, его регистрирует
+            другой экземпляр бота).
+
+        Raises
+        ------
+        ValueError
+            Некорректный секретный токен.
+
+        """
+        if secret_token is None or not SECRET_TOKEN_RE.match(secret_token):
+            raise ValueError("Webhook secret token must contain 1-256 "
+                             "characters A-Z, a-z, 0-9, _ and -")
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.secret_token = secret_token
+        self.host = self.DEFAULT_HOST if host is None else host
+        self.port = self.DEFAULT_PORT if port is None else port
+        self.path = self.DEFAULT_PATH if path is None else path
+        self.url = url
+        self.runner = None
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        SimpleRequestHandler(dispatcher=self.dispatcher,
+                             bot=self.bot,
+                             handle_in_background=True,
+                             secret_token=self.secret_token
+                             ).register(app, path=self.path)
+        setup_application(app, self.dispatcher, bot=self.bot)
+        return app
+
+    async def start(self):
+        """
+        Запустить сервер и, если указан внешний адрес, зарегистрировать
+        webhook.
+        """
+        logger = logging.getLogger(__name__)
+        self.runner = web.AppRunner(self.create_app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        logger.info("Webhook server listening on %s", self.runner.addresses)
+        if self.url is not None:
+            await self.bot.set_webhook(
+                self.url,
+                secret_token=self.secret_token,
+                allowed_updates=self.dispatcher.resolve_used_update_types())
+            logger.info("Webhook registered: %s", self.url)
+
+    @property
+    def bound_port(self) -> int:
+        """
+        Порт, на котором сервер принимает соединения.
+        """
+        return self.runner.addresses[0][1]
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
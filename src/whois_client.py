@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:05:37 2026
+
+@author: askh
+
+Содержит асинхронный клиент WHOIS (RFC 3912), работающий без запуска внешней
+программы whois
+"""
+
+import asyncio
+import ipaddress
+import logging
+import re
+from typing import Awaitable, Callable
+
+from http_probe import connect_happy_eyeballs, system_resolve
+
+
+def whois_server_for_domain(domain: str) -> str:
+    """
+    Определяет имя сервера WHOIS для домена, используя whois-servers.net
+
+    Parameters
+    ----------
+    domain : str
+        Имя домена верхнего уровня, без точки.
+
+    Returns
+    -------
+    str
+        Имя сервера WHOIS, который может ответить на запросы о выбранном
+        домене.
+
+    """
+    return domain + ".whois-servers.net"
+
+
+def idna_domain(domain: str) -> str:
+    """
+    Привести имя домена к виду, в котором оно передаётся серверам: нижний
+    регистр, без завершающей точки, национальные символы в кодировке IDNA.
+
+    Parameters
+    ----------
+    domain : str
+        Имя домена.
+
+    Returns
+    -------
+    str
+        Имя домена в кодировке ASCII.
+
+    """
+    domain = domain.strip().rstrip('.').lower()
+    try:
+        return domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        return domain
+
+
+class WhoisClient:
+
+    DEFAULT_PORT = 43
+    DEFAULT_TIMEOUT_SEC = 15
+    DEFAULT_MAX_BYTES = 64 * 1024
+    DEFAULT_MAX_REFERRALS = 2
+
+    # Сервер, с которого начинается поиск данных об IP-адресах: он
+    # ссылается на сервер соответствующего регионального регистратора
+    IANA_SERVER = 'whois.iana.org'
+
+    READ_CHUNK_SIZE = 4096
+
+    # Интервал между попытками соединения с разными адресами сервера
+    HAPPY_EYEBALLS_DELAY_SEC = 0.25
+
+    # Строки ответа, указывающие на сервер WHOIS, у которого есть более
+    # полные данные о домене (например, сервер регистратора)
+    REFERRAL_RE = re.compile(
+        r'^[ \t]*(?:Registrar WHOIS Server|ReferralServer|refer):[ \t]*'
+        r'(?:r?whois://)?([a-z0-9.-]+)',
+        re.I | re.M)
+
+    def __init__(self,
+                 timeout_sec: float = None,
+                 max_bytes: int = None,
+                 max_referrals: int = None,
+                 port: int = None,
+                 server_for_domain: Callable[[str], str] = None,
+                 server_checker: Callable[[str], bool] = None,
+                 address_checker: Callable[[str], bool] = None,
+                 resolver: Callable[[str, int],
+                                    Awaitable[list[str]]] = None):
+        """
+        Parameters
+        ----------
+        timeout_sec : float, optional
+            Максимальное время выполнения всего запроса, включая переходы по
+            ссылкам на другие серверы, в секундах.
+        max_bytes : int, optional
+            Максимальный суммарный размер ответов серверов, в байтах.
+        max_referrals : int, optional
+            Максимальное количество переходов к другим серверам.
+        port : int, optional
+            Порт серверов WHOIS.
+        server_for_domain : Callable[[str], str], optional
+            Функция, определяющая сервер WHOIS по домену верхнего уровня.
+        server_checker : Callable[[str], bool], optional
+            Функция проверки допустимости сервера, на который ссылается
+            ответ другого сервера. Если не задана, переходы разрешены к
+            любым серверам.
+        address_checker : Callable[[str], bool], optional
+            Функция проверки допустимости IP-адреса сервера, на который
+            ссылается ответ другого сервера (проверяются все адреса, в
+            которые разрешается имя сервера). Если не задана, разрешены
+            любые адреса.
+        resolver : Callable[[str, int], Awaitable[list[str]]], optional
+            Функция разрешения имени сервера (по умолчанию - системный
+            резолвер).
+
+        """
+        self.timeout_sec = \
+            self.DEFAULT_TIMEOUT_SEC if timeout_sec is None else timeout_sec
+        self.max_bytes = \
+            self.DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_referrals = \
+            self.DEFAULT_MAX_REFERRALS if max_referrals is None \
+            else max_referrals
+        self.port = self.DEFAULT_PORT if port is None else port
+        self.server_for_domain = \
+            whois_server_for_domain if server_for_domain is None \
+            else server_for_domain
+        self.server_checker = server_checker
+        self.address_checker = address_checker
+        self.resolver = system_resolve if resolver is None else resolver
+
+    async def _query_server(self,
+                            server: str,
+                            query: str,
+                            max_bytes: int,
+                            addresses: list[str] = None) -> (bytes, bool):
+        """
+        Выполнить запрос к одному серверу WHOIS.
+
+        Parameters
+        ----------
+        server : str
+            Имя сервера.
+        query : str
+            Текст запроса.
+        max_bytes : int
+            Максимальный размер ответа, в байтах.
+        addresses : list[str], optional
+            Проверенные адреса сервера (если не указаны, соединение
+            устанавливается по имени сервера).
+
+        Returns
+        -------
+        (bytes, bool)
+            Ответ сервера и признак того, что ответ был обрезан.
+
+        """
+        if addresses is None:
+            reader, writer = await asyncio.open_connection(server, self.port)
+        else:
+            sock = await connect_happy_eyeballs(addresses, self.port,
+                                                self.HAPPY_EYEBALLS_DELAY_SEC)
+            try:
+                reader, writer = await asyncio.open_connection(sock=sock)
+            except BaseException:
+                sock.close()
+                raise
+        try:
+            writer.write(query.encode('ascii') + b'\r\n')
+            await writer.drain()
+            data = bytearray()
+            while len(data) < max_bytes:
+                chunk = await reader.read(
+                    min(self.READ_CHUNK_SIZE, max_bytes - len(data)))
+                if not chunk:
+                    return (bytes(data), False)
+                data += chunk
+            # Достигнут предел размера: проверяем, остались ли ещё данные
+            truncated = len(await reader.read(1)) > 0
+            return (bytes(data), truncated)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def _referral_addresses(self, server: str) -> list[str]:
+        """
+        Разрешить имя сервера, на который ссылается ответ другого сервера,
+        и проверить все полученные адреса.
+
+        Returns
+        -------
+        list[str]
+            Проверенные адреса, либо None, если имя не удалось разрешить или
+            хотя бы один из адресов запрещён.
+
+        """
+        logger = logging.getLogger(__name__)
+        try:
+            addresses = await self.resolver(server, self.port)
+        except OSError as e:
+            logger.warning("Can't resolve whois server %s: %s", server, e)
+            return None
+        if not addresses:
+            logger.warning("No addresses for whois server %s", server)
+            return None
+        if self.address_checker is not None:
+            for address in addresses:
+                if not self.address_checker(address):
+                    logger.warning("Whois server %s resolves to denied "
+                                   "address %s", server, address)
+                    return None
+        return addresses
+
+    async def _query(self, domain: str) -> (str, bool):
+        logger = logging.getLogger(__name__)
+
+        domain = idna_domain(domain)
+        try:
+            ipaddress.ip_address(domain)
+            server = self.IANA_SERVER
+        except ValueError:
+            tld = domain.rsplit('.', 1)[-1]
+            server = self.server_for_domain(tld)
+        addresses = None
+        visited = set()
+        answers = []
+        total_bytes = 0
+        truncated = False
+
+        for _ in range(self.max_referrals + 1):
+            visited.add(server.lower())
+            logger.debug("Whois query for %s to server %s", domain, server)
+            (data, truncated) = await self._query_server(
+                server, domain, self.max_bytes - total_bytes, addresses)
+            total_bytes += len(data)
+            text = data.decode('utf-8', errors='replace')
+            answers.append(text)
+            if truncated or total_bytes >= self.max_bytes:
+                break
+            match = self.REFERRAL_RE.search(text)
+            if match is None:
+                break
+            referral = match.group(1).rstrip('.')
+            if referral.lower() in visited:
+                break
+            if self.server_checker is not None and \
+               not self.server_checker(referral):
+                logger.warning("Whois referral to denied server %s",
+                               referral)
+                break
+            # Соединение устанавливается с уже проверенными адресами, а не
+            # по имени, которое может быть разрешено повторно иначе
+            addresses = await self._referral_addresses(referral)
+            if addresses is None:
+                break
+            server = referral
+
+        return ("\n".join(answers), truncated)
+
+    async def query(self, domain: str) -> (str, bool):
+        """
+        Получить данные WHOIS о домене. Запрос отправляется серверу домена
+        верхнего уровня, затем, если в ответе есть ссылка на сервер
+        регистратора, и ему.
+
+        Parameters
+        ----------
+        domain : str
+            Имя домена.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            Запрос не был выполнен за отведённое время.
+        OSError
+            Ошибка соединения с сервером.
+
+        Returns
+        -------
+        (str, bool)
+            Ответы серверов и признак того, что ответ был обрезан из-за
+            ограничения на размер.
+
+        """
+        return await asyncio.wait_for(self._query(domain), self.timeout_sec)